@@ -253,12 +253,28 @@ def create_checkout_with_price_id(price_id: str,
 # Importera våra moduler
 # from services.report_generator import ReportGenerator  # Disabled - using DatabaseParser instead
 from services.supabase_service import SupabaseService
-from services.database_parser import DatabaseParser
+from services.database_parser import DatabaseParser, invalidate_mapping_cache
 from services.supabase_database import db
 from services.bolagsverket_service import BolagsverketService
 from services.fb import ForvaltningsberattelseFB
+from services.sie_document import SieDocument
+from services.sie_ingest import read_sie_uploads, SieDecodeError
+from services.upload_result_cache import upload_result_key, get_upload_result, store_upload_result
+from services.financial_statement import StatementRows
+from services.ink2_engine import recalculate_ink2_rows
+from services.working_session import (
+    create_working_session, get_working_session, patch_working_session, delete_working_session,
+    resolve_company_data, WorkingSessionNotFound, WorkingSessionConflict,
+)
+from services.upload_executor import run_upload_stage, upload_queue_status, UploadQueueFull
+from services.annual_report_renderer import (
+    render_annual_report_pdf, start_render_batch, get_render_batch, RenderQueueFull,
+    ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS
+)
+from services.artifact_cache import artifact_key, get_or_create_artifact, etag_matches, artifact_headers
 from services.email_service import send_password_email, generate_password
 from rating_bolag_scraper import get_company_info_with_search
+from services.company_scrape_jobs import start_company_scrape, get_company_scrape
 from models.schemas import (
     ReportRequest, ReportResponse, CompanyData, 
     ManagementReportRequest, ManagementReportResponse, 
@@ -346,13 +362,11 @@ def _rr_pick_num(item):
     return None
 
 def _rr_find(rr_items, var_name):
-    """Find value in RR items by variable name"""
+    """Find value in RR items (list or StatementRows) by variable name"""
     if not rr_items:
         return None
-    for it in rr_items:
-        if (it.get('variable_name') or '') == var_name:
-            return _rr_pick_num(it)
-    return None
+    it = StatementRows.coerce(rr_items).find(var_name)
+    return _rr_pick_num(it) if it is not None else None
 
 def _normalize_delta(x):
     """Normalize delta: treat < 1 SEK as 0, round to integer"""
@@ -383,8 +397,9 @@ def freeze_originals(company_data: dict) -> dict:
           or company_data.get('rrData') or [])
 
     # Grab values; tolerate that some pipelines only fill 'final'
-    arets_resultat = _rr_find(rr, 'SumAretsResultat')
-    arets_skatt = _rr_find(rr, 'SkattAretsResultat')  # usually NEGATIVE (expense)
+    rr_rows = StatementRows.coerce(rr)
+    arets_resultat = _rr_find(rr_rows, 'SumAretsResultat')
+    arets_skatt = _rr_find(rr_rows, 'SkattAretsResultat')  # usually NEGATIVE (expense)
 
     # Only freeze when we have at least one meaningful number
     if arets_resultat is not None or arets_skatt is not None:
@@ -439,7 +454,7 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now().isoformat()}
+    return {"status": "healthy", "timestamp": datetime.now().isoformat(), "uploads": upload_queue_status()}
 
 @app.get("/debug/supabase")
 async def debug_supabase():
@@ -836,16 +851,15 @@ def inject_ink2_adjustments(ink2_data: List[Dict], rr_data: List[Dict], manual_a
     """
     try:
         manual_amounts = manual_amounts or {}
+        ink2_rows = StatementRows.coerce(ink2_data)
         
-        def _find_amt(rows, name):
-            for r in rows:
-                if r.get('variable_name') == name:
-                    return float(r.get('amount') or 0)
-            return 0.0
+        def _find_amt(name):
+            r = ink2_rows.find(name)
+            return float(r.get('amount') or 0) if r is not None else 0.0
         
         # Get already-calculated values from INK2 data
-        arets_resultat_justerat = _find_amt(ink2_data, 'Arets_resultat_justerat')
-        ink_beraknad = _find_amt(ink2_data, 'INK_beraknad_skatt')
+        arets_resultat_justerat = _find_amt('Arets_resultat_justerat')
+        ink_beraknad = _find_amt('INK_beraknad_skatt')
         
         print(f"📊 inject_ink2_adjustments: Årets resultat (justerat) = {arets_resultat_justerat} kr, INK_beraknad_skatt = {ink_beraknad} kr")
         
@@ -859,26 +873,24 @@ def inject_ink2_adjustments(ink2_data: List[Dict], rr_data: List[Dict], manual_a
         if ink4_1_manual is None and ink4_2_manual is None:
             if arets_resultat_justerat > 0:
                 # Profit: inject into INK4.1, zero out INK4.2
-                for r in ink2_data:
-                    if r.get('variable_name') == 'INK4.1':
-                        old_val = r.get('amount', 0)
-                        r['amount'] = round(abs(arets_resultat_justerat))
-                        print(f"✅ Injected INK4.1 (vinst): {old_val} → {round(abs(arets_resultat_justerat))} kr")
-                    elif r.get('variable_name') == 'INK4.2':
-                        r['amount'] = 0.0
+                for r in ink2_rows.find_all('INK4.1'):
+                    old_val = r.get('amount', 0)
+                    r['amount'] = round(abs(arets_resultat_justerat))
+                    print(f"✅ Injected INK4.1 (vinst): {old_val} → {round(abs(arets_resultat_justerat))} kr")
+                for r in ink2_rows.find_all('INK4.2'):
+                    r['amount'] = 0.0
             elif arets_resultat_justerat < 0:
                 # Loss: inject into INK4.2, zero out INK4.1
-                for r in ink2_data:
-                    if r.get('variable_name') == 'INK4.1':
-                        r['amount'] = 0.0
-                    elif r.get('variable_name') == 'INK4.2':
-                        old_val = r.get('amount', 0)
-                        r['amount'] = round(abs(arets_resultat_justerat))
-                        print(f"✅ Injected INK4.2 (förlust): {old_val} → {round(abs(arets_resultat_justerat))} kr")
+                for r in ink2_rows.find_all('INK4.1'):
+                    r['amount'] = 0.0
+                for r in ink2_rows.find_all('INK4.2'):
+                    old_val = r.get('amount', 0)
+                    r['amount'] = round(abs(arets_resultat_justerat))
+                    print(f"✅ Injected INK4.2 (förlust): {old_val} → {round(abs(arets_resultat_justerat))} kr")
             else:
                 # Zero result: zero out both
-                for r in ink2_data:
-                    if r.get('variable_name') in ['INK4.1', 'INK4.2']:
+                for name in ('INK4.1', 'INK4.2'):
+                    for r in ink2_rows.find_all(name):
                         r['amount'] = 0.0
         else:
             print(f"ℹ️ Skipping INK4.1/4.2 injection - manual overrides exist: INK4.1={ink4_1_manual}, INK4.2={ink4_2_manual}")
@@ -886,14 +898,12 @@ def inject_ink2_adjustments(ink2_data: List[Dict], rr_data: List[Dict], manual_a
         # Inject INK_beraknad_skatt into INK4.3a (Skatt på årets resultat)
         # Always inject unless manually overridden (even if 0, to replace booked tax)
         if ink4_3a_manual is None:
-            found_ink4_3a = False
-            for r in ink2_data:
-                if r.get('variable_name') == 'INK4.3a':
-                    old_value = r.get('amount', 0)
-                    r['amount'] = round(ink_beraknad)
-                    found_ink4_3a = True
-                    print(f"✅ Injected INK4.3a (Skatt på årets resultat): {old_value} → {round(ink_beraknad)} kr (beräknad skatt)")
-                    break
+            r = ink2_rows.find('INK4.3a')
+            found_ink4_3a = r is not None
+            if found_ink4_3a:
+                old_value = r.get('amount', 0)
+                r['amount'] = round(ink_beraknad)
+                print(f"✅ Injected INK4.3a (Skatt på årets resultat): {old_value} → {round(ink_beraknad)} kr (beräknad skatt)")
             
             if not found_ink4_3a:
                 print(f"⚠️ INK4.3a not found in ink2_data for injection (beräknad skatt: {ink_beraknad})")
@@ -908,181 +918,181 @@ def inject_ink2_adjustments(ink2_data: List[Dict], rr_data: List[Dict], manual_a
         traceback.print_exc()
         return ink2_data  # Return unchanged on error
 
-@app.post("/upload-se-file", response_model=dict)
-async def upload_se_file(file: UploadFile = File(...)):
+def _start_company_scrape(company_info: dict):
     """
-    Laddar upp en .SE-fil och extraherar grundläggande information
+    Kick off the rating.se scrape for the uploaded company in the background.
+    Returns (scraped data so far, status); data is {} while the job is pending.
     """
-    if not file.filename.lower().endswith('.se'):
-        raise HTTPException(status_code=400, detail="Endast .SE-filer accepteras")
-    
-    try:
-        # Skapa temporär fil
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.se') as temp_file:
-            shutil.copyfileobj(file.file, temp_file)
-            temp_path = temp_file.name
-        
-        # Read SE file content with encoding detection including PC8 format
-        def detect_sie_encoding(file_path: str) -> str:
-            """Detect SIE file encoding based on FORMAT header"""
-            try:
-                # Read first 200 bytes to check format
-                with open(file_path, "rb") as f:
-                    head = f.read(200).decode("latin-1", errors="ignore")
-                
-                if "#FORMAT PC8" in head:
-                    return "cp437"  # IBM CP437 for PC8
-                elif "#FORMAT UTF8" in head:
-                    return "utf-8"
-                else:
-                    return "iso-8859-1"  # Default for older SIE files
-            except Exception:
-                return "iso-8859-1"  # Safe fallback
-        
-        # Try detected encoding first, then fallbacks
-        detected_encoding = detect_sie_encoding(temp_path)
-        encodings = [detected_encoding, 'cp437', 'iso-8859-1', 'windows-1252', 'utf-8', 'cp1252']
-        se_content = None
-        
-        for encoding in encodings:
-            try:
-                with open(temp_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                    # Apply unicode normalization after reading
-                    import unicodedata
-                    se_content = unicodedata.normalize("NFKC", content)
-                    se_content = se_content.replace("\u00A0", " ").replace("\u200B", "")
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if se_content is None:
-            raise HTTPException(status_code=500, detail="Kunde inte läsa SE-filen med någon av de försökta kodningarna")
-        
-        # Use the new database-driven parser
-        parser = DatabaseParser()
-        current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(se_content)
-        company_info = parser.extract_company_info(se_content)
-        
-        # Scrape additional company information from rating.se
-        scraped_company_data = {}
+    orgnr = company_info.get('organization_number')
+    if not orgnr:
+        # No orgnr in the SIE file - the scraper has to search by name first, keep that inline
         try:
+            data = get_company_info_with_search(orgnr=None, company_name=company_info.get('company_name'))
+        except Exception as e:
+            data = {"error": str(e)}
+        return data, "error" if data.get("error") else "done"
+    try:
+        job = start_company_scrape(orgnr, company_info.get('company_name'))
+    except Exception as e:
+        return {"error": str(e)}, "error"
+    return job["scraped_company_data"] or {}, job["status"]
 
-            scraped_company_data = get_company_info_with_search(
-                orgnr=company_info.get('organization_number'),
-                company_name=company_info.get('company_name')
-            )
+def _cached_upload_result(key) -> Optional[dict]:
+    """Finished upload result for identical SIE content + mapping version, with a fresh scrape status"""
+    result = get_upload_result(key)
+    if result is None:
+        return None
+    data = result["data"]
+    data["scraped_company_data"], data["scraped_company_status"] = _start_company_scrape(data["company_info"])
+    return result
 
-            
+def _with_working_session(result: dict) -> dict:
+    """Keep the parsed upload server-side as seFileData of a new working session; the client can send session_id instead"""
+    result["session_id"] = create_working_session({"seFileData": result["data"]}).session_id
+    return result
 
-        except Exception as e:
+def _process_se_upload(file: UploadFile) -> dict:
+    """Blocking part of upload_se_file (decoding, parsing, scraping); runs on the upload pool"""
+    # Decode, normalize and tokenize the upload line by line (encoding from the #FORMAT header);
+    # all parsers below share the same document
+    try:
+        [(sie_doc, se_content)] = read_sie_uploads(file.file)
+    except SieDecodeError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    # Same SIE content and mappings as an earlier upload -> serve the finished result
+    result_key = upload_result_key('single', sie_doc.content_hash)
+    cached_result = _cached_upload_result(result_key)
+    if cached_result is not None:
+        return cached_result
+    
+    # Use the new database-driven parser
+    parser = DatabaseParser()
+    current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(sie_doc)
+    company_info = parser.extract_company_info(sie_doc)
+    
+    # Company information from rating.se is scraped in the background;
+    # the client polls /api/company-scrape/{orgnr} until it is done
+    scraped_company_data, scraped_company_status = _start_company_scrape(company_info)
+    
+    rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=sie_doc)
+    
+    # Pass RR data to BR parsing so calculated values from RR are available
+    # Use koncern-aware BR parsing for automatic reconciliation with K2 notes
+    br_data = parser.parse_br_data_with_koncern(sie_doc, current_accounts, previous_accounts, rr_data)
+    
+    # Parse INK2 data (tax calculations) - pass RR data, BR data, SIE content, and previous accounts for account descriptions
+    ink2_data = parser.parse_ink2_data(current_accounts, company_info.get('fiscal_year'), rr_data, br_data, sie_doc, previous_accounts)
+    
+    # ⚠️ CRITICAL: Freeze originals AFTER RR has values, BEFORE inject_ink2_adjustments mutates them
+    temp_data = {'rrData': rr_data}  # Use 'rrData' key that freeze_originals looks for
+    temp_data = freeze_originals(temp_data)
+    arets_resultat_original = temp_data.get('arets_resultat_original')
+    arets_skatt_original = temp_data.get('arets_skatt_original')
+    original_rr_snapshot = temp_data.get('__original_rr_snapshot__')
+    
+    # Inject adjustments for PDF consistency (INK4.1/4.2 ← Årets resultat justerat, INK4.3a ← beräknad skatt)
+    # This may mutate rr_data, but we have a deep snapshot frozen above
+    ink2_data = inject_ink2_adjustments(ink2_data, rr_data)
+    
+    # Parse Noter data (notes) - pass SE content and user toggles if needed
+    try:
+        noter_data = parser.parse_noter_data(sie_doc, two_files_flag=False, previous_year_se_content=None)
 
-            scraped_company_data = {"error": str(e)}
-        
-        rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=se_content)
-        
-        # Pass RR data to BR parsing so calculated values from RR are available
-        # Use koncern-aware BR parsing for automatic reconciliation with K2 notes
-        br_data = parser.parse_br_data_with_koncern(se_content, current_accounts, previous_accounts, rr_data)
-        
-        # Parse INK2 data (tax calculations) - pass RR data, BR data, SIE content, and previous accounts for account descriptions
-        ink2_data = parser.parse_ink2_data(current_accounts, company_info.get('fiscal_year'), rr_data, br_data, se_content, previous_accounts)
-        
-        # ⚠️ CRITICAL: Freeze originals AFTER RR has values, BEFORE inject_ink2_adjustments mutates them
-        temp_data = {'rrData': rr_data}  # Use 'rrData' key that freeze_originals looks for
-        temp_data = freeze_originals(temp_data)
-        arets_resultat_original = temp_data.get('arets_resultat_original')
-        arets_skatt_original = temp_data.get('arets_skatt_original')
-        original_rr_snapshot = temp_data.get('__original_rr_snapshot__')
-        
-        # Inject adjustments for PDF consistency (INK4.1/4.2 ← Årets resultat justerat, INK4.3a ← beräknad skatt)
-        # This may mutate rr_data, but we have a deep snapshot frozen above
-        ink2_data = inject_ink2_adjustments(ink2_data, rr_data)
-        
-        # Parse Noter data (notes) - pass SE content and user toggles if needed
-        try:
-            noter_data = parser.parse_noter_data(se_content, two_files_flag=False, previous_year_se_content=None)
+    except Exception as e:
 
-        except Exception as e:
+        noter_data = []
+    
+    # Parse Förvaltningsberättelse data (FB) - Förändring i eget kapital
+    try:
+        fb_module = ForvaltningsberattelseFB()
+        fb_variables = fb_module.calculate_forandring_eget_kapital(sie_doc, br_data)
+        fb_table = fb_module.generate_forandring_eget_kapital_table(fb_variables)
+    except Exception as e:
+        print(f"Error parsing FB data: {e}")
+        import traceback
+        traceback.print_exc()
+        fb_variables = {}
+        fb_table = []
+    
+    # Calculate pension tax variables for frontend
+    pension_premier = abs(float(current_accounts.get('7410', 0.0)))
+    # Särskild löneskatt can be booked in multiple accounts: 7530, 7531, 7532, 7533
+    sarskild_loneskatt_pension = (
+        abs(float(current_accounts.get('7530', 0.0))) +
+        abs(float(current_accounts.get('7531', 0.0))) +
+        abs(float(current_accounts.get('7532', 0.0))) +
+        abs(float(current_accounts.get('7533', 0.0)))
+    )
+    # Round to 0 decimals for consistency with tax module comparison
+    sarskild_loneskatt_pension = round(sarskild_loneskatt_pension, 0)
+    # Get sarskild_loneskatt rate from global variables
+    sarskild_loneskatt_rate = float(parser.global_variables.get('sarskild_loneskatt', 0.0))
+    sarskild_loneskatt_pension_calculated = pension_premier * sarskild_loneskatt_rate
+    # Round to 0 decimals for consistency with tax module calculation
+    sarskild_loneskatt_pension_calculated = round(sarskild_loneskatt_pension_calculated, 0)
+    
+    # NOTE: store_financial_data disabled - financial_data table is unused
+    # Data is stored in annual_report_data table instead
+    stored_ids = {}
+    
+    # Store original values in company_info so they're part of seFileData
+    company_info['arets_resultat_original'] = arets_resultat_original
+    company_info['arets_skatt_original'] = arets_skatt_original
+    
+    result = {
+        "success": True,
+        "data": {
+            "company_info": company_info,
+            "scraped_company_data": scraped_company_data,  # Add scraped company data
+            "scraped_company_status": scraped_company_status,  # 'pending' until the background scrape is done
+            "current_accounts_count": len(current_accounts),
+            "previous_accounts_count": len(previous_accounts),
+            "current_accounts_sample": dict(list(current_accounts.items())[:10]),
+            "previous_accounts_sample": dict(list(previous_accounts.items())[:10]),
+            "current_accounts": current_accounts,  # Add full accounts for recalculation
+            "previous_accounts": previous_accounts,  # Add previous year accounts for reclassification
+            "rr_data": rr_data,
+            "br_data": br_data,
+            "ink2_data": ink2_data,
+            "noter_data": noter_data,
+            "fb_variables": fb_variables,
+            "fb_table": fb_table,
+            "rr_count": len(rr_data),
+            "br_count": len(br_data),
+            "ink2_count": len(ink2_data),
+            "noter_count": len(noter_data),
+            "fb_count": len(fb_table),
+            "pension_premier": pension_premier,
+            "sarskild_loneskatt_pension": sarskild_loneskatt_pension,
+            "sarskild_loneskatt_pension_calculated": sarskild_loneskatt_pension_calculated,
+            # ORIGINAL VALUES for Bokföringsinstruktion (never modified by INK2 adjustments)
+            "arets_resultat_original": arets_resultat_original,
+            "arets_skatt_original": arets_skatt_original,
+            "__original_rr_snapshot__": original_rr_snapshot,  # Deep snapshot of pre-INK2 RR
+            # Raw SIE file content for troubleshooting
+            "sie_content_current": se_content,
+            "sie_content_previous": None  # Single file upload has no previous year
+        },
+        "message": "SE-fil laddad framgångsrikt"
+    }
+    store_upload_result(result_key, result)
+    return result
+    
 
-            noter_data = []
-        
-        # Parse Förvaltningsberättelse data (FB) - Förändring i eget kapital
-        try:
-            fb_module = ForvaltningsberattelseFB()
-            fb_variables = fb_module.calculate_forandring_eget_kapital(se_content, br_data)
-            fb_table = fb_module.generate_forandring_eget_kapital_table(fb_variables)
-        except Exception as e:
-            print(f"Error parsing FB data: {e}")
-            import traceback
-            traceback.print_exc()
-            fb_variables = {}
-            fb_table = []
-        
-        # Calculate pension tax variables for frontend
-        pension_premier = abs(float(current_accounts.get('7410', 0.0)))
-        # Särskild löneskatt can be booked in multiple accounts: 7530, 7531, 7532, 7533
-        sarskild_loneskatt_pension = (
-            abs(float(current_accounts.get('7530', 0.0))) +
-            abs(float(current_accounts.get('7531', 0.0))) +
-            abs(float(current_accounts.get('7532', 0.0))) +
-            abs(float(current_accounts.get('7533', 0.0)))
-        )
-        # Round to 0 decimals for consistency with tax module comparison
-        sarskild_loneskatt_pension = round(sarskild_loneskatt_pension, 0)
-        # Get sarskild_loneskatt rate from global variables
-        sarskild_loneskatt_rate = float(parser.global_variables.get('sarskild_loneskatt', 0.0))
-        sarskild_loneskatt_pension_calculated = pension_premier * sarskild_loneskatt_rate
-        # Round to 0 decimals for consistency with tax module calculation
-        sarskild_loneskatt_pension_calculated = round(sarskild_loneskatt_pension_calculated, 0)
-        
-        # NOTE: store_financial_data disabled - financial_data table is unused
-        # Data is stored in annual_report_data table instead
-        stored_ids = {}
-        
-        # Rensa upp temporär fil
-        os.unlink(temp_path)
-        
-        # Store original values in company_info so they're part of seFileData
-        company_info['arets_resultat_original'] = arets_resultat_original
-        company_info['arets_skatt_original'] = arets_skatt_original
-        
-        return {
-            "success": True,
-            "data": {
-                "company_info": company_info,
-                "scraped_company_data": scraped_company_data,  # Add scraped company data
-                "current_accounts_count": len(current_accounts),
-                "previous_accounts_count": len(previous_accounts),
-                "current_accounts_sample": dict(list(current_accounts.items())[:10]),
-                "previous_accounts_sample": dict(list(previous_accounts.items())[:10]),
-                "current_accounts": current_accounts,  # Add full accounts for recalculation
-                "previous_accounts": previous_accounts,  # Add previous year accounts for reclassification
-                "rr_data": rr_data,
-                "br_data": br_data,
-                "ink2_data": ink2_data,
-                "noter_data": noter_data,
-                "fb_variables": fb_variables,
-                "fb_table": fb_table,
-                "rr_count": len(rr_data),
-                "br_count": len(br_data),
-                "ink2_count": len(ink2_data),
-                "noter_count": len(noter_data),
-                "fb_count": len(fb_table),
-                "pension_premier": pension_premier,
-                "sarskild_loneskatt_pension": sarskild_loneskatt_pension,
-                "sarskild_loneskatt_pension_calculated": sarskild_loneskatt_pension_calculated,
-                # ORIGINAL VALUES for Bokföringsinstruktion (never modified by INK2 adjustments)
-                "arets_resultat_original": arets_resultat_original,
-                "arets_skatt_original": arets_skatt_original,
-                "__original_rr_snapshot__": original_rr_snapshot,  # Deep snapshot of pre-INK2 RR
-                # Raw SIE file content for troubleshooting
-                "sie_content_current": se_content,
-                "sie_content_previous": None  # Single file upload has no previous year
-            },
-            "message": "SE-fil laddad framgångsrikt"
-        }
-        
+@app.post("/upload-se-file", response_model=dict)
+async def upload_se_file(file: UploadFile = File(...)):
+    """
+    Laddar upp en .SE-fil och extraherar grundläggande information
+    """
+    if not file.filename.lower().endswith('.se'):
+        raise HTTPException(status_code=400, detail="Endast .SE-filer accepteras")
+    
+    try:
+        result = await run_upload_stage(_process_se_upload, file)
+        return _with_working_session(result)
+    except UploadQueueFull:
+        raise HTTPException(status_code=503, detail="Servern är hårt belastad just nu, försök igen om en stund")
     except Exception as e:
         import traceback
         error_detail = f"Fel vid laddning av fil: {str(e)}"
@@ -1091,6 +1101,191 @@ async def upload_se_file(file: UploadFile = File(...)):
         # Return more detailed error for debugging (you may want to remove this in production)
         raise HTTPException(status_code=500, detail=f"Fel vid laddning av fil: {str(e)} | Traceback: {full_traceback}")
 
+def _process_two_se_uploads(current_year_file: UploadFile, previous_year_file: UploadFile) -> dict:
+    """Blocking part of upload_two_se_files; runs on the upload pool"""
+    # Decode and tokenize both files concurrently (a previously uploaded file is reused
+    # from the parse cache); all parsers below share the same documents
+    try:
+        (current_sie_doc, current_se_content), (previous_sie_doc, previous_se_content) = read_sie_uploads(
+            current_year_file.file, previous_year_file.file)
+    except SieDecodeError as e:
+        which = "nuvarande" if e.index == 0 else "föregående"
+        raise HTTPException(status_code=500, detail=f"Kunde inte läsa {which} års SE-fil")
+    
+    # Same pair of files and mappings as an earlier upload -> serve the finished result
+    result_key = upload_result_key('two', current_sie_doc.content_hash, previous_sie_doc.content_hash)
+    cached_result = _cached_upload_result(result_key)
+    if cached_result is not None:
+        return cached_result
+    
+    # Use the new database-driven parser with two files flag
+    parser = DatabaseParser()
+    
+    # Extract company info from both files to validate years
+    current_company_info = parser.extract_company_info(current_sie_doc)
+    previous_company_info = parser.extract_company_info(previous_sie_doc)
+    
+    # Validate that both files belong to the same company
+    current_org_number = current_company_info.get('organization_number')
+    previous_org_number = previous_company_info.get('organization_number')
+    current_company_name = current_company_info.get('company_name')
+    previous_company_name = previous_company_info.get('company_name')
+    
+    # Check organization numbers first (primary method)
+    if current_org_number and previous_org_number:
+        if current_org_number != previous_org_number:
+            raise HTTPException(
+                status_code=400,
+                detail="SIE-filerna verkar vara från olika bolag. Kontrollera att båda filerna tillhör samma företag."
+            )
+    # Fallback to company names if organization numbers are missing
+    elif current_company_name and previous_company_name:
+        if current_company_name.strip().lower() != previous_company_name.strip().lower():
+            raise HTTPException(
+                status_code=400,
+                detail="SIE-filerna verkar vara från olika bolag. Kontrollera att båda filerna tillhör samma företag."
+            )
+    # If we can't validate company match, proceed with warning (could add logging here)
+    
+    # Validate that the years are consecutive
+    current_fiscal_year = current_company_info.get('fiscal_year')
+    previous_fiscal_year = previous_company_info.get('fiscal_year')
+    
+    if current_fiscal_year and previous_fiscal_year:
+        # Determine which is the newer and older year
+        fiscal_year = max(current_fiscal_year, previous_fiscal_year)
+        previous_year = min(current_fiscal_year, previous_fiscal_year)
+        
+        # Check that they are consecutive years
+        if fiscal_year - previous_year != 1:
+            raise HTTPException(
+                status_code=400, 
+                detail=f"Filerna måste avse två på varandra följande räkenskapsår. Du har laddat upp filer från {fiscal_year} och {previous_year}."
+            )
+        
+        # Ensure we always use the newer year as "current" for annual report generation
+        if current_fiscal_year < previous_fiscal_year:
+            # User uploaded files in reverse order - swap them
+            current_se_content, previous_se_content = previous_se_content, current_se_content
+            current_sie_doc, previous_sie_doc = previous_sie_doc, current_sie_doc
+            current_company_info, previous_company_info = previous_company_info, current_company_info
+    
+    current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(current_sie_doc)
+    company_info = current_company_info
+    
+    # Company information from rating.se is scraped in the background;
+    # the client polls /api/company-scrape/{orgnr} until it is done
+    scraped_company_data, scraped_company_status = _start_company_scrape(company_info)
+    
+    rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=current_sie_doc)
+    
+    # Pass RR data to BR parsing with two files flag and previous year SE content
+    br_data = parser.parse_br_data_with_koncern(
+        current_sie_doc, 
+        current_accounts, 
+        previous_accounts, 
+        rr_data,
+        two_files_flag=True,
+        previous_year_se_content=previous_sie_doc
+    )
+    
+    # Parse INK2 data (tax calculations) - pass RR data, BR data, SIE content, and previous accounts for account descriptions
+    ink2_data = parser.parse_ink2_data(current_accounts, company_info.get('fiscal_year'), rr_data, br_data, current_sie_doc, previous_accounts)
+    
+    # ⚠️ CRITICAL: Freeze originals AFTER RR has values, BEFORE inject_ink2_adjustments mutates them
+    temp_data = {'rrData': rr_data}  # Use 'rrData' key that freeze_originals looks for
+    temp_data = freeze_originals(temp_data)
+    arets_resultat_original = temp_data.get('arets_resultat_original')
+    arets_skatt_original = temp_data.get('arets_skatt_original')
+    original_rr_snapshot = temp_data.get('__original_rr_snapshot__')
+    
+    # Inject adjustments for PDF consistency (INK4.1/4.2 ← Årets resultat justerat, INK4.3a ← beräknad skatt)
+    # This may mutate rr_data, but we have a deep snapshot frozen above
+    ink2_data = inject_ink2_adjustments(ink2_data, rr_data)
+    
+    # Parse Noter data (notes) - pass SE content and user toggles if needed
+    try:
+        noter_data = parser.parse_noter_data(
+            current_sie_doc, 
+            two_files_flag=True, 
+            previous_year_se_content=previous_sie_doc
+        )
+    except Exception as e:
+        noter_data = []
+    
+    # Parse Förvaltningsberättelse data (FB) - Förändring i eget kapital
+    try:
+        fb_module = ForvaltningsberattelseFB()
+        fb_variables = fb_module.calculate_forandring_eget_kapital(current_sie_doc, br_data)
+        fb_table = fb_module.generate_forandring_eget_kapital_table(fb_variables)
+    except Exception as e:
+        print(f"Error parsing FB data: {e}")
+        import traceback
+        traceback.print_exc()
+        fb_variables = {}
+        fb_table = []
+    
+    # Calculate pension tax variables for frontend
+    pension_premier = abs(float(current_accounts.get('7410', 0.0)))
+    # Särskild löneskatt can be booked in multiple accounts: 7530, 7531, 7532, 7533
+    sarskild_loneskatt_pension = (
+        abs(float(current_accounts.get('7530', 0.0))) +
+        abs(float(current_accounts.get('7531', 0.0))) +
+        abs(float(current_accounts.get('7532', 0.0))) +
+        abs(float(current_accounts.get('7533', 0.0)))
+    )
+    # Round to 0 decimals for consistency with tax module comparison
+    sarskild_loneskatt_pension = round(sarskild_loneskatt_pension, 0)
+    # Get sarskild_loneskatt rate from global variables
+    sarskild_loneskatt_pension_calculated = pension_premier * 0.2431
+    # Round to 0 decimals for consistency with tax module calculation
+    sarskild_loneskatt_pension_calculated = round(sarskild_loneskatt_pension_calculated, 0)
+    
+    # Store original values in company_info so they're part of seFileData
+    company_info['arets_resultat_original'] = arets_resultat_original
+    company_info['arets_skatt_original'] = arets_skatt_original
+    
+    result = {
+        "success": True,
+        "data": {
+            "company_info": company_info,
+            "scraped_company_data": scraped_company_data,
+            "scraped_company_status": scraped_company_status,
+            "current_accounts_count": len(current_accounts),
+            "previous_accounts_count": len(previous_accounts),
+            "current_accounts_sample": dict(list(current_accounts.items())[:10]),
+            "previous_accounts_sample": dict(list(previous_accounts.items())[:10]),
+            "current_accounts": current_accounts,
+            "previous_accounts": previous_accounts,  # Add previous year accounts for reclassification
+            "rr_data": rr_data,
+            "br_data": br_data,
+            "ink2_data": ink2_data,
+            "noter_data": noter_data,
+            "fb_variables": fb_variables,
+            "fb_table": fb_table,
+            "rr_count": len(rr_data),
+            "br_count": len(br_data),
+            "ink2_count": len(ink2_data),
+            "noter_count": len(noter_data),
+            "fb_count": len(fb_table),
+            "pension_premier": pension_premier,
+            "sarskild_loneskatt_pension": sarskild_loneskatt_pension,
+            "sarskild_loneskatt_pension_calculated": sarskild_loneskatt_pension_calculated,
+            "two_files_used": True,  # Flag to indicate two files were processed
+            # ORIGINAL VALUES for Bokföringsinstruktion (never modified by INK2 adjustments)
+            "arets_resultat_original": arets_resultat_original,
+            "arets_skatt_original": arets_skatt_original,
+            "__original_rr_snapshot__": original_rr_snapshot,  # Deep snapshot of pre-INK2 RR
+            # Raw SIE file content for troubleshooting
+            "sie_content_current": current_se_content,
+            "sie_content_previous": previous_se_content
+        },
+        "message": "Båda SE-filerna laddades framgångsrikt"
+    }
+    store_upload_result(result_key, result)
+    return result
+    
+
 @app.post("/upload-two-se-files", response_model=dict)
 async def upload_two_se_files(
     current_year_file: UploadFile = File(...),
@@ -1106,245 +1301,10 @@ async def upload_two_se_files(
         raise HTTPException(status_code=400, detail="Föregående års fil måste vara en .SE-fil")
     
     try:
-        # Process current year file (same as single file upload)
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.se') as temp_file:
-            shutil.copyfileobj(current_year_file.file, temp_file)
-            current_temp_path = temp_file.name
-        
-        # Process previous year file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.se') as temp_file:
-            shutil.copyfileobj(previous_year_file.file, temp_file)
-            previous_temp_path = temp_file.name
-        
-        # Read both SE file contents with proper PC8 encoding detection
-        def detect_sie_encoding(file_path: str) -> str:
-            """Detect SIE file encoding based on FORMAT header"""
-            try:
-                # Read first 200 bytes to check format
-                with open(file_path, "rb") as f:
-                    head = f.read(200).decode("latin-1", errors="ignore")
-                
-                if "#FORMAT PC8" in head:
-                    return "cp437"  # IBM CP437 for PC8
-                elif "#FORMAT UTF8" in head:
-                    return "utf-8"
-                else:
-                    return "iso-8859-1"  # Default for older SIE files
-            except Exception:
-                return "iso-8859-1"  # Safe fallback
-        
-        # Read current year file
-        current_detected_encoding = detect_sie_encoding(current_temp_path)
-        current_encodings = [current_detected_encoding, 'cp437', 'iso-8859-1', 'windows-1252', 'utf-8', 'cp1252']
-        current_se_content = None
-        
-        for encoding in current_encodings:
-            try:
-                with open(current_temp_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                    # Apply unicode normalization after reading
-                    import unicodedata
-                    current_se_content = unicodedata.normalize("NFKC", content)
-                    current_se_content = current_se_content.replace("\u00A0", " ").replace("\u200B", "")
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        # Read previous year file  
-        previous_detected_encoding = detect_sie_encoding(previous_temp_path)
-        previous_encodings = [previous_detected_encoding, 'cp437', 'iso-8859-1', 'windows-1252', 'utf-8', 'cp1252']
-        previous_se_content = None
-        
-        for encoding in previous_encodings:
-            try:
-                with open(previous_temp_path, 'r', encoding=encoding) as f:
-                    content = f.read()
-                    # Apply unicode normalization after reading
-                    import unicodedata
-                    previous_se_content = unicodedata.normalize("NFKC", content)
-                    previous_se_content = previous_se_content.replace("\u00A0", " ").replace("\u200B", "")
-                break
-            except UnicodeDecodeError:
-                continue
-        
-        if current_se_content is None:
-            raise HTTPException(status_code=500, detail="Kunde inte läsa nuvarande års SE-fil")
-        if previous_se_content is None:
-            raise HTTPException(status_code=500, detail="Kunde inte läsa föregående års SE-fil")
-        
-        # Use the new database-driven parser with two files flag
-        parser = DatabaseParser()
-        
-        # Extract company info from both files to validate years
-        current_company_info = parser.extract_company_info(current_se_content)
-        previous_company_info = parser.extract_company_info(previous_se_content)
-        
-        # Validate that both files belong to the same company
-        current_org_number = current_company_info.get('organization_number')
-        previous_org_number = previous_company_info.get('organization_number')
-        current_company_name = current_company_info.get('company_name')
-        previous_company_name = previous_company_info.get('company_name')
-        
-        # Check organization numbers first (primary method)
-        if current_org_number and previous_org_number:
-            if current_org_number != previous_org_number:
-                raise HTTPException(
-                    status_code=400,
-                    detail="SIE-filerna verkar vara från olika bolag. Kontrollera att båda filerna tillhör samma företag."
-                )
-        # Fallback to company names if organization numbers are missing
-        elif current_company_name and previous_company_name:
-            if current_company_name.strip().lower() != previous_company_name.strip().lower():
-                raise HTTPException(
-                    status_code=400,
-                    detail="SIE-filerna verkar vara från olika bolag. Kontrollera att båda filerna tillhör samma företag."
-                )
-        # If we can't validate company match, proceed with warning (could add logging here)
-        
-        # Validate that the years are consecutive
-        current_fiscal_year = current_company_info.get('fiscal_year')
-        previous_fiscal_year = previous_company_info.get('fiscal_year')
-        
-        if current_fiscal_year and previous_fiscal_year:
-            # Determine which is the newer and older year
-            fiscal_year = max(current_fiscal_year, previous_fiscal_year)
-            previous_year = min(current_fiscal_year, previous_fiscal_year)
-            
-            # Check that they are consecutive years
-            if fiscal_year - previous_year != 1:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Filerna måste avse två på varandra följande räkenskapsår. Du har laddat upp filer från {fiscal_year} och {previous_year}."
-                )
-            
-            # Ensure we always use the newer year as "current" for annual report generation
-            if current_fiscal_year < previous_fiscal_year:
-                # User uploaded files in reverse order - swap them
-                current_se_content, previous_se_content = previous_se_content, current_se_content
-                current_company_info, previous_company_info = previous_company_info, current_company_info
-        
-        current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(current_se_content)
-        company_info = current_company_info
-        
-        # Scrape additional company information from rating.se
-        scraped_company_data = {}
-        try:
-            scraped_company_data = get_company_info_with_search(
-                orgnr=company_info.get('organization_number'),
-                company_name=company_info.get('company_name')
-            )
-        except Exception as e:
-            scraped_company_data = {"error": str(e)}
-        
-        rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=current_se_content)
-        
-        # Pass RR data to BR parsing with two files flag and previous year SE content
-        br_data = parser.parse_br_data_with_koncern(
-            current_se_content, 
-            current_accounts, 
-            previous_accounts, 
-            rr_data,
-            two_files_flag=True,
-            previous_year_se_content=previous_se_content
-        )
-        
-        # Parse INK2 data (tax calculations) - pass RR data, BR data, SIE content, and previous accounts for account descriptions
-        ink2_data = parser.parse_ink2_data(current_accounts, company_info.get('fiscal_year'), rr_data, br_data, current_se_content, previous_accounts)
-        
-        # ⚠️ CRITICAL: Freeze originals AFTER RR has values, BEFORE inject_ink2_adjustments mutates them
-        temp_data = {'rrData': rr_data}  # Use 'rrData' key that freeze_originals looks for
-        temp_data = freeze_originals(temp_data)
-        arets_resultat_original = temp_data.get('arets_resultat_original')
-        arets_skatt_original = temp_data.get('arets_skatt_original')
-        original_rr_snapshot = temp_data.get('__original_rr_snapshot__')
-        
-        # Inject adjustments for PDF consistency (INK4.1/4.2 ← Årets resultat justerat, INK4.3a ← beräknad skatt)
-        # This may mutate rr_data, but we have a deep snapshot frozen above
-        ink2_data = inject_ink2_adjustments(ink2_data, rr_data)
-        
-        # Parse Noter data (notes) - pass SE content and user toggles if needed
-        try:
-            noter_data = parser.parse_noter_data(
-                current_se_content, 
-                two_files_flag=True, 
-                previous_year_se_content=previous_se_content
-            )
-        except Exception as e:
-            noter_data = []
-        
-        # Parse Förvaltningsberättelse data (FB) - Förändring i eget kapital
-        try:
-            fb_module = ForvaltningsberattelseFB()
-            fb_variables = fb_module.calculate_forandring_eget_kapital(current_se_content, br_data)
-            fb_table = fb_module.generate_forandring_eget_kapital_table(fb_variables)
-        except Exception as e:
-            print(f"Error parsing FB data: {e}")
-            import traceback
-            traceback.print_exc()
-            fb_variables = {}
-            fb_table = []
-        
-        # Calculate pension tax variables for frontend
-        pension_premier = abs(float(current_accounts.get('7410', 0.0)))
-        # Särskild löneskatt can be booked in multiple accounts: 7530, 7531, 7532, 7533
-        sarskild_loneskatt_pension = (
-            abs(float(current_accounts.get('7530', 0.0))) +
-            abs(float(current_accounts.get('7531', 0.0))) +
-            abs(float(current_accounts.get('7532', 0.0))) +
-            abs(float(current_accounts.get('7533', 0.0)))
-        )
-        # Round to 0 decimals for consistency with tax module comparison
-        sarskild_loneskatt_pension = round(sarskild_loneskatt_pension, 0)
-        # Get sarskild_loneskatt rate from global variables
-        sarskild_loneskatt_pension_calculated = pension_premier * 0.2431
-        # Round to 0 decimals for consistency with tax module calculation
-        sarskild_loneskatt_pension_calculated = round(sarskild_loneskatt_pension_calculated, 0)
-        
-        # Store original values in company_info so they're part of seFileData
-        company_info['arets_resultat_original'] = arets_resultat_original
-        company_info['arets_skatt_original'] = arets_skatt_original
-        
-        # Cleanup temporary files
-        os.unlink(current_temp_path)
-        os.unlink(previous_temp_path)
-        
-        return {
-            "success": True,
-            "data": {
-                "company_info": company_info,
-                "scraped_company_data": scraped_company_data,
-                "current_accounts_count": len(current_accounts),
-                "previous_accounts_count": len(previous_accounts),
-                "current_accounts_sample": dict(list(current_accounts.items())[:10]),
-                "previous_accounts_sample": dict(list(previous_accounts.items())[:10]),
-                "current_accounts": current_accounts,
-                "previous_accounts": previous_accounts,  # Add previous year accounts for reclassification
-                "rr_data": rr_data,
-                "br_data": br_data,
-                "ink2_data": ink2_data,
-                "noter_data": noter_data,
-                "fb_variables": fb_variables,
-                "fb_table": fb_table,
-                "rr_count": len(rr_data),
-                "br_count": len(br_data),
-                "ink2_count": len(ink2_data),
-                "noter_count": len(noter_data),
-                "fb_count": len(fb_table),
-                "pension_premier": pension_premier,
-                "sarskild_loneskatt_pension": sarskild_loneskatt_pension,
-                "sarskild_loneskatt_pension_calculated": sarskild_loneskatt_pension_calculated,
-                "two_files_used": True,  # Flag to indicate two files were processed
-                # ORIGINAL VALUES for Bokföringsinstruktion (never modified by INK2 adjustments)
-                "arets_resultat_original": arets_resultat_original,
-                "arets_skatt_original": arets_skatt_original,
-                "__original_rr_snapshot__": original_rr_snapshot,  # Deep snapshot of pre-INK2 RR
-                # Raw SIE file content for troubleshooting
-                "sie_content_current": current_se_content,
-                "sie_content_previous": previous_se_content
-            },
-            "message": "Båda SE-filerna laddades framgångsrikt"
-        }
-        
+        result = await run_upload_stage(_process_two_se_uploads, current_year_file, previous_year_file)
+        return _with_working_session(result)
+    except UploadQueueFull:
+        raise HTTPException(status_code=503, detail="Servern är hårt belastad just nu, försök igen om en stund")
     except HTTPException:
         # Re-raise HTTPExceptions (like our validation errors) without modification
         raise
@@ -1426,6 +1386,20 @@ async def get_company_info(organization_number: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Fel vid hämtning av företagsinfo: {str(e)}")
 
+@app.get("/api/company-scrape/{organization_number}")
+async def get_company_scrape_status(organization_number: str):
+    """
+    Status för bakgrundshämtningen av företagsinformation (rating.se/Ratsit).
+    Startar en ny hämtning om ingen finns för organisationsnumret.
+    """
+    job = get_company_scrape(organization_number)
+    if job is None:
+        try:
+            job = start_company_scrape(organization_number)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Ogiltigt organisationsnummer")
+    return job
+
 @app.get("/api/bolagsverket/officers/{organization_number}")
 async def get_bolagsverket_officers(organization_number: str):
     """
@@ -1933,6 +1907,7 @@ async def update_formula(row_id: int, formula: str):
     try:
         parser = DatabaseParser()
         success = parser.update_calculation_formula(row_id, formula)
+        invalidate_mapping_cache()
         
         if success:
             return {"success": True, "message": f"Formula updated for row {row_id}"}
@@ -1981,10 +1956,11 @@ async def test_parser(file: UploadFile = File(...)):
         
         # Initialize parser
         parser = DatabaseParser()
+        sie_doc = SieDocument.parse(se_content)
         
         # Parse data
-        current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(se_content)
-        company_info = parser.extract_company_info(se_content)
+        current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = parser.parse_account_balances(sie_doc)
+        company_info = parser.extract_company_info(sie_doc)
         
         # Scrape additional company information from rating.se
         scraped_company_data = {}
@@ -2001,9 +1977,9 @@ async def test_parser(file: UploadFile = File(...)):
 
             scraped_company_data = {"error": str(e)}
         
-        rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=se_content)
+        rr_data = parser.parse_rr_data(current_accounts, previous_accounts, sie_text=sie_doc)
         # Use koncern-aware BR parsing for automatic reconciliation with K2 notes
-        br_data = parser.parse_br_data_with_koncern(se_content, current_accounts, previous_accounts, rr_data)
+        br_data = parser.parse_br_data_with_koncern(sie_doc, current_accounts, previous_accounts, rr_data)
         
         print(f"Parsed {len(current_accounts)} current year accounts, {len(previous_accounts)} previous year accounts")
         print(f"Generated {len(rr_data)} RR items, {len(br_data)} BR items")
@@ -2106,6 +2082,8 @@ async def write_database_table(table_name: str, data: dict):
     try:
         rows = data.get('rows', [])
         success = db.write_table(table_name, rows)
+        # Mapping tables may have changed - next parse reloads the snapshot
+        invalidate_mapping_cache()
         return {
             "success": success,
             "table": table_name,
@@ -2174,6 +2152,8 @@ async def add_sarskild_loneskatt_mapping():
             block='INK4',
             header='FALSE'
         )
+        if success:
+            invalidate_mapping_cache()
         
         return {
             "success": success,
@@ -2185,15 +2165,16 @@ async def add_sarskild_loneskatt_mapping():
         raise HTTPException(status_code=500, detail=f"Error adding sarskild loneskatt mapping: {str(e)}")
 
 class RecalculateRequest(BaseModel):
-    current_accounts: dict
+    current_accounts: Optional[dict] = None  # Taken from the working session when omitted
     fiscal_year: Optional[int] = None
-    rr_data: List[dict]
-    br_data: List[dict]
+    rr_data: Optional[List[dict]] = None
+    br_data: Optional[List[dict]] = None
     manual_amounts: dict
     justering_sarskild_loneskatt: Optional[float] = 0.0
     ink4_14a_outnyttjat_underskott: Optional[float] = 0.0
     ink4_16_underskott_adjustment: Optional[float] = 0.0
     is_chat_injection: Optional[bool] = False
+    session_id: Optional[str] = None
 
 @app.get("/api/chat-flow/{step_number}")
 async def get_chat_flow_step(step_number: int):
@@ -4015,6 +3996,20 @@ async def recalculate_ink2(request: RecalculateRequest):
     """
     Recalculate INK2 data with manual amounts and adjustments
     """
+    # Accounts/RR/BR not sent -> read them from the working session's seFileData. That is the
+    # seFileData as of the client's last sync (generator/save request), not unsynced edits,
+    # so the frontend still sends the rows it recalculates from.
+    if request.session_id:
+        try:
+            se_file_data = get_working_session(request.session_id).company_data.get('seFileData') or {}
+        except WorkingSessionNotFound:
+            raise HTTPException(status_code=404, detail="Arbetssessionen finns inte längre, skicka data igen")
+        for field in ('current_accounts', 'rr_data', 'br_data'):
+            if getattr(request, field) is None:
+                setattr(request, field, se_file_data.get(field))
+    if request.current_accounts is None or request.rr_data is None or request.br_data is None:
+        raise HTTPException(status_code=400, detail="current_accounts, rr_data and br_data (or session_id) are required")
+    
     try:
         parser = DatabaseParser()
         
@@ -4049,8 +4044,9 @@ async def recalculate_ink2(request: RecalculateRequest):
         if rr_252_has_slp:
             manual_amounts['justering_sarskild_loneskatt'] = 0.0
         
-        # Parse INK2 data with manual overrides
-        ink2_data = parser.parse_ink2_data_with_overrides(
+        # Parse INK2 data with manual overrides (incrementally, only rows affected by changed amounts)
+        ink2_data = recalculate_ink2_rows(
+            parser,
             current_accounts=current_accounts,
             fiscal_year=request.fiscal_year or datetime.now().year,
             rr_data=request.rr_data,
@@ -4988,6 +4984,66 @@ async def update_tax_in_financial_data(request: TaxUpdateRequest):
         print(f"Error updating tax in financial data: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error updating tax in financial data: {str(e)}")
 
+def _request_company_data(payload: dict) -> dict:
+    """companyData of a generator request, on top of the working session when a sessionId is sent"""
+    try:
+        return resolve_company_data(payload)
+    except WorkingSessionNotFound:
+        raise HTTPException(status_code=404, detail="Arbetssessionen finns inte längre, skicka companyData igen")
+
+
+def _not_modified(request: Request, key: str):
+    """304 when the client already has this artifact version (If-None-Match), else None"""
+    from fastapi.responses import Response
+    
+    if etag_matches(request.headers.get('if-none-match'), key):
+        return Response(status_code=304, headers={'ETag': f'W/"{key}"', 'Cache-Control': 'private, no-cache'})
+    return None
+
+
+@app.post("/api/session")
+async def create_session(request: Request):
+    """
+    Store companyData server-side; later requests can send {"sessionId": ...}
+    (plus any partial companyData) instead of the full payload
+    """
+    payload = await request.json()
+    session = create_working_session(payload.get('companyData') or {})
+    return {"success": True, "session_id": session.session_id, "version": session.version}
+
+
+@app.get("/api/session/{session_id}")
+async def get_session(session_id: str):
+    try:
+        session = get_working_session(session_id)
+    except WorkingSessionNotFound:
+        raise HTTPException(status_code=404, detail="Arbetssessionen finns inte")
+    return {"success": True, "session_id": session.session_id, "version": session.version,
+            "companyData": session.company_data}
+
+
+@app.patch("/api/session/{session_id}")
+async def patch_session(session_id: str, request: Request):
+    """
+    Apply a JSON merge patch to the session's companyData:
+    {"patch": {"noterData": [...], "fiscalYear": null}, "version": 3}
+    version is optional; when sent, a stale version gives 409
+    """
+    payload = await request.json()
+    try:
+        session = patch_working_session(session_id, payload.get('patch') or {}, payload.get('version'))
+    except WorkingSessionNotFound:
+        raise HTTPException(status_code=404, detail="Arbetssessionen finns inte")
+    except WorkingSessionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"success": True, "session_id": session.session_id, "version": session.version}
+
+
+@app.delete("/api/session/{session_id}")
+async def delete_session(session_id: str):
+    return {"success": delete_working_session(session_id)}
+
+
 @app.post("/api/pdf/annual-report")
 async def pdf_annual_report(request: Request):
     """
@@ -4996,13 +5052,18 @@ async def pdf_annual_report(request: Request):
            Balansräkning (eget kapital och skulder), Noter
     """
     try:
-        from services.pdf_annual_report import generate_full_annual_report_pdf
         from fastapi.responses import Response
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
-        pdf_bytes = generate_full_annual_report_pdf(company_data)
+        key = artifact_key('annual-report', company_data)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
+        # Cached render, else rendered on the process pool so the event loop stays free
+        pdf_bytes = await render_annual_report_pdf(company_data, key)
         
         # Extract name and fiscal year for filename
         name = (company_data.get('company_name') 
@@ -5017,13 +5078,12 @@ async def pdf_annual_report(request: Request):
         return Response(
             content=pdf_bytes,
             media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=artifact_headers(filename, key)
         )
+    except HTTPException:
+        raise
+    except RenderQueueFull:
+        raise HTTPException(status_code=503, detail="Servern är hårt belastad just nu, försök igen om en stund")
     except Exception as e:
         print(f"Error generating PDF: {str(e)}")
         import traceback
@@ -5032,13 +5092,12 @@ async def pdf_annual_report(request: Request):
 
 
 @app.get("/api/pdf/annual-report/{report_id}")
-async def pdf_annual_report_from_stored(report_id: str):
+async def pdf_annual_report_from_stored(report_id: str, request: Request):
     """
     Generate full annual report PDF using stored data from annual_report_data table.
     Uses the full company_data column which contains all original data.
     """
     try:
-        from services.pdf_annual_report import generate_full_annual_report_pdf
         from fastapi.responses import Response
         
         supabase = get_supabase_client()
@@ -5060,7 +5119,13 @@ async def pdf_annual_report_from_stored(report_id: str):
         if not company_data:
             raise HTTPException(status_code=400, detail="No company data stored for this report")
         
-        pdf_bytes = generate_full_annual_report_pdf(company_data)
+        key = artifact_key('annual-report', company_data)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
+        # Cached render of this report version, else rendered on the process pool and stored
+        pdf_bytes = await render_annual_report_pdf(company_data, key)
         
         # Extract name and fiscal year for filename
         company_name = report.get('company_name') or 'bolag'
@@ -5072,15 +5137,12 @@ async def pdf_annual_report_from_stored(report_id: str):
         return Response(
             content=pdf_bytes,
             media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=artifact_headers(filename, key)
         )
     except HTTPException:
         raise
+    except RenderQueueFull:
+        raise HTTPException(status_code=503, detail="Servern är hårt belastad just nu, försök igen om en stund")
     except Exception as e:
         print(f"Error generating PDF from stored data: {str(e)}")
         import traceback
@@ -5088,8 +5150,52 @@ async def pdf_annual_report_from_stored(report_id: str):
         raise HTTPException(status_code=500, detail=f"Error generating PDF: {str(e)}")
 
 
+class AnnualReportRenderBatchRequest(BaseModel):
+    report_ids: List[str]
+
+
+@app.post("/api/pdf/annual-report/batch-render")
+async def pdf_annual_report_batch_render(request: AnnualReportRenderBatchRequest):
+    """
+    Render and store annual report PDFs for many stored reports in the background
+    (e.g. every signed report overnight). Poll GET /api/pdf/annual-report/batch-render/{job_id};
+    GET /api/pdf/annual-report/{report_id} then serves the PDF from the artifact cache.
+    """
+    try:
+        from services.ink2_batch_export import unique_report_ids
+        
+        report_ids = unique_report_ids(request.report_ids)
+        if not report_ids:
+            raise HTTPException(status_code=400, detail="report_ids is required")
+        if len(report_ids) > ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS:
+            raise HTTPException(status_code=400, detail=f"At most {ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS} reports per batch")
+        
+        supabase = get_supabase_client()
+        if not supabase:
+            raise HTTPException(status_code=503, detail="Database service temporarily unavailable")
+        
+        # company_data is fetched page by page as the job runs; missing ids end up in not_found
+        return start_render_batch(supabase, report_ids)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error starting annual report batch render: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error starting batch render: {str(e)}")
+
+
+@app.get("/api/pdf/annual-report/batch-render/{job_id}")
+async def pdf_annual_report_batch_render_status(job_id: str):
+    """Progress of a batch render job (rendered / cached / failed of total)"""
+    job = get_render_batch(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Render job not found")
+    return job
+
+
 @app.get("/api/pdf/ink2-form/{report_id}")
-async def pdf_ink2_form_from_stored(report_id: str):
+async def pdf_ink2_form_from_stored(report_id: str, request: Request):
     """
     Generate filled INK2 tax declaration PDF form from stored data.
     """
@@ -5120,8 +5226,13 @@ async def pdf_ink2_form_from_stored(report_id: str):
         if not organization_number:
             raise HTTPException(status_code=400, detail="No organization number for this report")
         
-        # Generate filled PDF
-        pdf_bytes = generate_filled_ink2_pdf(organization_number, fiscal_year, company_data)
+        key = artifact_key('ink2-form', company_data, organization_number=organization_number, fiscal_year=fiscal_year)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
+        # Generate filled PDF (cached per report version and day)
+        pdf_bytes = get_or_create_artifact('ink2-form', key, lambda: generate_filled_ink2_pdf(organization_number, fiscal_year, company_data))
         
         # Extract name for filename
         company_name = report.get('company_name') or 'bolag'
@@ -5131,12 +5242,7 @@ async def pdf_ink2_form_from_stored(report_id: str):
         return Response(
             content=pdf_bytes,
             media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=artifact_headers(filename, key)
         )
     except HTTPException:
         raise
@@ -5148,7 +5254,7 @@ async def pdf_ink2_form_from_stored(report_id: str):
 
 
 @app.get("/api/sru/generate/{report_id}")
-async def generate_sru_from_stored(report_id: str):
+async def generate_sru_from_stored(report_id: str, request: Request):
     """
     Generate SRU files from stored data.
     """
@@ -5175,8 +5281,13 @@ async def generate_sru_from_stored(report_id: str):
         if not company_data:
             raise HTTPException(status_code=400, detail="No company data stored for this report")
         
-        # Generate SRU files - returns a zip file as bytes
-        zip_bytes = generate_sru_file(company_data)
+        key = artifact_key('sru', company_data)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
+        # Generate SRU files - returns a zip file as bytes (cached per report version and day)
+        zip_bytes = get_or_create_artifact('sru', key, lambda: generate_sru_file(company_data))
         
         company_name = report.get('company_name') or 'bolag'
         filename = f'INK2_{company_name}.zip'
@@ -5184,6 +5295,57 @@ async def generate_sru_from_stored(report_id: str):
         return Response(
             content=zip_bytes,
             media_type='application/zip',
+            headers=artifact_headers(filename, key)
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error generating SRU from stored data: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Error generating SRU: {str(e)}")
+
+
+class Ink2BatchExportRequest(BaseModel):
+    report_ids: List[str]
+    include_sru: bool = True
+    include_pdf: bool = True
+
+
+@app.post("/api/ink2/batch-export")
+async def ink2_batch_export(request: Ink2BatchExportRequest):
+    """
+    SRU files (INFO.SRU + BLANKETTER.SRU) and filled INK2 PDFs for many stored reports,
+    streamed as one ZIP with a folder per report. Missing or failing reports are listed
+    in ERRORS.txt.
+    """
+    try:
+        from services.ink2_batch_export import (
+            INK2_EXPORT_MAX_REPORTS, fetch_reports, stream_ink2_export, unique_report_ids
+        )
+        from fastapi.responses import StreamingResponse
+        
+        report_ids = unique_report_ids(request.report_ids)
+        if not report_ids:
+            raise HTTPException(status_code=400, detail="report_ids is required")
+        if len(report_ids) > INK2_EXPORT_MAX_REPORTS:
+            raise HTTPException(status_code=400, detail=f"At most {INK2_EXPORT_MAX_REPORTS} reports per export")
+        if not request.include_sru and not request.include_pdf:
+            raise HTTPException(status_code=400, detail="Nothing to export")
+        
+        supabase = get_supabase_client()
+        if not supabase:
+            raise HTTPException(status_code=503, detail="Database service temporarily unavailable")
+        
+        # Only the ids here; company_data is fetched window by window while the ZIP streams
+        if not fetch_reports(supabase, report_ids, columns='id'):
+            raise HTTPException(status_code=404, detail="No reports found")
+        
+        filename = f'INK2_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.zip'
+        
+        return StreamingResponse(
+            stream_ink2_export(supabase, report_ids, include_sru=request.include_sru, include_pdf=request.include_pdf),
+            media_type='application/zip',
             headers={
                 'Content-Disposition': f'attachment; filename="{filename}"',
                 'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
@@ -5194,14 +5356,14 @@ async def generate_sru_from_stored(report_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error generating SRU from stored data: {str(e)}")
+        print(f"Error in INK2 batch export: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Error generating SRU: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error in INK2 batch export: {str(e)}")
 
 
 @app.get("/api/pdf/bokforing-instruktion/{report_id}")
-async def pdf_bokforing_instruktion_from_stored(report_id: str):
+async def pdf_bokforing_instruktion_from_stored(report_id: str, request: Request):
     """
     Generate Bokföringsinstruktion PDF from stored data.
     """
@@ -5228,8 +5390,13 @@ async def pdf_bokforing_instruktion_from_stored(report_id: str):
         if not company_data:
             raise HTTPException(status_code=400, detail="No company data stored for this report")
         
-        # Generate PDF - may return None if no adjustments needed
-        pdf_bytes = generate_bokforing_instruktion_pdf(company_data)
+        key = artifact_key('bokforing-instruktion', company_data)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
+        # Generate PDF - may return None if no adjustments needed (not cached)
+        pdf_bytes = get_or_create_artifact('bokforing-instruktion', key, lambda: generate_bokforing_instruktion_pdf(company_data))
         
         if not pdf_bytes:
             raise HTTPException(status_code=400, detail="Ingen bokföringsinstruktion krävs - inga justeringar behövs")
@@ -5243,12 +5410,7 @@ async def pdf_bokforing_instruktion_from_stored(report_id: str):
         return Response(
             content=pdf_bytes,
             media_type='application/pdf',
-            headers={
-                'Content-Disposition': f'attachment; filename="{filename}"',
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=artifact_headers(filename, key)
         )
     except HTTPException:
         raise
@@ -5270,7 +5432,7 @@ async def pdf_ink2_form(request: Request):
         from fastapi.responses import Response
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
         # Extract organization_number and fiscal_year
         organization_number = (company_data.get('organization_number') 
@@ -5307,6 +5469,8 @@ async def pdf_ink2_form(request: Request):
                 'Expires': '0'
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating INK2 PDF: {str(e)}")
         import traceback
@@ -5324,7 +5488,7 @@ async def generate_sru(request: Request):
         from fastapi.responses import Response
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
         # Extract organization_number and fiscal_year for validation
         organization_number = (company_data.get('organization_number') 
@@ -5364,6 +5528,8 @@ async def generate_sru(request: Request):
                 'Expires': '0'
             }
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating SRU files: {str(e)}")
         import traceback
@@ -5377,11 +5543,11 @@ async def generate_xbrl(request: Request):
     Returns XBRL XML file following Swedish XBRL taxonomy standards
     """
     try:
-        from services.xbrl_generator import generate_xbrl_instance_document
+        from services.xbrl_generator import XBRL_SUBSET_FONTS, XBRL_SUBSET_FONT_FORMAT, generate_xbrl_instance_document
         from fastapi.responses import Response
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
         # Extract organization_number and fiscal_year for validation
         organization_number = (company_data.get('organization_number') 
@@ -5397,8 +5563,19 @@ async def generate_xbrl(request: Request):
         if not fiscal_year:
             raise HTTPException(status_code=400, detail="fiscal_year is required")
         
+        # subsetFonts: embed only the glyphs the report uses (default: XBRL_SUBSET_FONTS).
+        # Key on the effective mode and subset format (ttf/woff2), so an env change never
+        # serves a file built with other font settings.
+        subset_fonts = payload.get('subsetFonts')
+        subset_fonts = XBRL_SUBSET_FONTS if subset_fonts is None else bool(subset_fonts)
+        key = artifact_key('xbrl', company_data, subset_fonts=subset_fonts,
+                           subset_font_format=XBRL_SUBSET_FONT_FORMAT if subset_fonts else None)
+        not_modified = _not_modified(request, key)
+        if not_modified:
+            return not_modified
+        
         # Generate XBRL instance document
-        xbrl_xml_bytes = generate_xbrl_instance_document(company_data)
+        xbrl_xml_bytes = get_or_create_artifact('xbrl', key, lambda: generate_xbrl_instance_document(company_data, subset_fonts))
         
         # Extract name for filename
         name = (company_data.get('company_name') 
@@ -5414,13 +5591,10 @@ async def generate_xbrl(request: Request):
         return Response(
             content=xbrl_xml_bytes,
             media_type='application/xhtml+xml',
-            headers={
-                'Content-Disposition': f'attachment; filename="{xbrl_filename}"',
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+            headers=artifact_headers(xbrl_filename, key)
         )
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating XBRL document: {str(e)}")
         import traceback
@@ -5441,11 +5615,13 @@ async def check_bokforing_instruktion(request: Request):
         from services.pdf_bokforing_instruktion import check_should_generate
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
         should_generate = check_should_generate(company_data)
         
         return {"shouldGenerate": should_generate}
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error checking Bokföringsinstruktion requirements: {str(e)}")
         import traceback
@@ -5466,7 +5642,7 @@ async def pdf_bokforing_instruktion(request: Request):
         from fastapi.responses import Response
         
         payload = await request.json()
-        company_data = payload.get('companyData', {})
+        company_data = _request_company_data(payload)
         
         # Check if PDF should be generated
         if not check_should_generate(company_data):
@@ -5705,8 +5881,9 @@ async def token_login(request: dict):
 
 class AnnualReportDataRequest(BaseModel):
     """Request body for saving annual report data - accepts full companyData like XBRL export"""
-    companyData: dict  # Full companyData object - backend extracts what it needs
+    companyData: Optional[dict] = None  # Full companyData object - backend extracts what it needs
     status: Optional[str] = "draft"  # draft, submitted, signed
+    sessionId: Optional[str] = None  # Working session; companyData is then merged on top of it
 
 
 def _format_date_for_db(date_str: str) -> Optional[str]:
@@ -6042,7 +6219,7 @@ async def save_annual_report_data(request: AnnualReportDataRequest):
         if not supabase:
             raise HTTPException(status_code=503, detail="Database service temporarily unavailable")
         
-        company_data = request.companyData
+        company_data = _request_company_data({'companyData': request.companyData, 'sessionId': request.sessionId})
         
         # Extract company info (same pattern as XBRL generator)
         se_file_data = company_data.get('seFileData', {})
@@ -6592,10 +6769,12 @@ async def get_annual_report_for_view(report_id: str):
         fiscal_year_end = report.get('fiscal_year_end')
         fiscal_year = int(fiscal_year_end[:4]) if fiscal_year_end else None
         
-        # Extract scraped_company_data from stored company_data
+        # Extract scraped_company_data from stored company_data (top level first: the background
+        # scrape may finish after the upload, same rule as save_annual_report_data)
         stored_company_data = report.get('company_data') or {}
-        se_file_data = stored_company_data.get('seFileData', {})
-        scraped_company_data = se_file_data.get('scraped_company_data', {})
+        se_file_data = stored_company_data.get('seFileData') or {}
+        scraped_company_data = (stored_company_data.get('scraped_company_data')
+                                or se_file_data.get('scraped_company_data') or {})
         
         # Extract employee count for NOT2
         nyckeltal = scraped_company_data.get('nyckeltal', {})
@@ -6826,10 +7005,11 @@ class ReclassificationRequest(BaseModel):
     to_row_id: int
     balance_current: float
     balance_previous: Optional[float] = 0
-    br_data: List[Dict]
+    br_data: Optional[List[Dict]] = None  # Taken from the working session (as last synced) when omitted
     rr_data: Optional[List[Dict]] = None
     current_accounts: Optional[Dict] = None
     previous_accounts: Optional[Dict] = None
+    session_id: Optional[str] = None
 
 
 @app.post("/api/apply-reclassification")
@@ -6848,6 +7028,19 @@ async def apply_reclassification(request: ReclassificationRequest):
         balance_current = request.balance_current
         balance_previous = request.balance_previous or 0
         br_data = request.br_data
+        rr_data = request.rr_data
+        if request.session_id and (br_data is None or rr_data is None):
+            try:
+                se_file_data = get_working_session(request.session_id).company_data.get('seFileData') or {}
+            except WorkingSessionNotFound:
+                raise HTTPException(status_code=404, detail="Arbetssessionen finns inte längre, skicka data igen")
+            # Rows are updated in place below; session data is shared, so work on a copy
+            if br_data is None:
+                br_data = copy.deepcopy(se_file_data.get('br_data') or [])
+            if rr_data is None:
+                rr_data = se_file_data.get('rr_data')
+        if br_data is None:
+            raise HTTPException(status_code=400, detail="br_data (or session_id) is required")
         
         print(f"🔄 Reclassifying account {account_id} from row {from_row_id} to row {to_row_id}")
         print(f"   Balance: current={balance_current}, previous={balance_previous}")
@@ -6928,7 +7121,7 @@ async def apply_reclassification(request: ReclassificationRequest):
         # We need to recalculate all sum rows that include either the source or target row
         # IMPORTANT: Must pass rr_data to preserve RR-driven values like AretsResultat
         parser = DatabaseParser()
-        rr_data = request.rr_data or []
+        rr_data = rr_data or []
         br_data = parser._recalculate_sum_rows(br_data, rr_data)
         
         # Create reclassification record for storage
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import requests, re, json
+import requests, re, json, os, sqlite3, tempfile, threading, time
 import requests.utils
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 from typing import Optional, List, Dict
 
@@ -14,6 +16,76 @@ BASE_BIZ = "https://www.rating.se/info1/detail/biz/{orgnr}"
 
 HEADERS = {"User-Agent": "Mozilla/5.0"}
 
+# ---- HTTP POOL / CACHE SETTINGS ----
+SCRAPER_MAX_CONCURRENCY = max(1, int(os.getenv("SCRAPER_MAX_CONCURRENCY", "8")))
+SCRAPE_CACHE_TTL_SECONDS = int(os.getenv("SCRAPE_CACHE_TTL_SECONDS", str(24 * 3600)))
+SCRAPE_CACHE_PATH = os.getenv("SCRAPE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "summare_scrape_cache.sqlite3"))
+
+# ====================================================
+# =============== Shared HTTP client =================
+# ====================================================
+
+# One keep-alive connection pool for rating.se, allabolag.se and ratsit.se
+_session = requests.Session()
+_session.headers.update(HEADERS)
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=SCRAPER_MAX_CONCURRENCY)
+_session.mount("https://", _adapter)
+_session.mount("http://", _adapter)
+
+# Fetches pages concurrently; callers only wait on futures they submitted themselves
+_fetch_pool = ThreadPoolExecutor(max_workers=SCRAPER_MAX_CONCURRENCY, thread_name_prefix="rating-scraper")
+
+def _http_get(url: str, timeout: int = 20) -> requests.Response:
+    return _session.get(url, timeout=timeout)
+
+# ====================================================
+# =============== Result cache (per orgnr) ===========
+# ====================================================
+
+_cache_lock = threading.Lock()
+
+def _cache_key(orgnr: str) -> str:
+    return re.sub(r"\D", "", orgnr or "")
+
+def _cache_connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(SCRAPE_CACHE_PATH, timeout=5)
+    conn.execute("CREATE TABLE IF NOT EXISTS company_info (orgnr TEXT PRIMARY KEY, fetched_at REAL NOT NULL, data TEXT NOT NULL)")
+    return conn
+
+def get_cached_company_info(orgnr: str) -> Optional[Dict]:
+    """Cached get_company_info result for orgnr if younger than SCRAPE_CACHE_TTL_SECONDS."""
+    key = _cache_key(orgnr)
+    if not key or SCRAPE_CACHE_TTL_SECONDS <= 0:
+        return None
+    try:
+        with _cache_lock:
+            conn = _cache_connect()
+            try:
+                row = conn.execute("SELECT fetched_at, data FROM company_info WHERE orgnr = ?", (key,)).fetchone()
+            finally:
+                conn.close()
+    except sqlite3.Error:
+        return None
+    if not row or time.time() - row[0] > SCRAPE_CACHE_TTL_SECONDS:
+        return None
+    return json.loads(row[1])
+
+def store_cached_company_info(orgnr: str, data: Dict) -> None:
+    key = _cache_key(orgnr)
+    if not key or SCRAPE_CACHE_TTL_SECONDS <= 0:
+        return
+    try:
+        with _cache_lock:
+            conn = _cache_connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO company_info (orgnr, fetched_at, data) VALUES (?, ?, ?)",
+                                 (key, time.time(), json.dumps(data, ensure_ascii=False)))
+            finally:
+                conn.close()
+    except sqlite3.Error:
+        pass
+
 # ====================================================
 # =============== Rating.se Scraper ==================
 # ====================================================
@@ -30,7 +102,7 @@ def search_organization_number(company_name: str) -> Optional[str]:
         # Try allabolag.se search first
         search_url = f"https://www.allabolag.se/what/{requests.utils.quote(search_name)}"
 
-        r = requests.get(search_url, timeout=20, headers=HEADERS)
+        r = _http_get(search_url)
         
         if r.status_code == 200:
             # Look for organization number pattern in response
@@ -41,7 +113,7 @@ def search_organization_number(company_name: str) -> Optional[str]:
         # Fallback: try ratsit.se search
         ratsit_search_url = f"https://www.ratsit.se/sok/foretag/{requests.utils.quote(search_name)}"
 
-        r2 = requests.get(ratsit_search_url, timeout=20, headers=HEADERS)
+        r2 = _http_get(ratsit_search_url)
         
         if r2.status_code == 200:
             soup = BeautifulSoup(r2.text, "html.parser")
@@ -72,7 +144,7 @@ def clean_orgnr_for_url(orgnr: str) -> str:
 def scrape_numbers(orgnr: str) -> dict:
     clean_orgnr = clean_orgnr_for_url(orgnr)
     url = BASE_NUMBERS.format(orgnr=clean_orgnr)
-    r = requests.get(url, timeout=20, headers=HEADERS); r.raise_for_status()
+    r = _http_get(url); r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
 
     nyckeltal = {}
@@ -119,7 +191,7 @@ def scrape_numbers(orgnr: str) -> dict:
 def scrape_people(orgnr: str) -> dict:
     clean_orgnr = clean_orgnr_for_url(orgnr)
     url = BASE_PEOPLE.format(orgnr=clean_orgnr)
-    r = requests.get(url, timeout=20, headers=HEADERS); r.raise_for_status()
+    r = _http_get(url); r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
 
     data = {"styrelse": [], "vd": None}
@@ -138,7 +210,7 @@ def scrape_people(orgnr: str) -> dict:
 def scrape_overview(orgnr: str) -> dict:
     clean_orgnr = clean_orgnr_for_url(orgnr)
     url = BASE_OVERVIEW.format(orgnr=clean_orgnr)
-    r = requests.get(url, timeout=20, headers=HEADERS); r.raise_for_status()
+    r = _http_get(url); r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
 
     data = {"company_name": None,"moderbolag": None,"moderbolag_orgnr": None,"antal_dotterbolag": None,"säte": None}
@@ -177,7 +249,7 @@ def scrape_overview(orgnr: str) -> dict:
 def scrape_biz(orgnr: str) -> dict:
     clean_orgnr = clean_orgnr_for_url(orgnr)
     url = BASE_BIZ.format(orgnr=clean_orgnr)
-    r = requests.get(url, timeout=20, headers=HEADERS); r.raise_for_status()
+    r = _http_get(url); r.raise_for_status()
     soup = BeautifulSoup(r.text, "html.parser")
 
     data = {"verksamhetsbeskrivning": None}
@@ -192,8 +264,8 @@ def scrape_biz(orgnr: str) -> dict:
 # ====================================================
 
 def fetch_ratsit_page(orgnr: str) -> str:
-    url = f"https://www.ratsit.se/{re.sub(r'\\D','',orgnr)}"
-    r = requests.get(url, timeout=20, headers=HEADERS)
+    url = "https://www.ratsit.se/" + re.sub(r"\D", "", orgnr)
+    r = _http_get(url)
     if r.status_code == 200:
         return r.text
     return ""
@@ -227,9 +299,9 @@ def parse_subsidiaries_from_ratsit(html: str) -> List[Dict]:
     return subs
 
 def get_sate_from_ratsit(orgnr: str) -> Optional[str]:
-    url = f"https://www.ratsit.se/{re.sub(r'\\D','', orgnr)}"
+    url = "https://www.ratsit.se/" + re.sub(r"\D", "", orgnr)
     try:
-        r = requests.get(url, timeout=20, headers=HEADERS)
+        r = _http_get(url)
         if r.status_code != 200:
             return None
         soup = BeautifulSoup(r.text, "html.parser")
@@ -247,35 +319,47 @@ def get_sate_from_ratsit(orgnr: str) -> Optional[str]:
         return None
     return None
 
+def _enrich_subsidiary(s: Dict) -> Dict:
+    orgnr = s.get("org_number")
+    if orgnr:
+        seat = None
+        try:
+            ov = scrape_overview(orgnr)
+            seat = ov.get("säte")
+            if ov.get("company_name"):
+                s["name"] = ov["company_name"]
+        except Exception:
+            pass
+        # fallback på Ratsit
+        if not seat:
+            seat = get_sate_from_ratsit(orgnr)
+        s["säte"] = seat
+    return s
+
 def enrich_subsidiaries(subs: List[Dict]) -> List[Dict]:
-    enriched = []
-    for s in subs:
-        orgnr = s.get("org_number")
-        if orgnr:
-            seat = None
-            try:
-                ov = scrape_overview(orgnr)
-                seat = ov.get("säte")
-                if ov.get("company_name"):
-                    s["name"] = ov["company_name"]
-            except Exception:
-                pass
-            # fallback på Ratsit
-            if not seat:
-                seat = get_sate_from_ratsit(orgnr)
-            s["säte"] = seat
-        enriched.append(s)
-    return enriched
+    # Slå upp alla dotterbolag parallellt, behåll ordningen
+    futures = [_fetch_pool.submit(_enrich_subsidiary, s) for s in subs]
+    return [f.result() for f in futures]
 
 # ====================================================
 # =============== Main Orchestration =================
 # ====================================================
 
-def get_company_info(orgnr: str) -> Dict:
-    nyckeltal = scrape_numbers(orgnr)
-    people = scrape_people(orgnr)
-    overview = scrape_overview(orgnr)
-    biz = scrape_biz(orgnr)
+def get_company_info(orgnr: str, use_cache: bool = True) -> Dict:
+    if use_cache:
+        cached = get_cached_company_info(orgnr)
+        if cached is not None:
+            return cached
+
+    # De fyra rating.se-sidorna hämtas parallellt
+    f_numbers = _fetch_pool.submit(scrape_numbers, orgnr)
+    f_people = _fetch_pool.submit(scrape_people, orgnr)
+    f_overview = _fetch_pool.submit(scrape_overview, orgnr)
+    f_biz = _fetch_pool.submit(scrape_biz, orgnr)
+    nyckeltal = f_numbers.result()
+    people = f_people.result()
+    overview = f_overview.result()
+    biz = f_biz.result()
 
     result = {
         "orgnr": orgnr,
@@ -296,6 +380,7 @@ def get_company_info(orgnr: str) -> Dict:
         subs = parse_subsidiaries_from_ratsit(html)
         result["dotterbolag"] = enrich_subsidiaries(subs)
 
+    store_cached_company_info(orgnr, result)
     return result
 
 def get_company_info_with_search(orgnr: Optional[str] = None, company_name: Optional[str] = None) -> Dict:
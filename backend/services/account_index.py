@@ -0,0 +1,189 @@
+"""
+Account Index Module
+Compiled account specs for the mapping tables and a sorted index over account balances.
+
+Mapping rows describe their accounts as start/end columns plus strings like
+"4910-4931;4960" (accounts_included / accounts_excluded). Those are compiled
+once per distinct spec into tuples of range/single terms, and the balances are
+kept as a sorted integer array so each range is answered with two bisect
+lookups instead of walking every account number in the range.
+
+Usage:
+    index = AccountIndex.coerce(current_accounts)
+    spec = compile_variable_spec(mapping)
+    total = index.apply_terms(0.0, spec.included)
+    total = index.apply_terms(total, spec.excluded, sign=-1)
+    index.sum_included(compile_accounts_included("6000-6999;7010"))
+"""
+
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+# ('range', lo, hi) or ('single', '1930')
+Term = Tuple[Any, ...]
+
+
+class VariableSpec(NamedTuple):
+    """Compiled account columns of an RR/BR mapping row."""
+    included: Tuple[Term, ...]
+    excluded: Tuple[Term, ...]
+    should_reverse: bool
+
+
+def _parse_terms(spec_text: Optional[str], separators: str) -> Tuple[Term, ...]:
+    if not spec_text:
+        return ()
+    text = spec_text
+    for sep in separators[1:]:
+        text = text.replace(sep, separators[0])
+    terms: List[Term] = []
+    for spec in text.split(separators[0]):
+        spec = spec.strip()
+        if not spec:
+            continue
+        if '-' in spec:
+            try:
+                start, end = spec.split('-')
+                terms.append(('range', int(start.strip()), int(end.strip())))
+            except ValueError:
+                print(f"Invalid range format: {spec}")
+        else:
+            terms.append(('single', spec))
+    return tuple(terms)
+
+
+@lru_cache(maxsize=4096)
+def _compile_variable_spec(start, end, included: Optional[str], excl_start, excl_end, excluded: Optional[str]) -> VariableSpec:
+    inc: List[Term] = []
+    if start and end:
+        inc.append(('range', int(start), int(end)))
+    inc.extend(_parse_terms(included, ';'))
+
+    exc: List[Term] = []
+    if excl_start and excl_end:
+        exc.append(('range', int(excl_start), int(excl_end)))
+    exc.extend(_parse_terms(excluded, ';'))
+
+    # All account balances from 2000-8989 are stored with reversed sign in the SE file;
+    # decided by the range start / first included account in that interval
+    should_reverse = bool(start and end and 2000 <= int(start) <= 8989)
+    if not should_reverse:
+        for term in _parse_terms(included, ';'):
+            if term[0] == 'range':
+                first = term[1]
+            else:
+                try:
+                    first = int(term[1])
+                except ValueError:
+                    continue
+            if 2000 <= first <= 8989:
+                should_reverse = True
+                break
+
+    return VariableSpec(tuple(inc), tuple(exc), should_reverse)
+
+
+def compile_variable_spec(mapping: Dict[str, Any]) -> VariableSpec:
+    """Compiled accounts_included*/accounts_excluded* columns of a mapping row (cached per spec)."""
+    return _compile_variable_spec(
+        mapping.get('accounts_included_start'),
+        mapping.get('accounts_included_end'),
+        mapping.get('accounts_included'),
+        mapping.get('accounts_excluded_start'),
+        mapping.get('accounts_excluded_end'),
+        mapping.get('accounts_excluded'),
+    )
+
+
+@lru_cache(maxsize=4096)
+def compile_accounts_included(accounts_included: Optional[str]) -> Tuple[Term, ...]:
+    """Compiled "6072;6992,7000-7099" style spec (both ';' and ',' separate terms)."""
+    return _parse_terms(accounts_included, ';,')
+
+
+def compile_mappings(mappings) -> None:
+    """Pre-compile the account specs of all mapping rows (called when mappings are loaded)."""
+    for mapping in mappings or ():
+        try:
+            compile_variable_spec(mapping)
+            compile_accounts_included(mapping.get('accounts_included'))
+        except (TypeError, ValueError) as e:
+            print(f"Invalid account spec for {mapping.get('variable_name')}: {e}")
+
+
+class AccountIndex:
+    """
+    Sorted view over an accounts dict ({'1930': 12500.0, ...}).
+
+    Keeps two sorted arrays: canonical account keys (str(int) == key, the ones a
+    range walk with str(account_id) lookups would find) and every int-parsable key.
+    Sums keep the summation order of the original loops so amounts are unchanged.
+    """
+
+    __slots__ = ('accounts', '_canon_keys', '_canon_values', '_all_keys', '_all_entries')
+
+    def __init__(self, accounts: Dict[str, float]):
+        self.accounts = accounts
+        canon: List[Tuple[int, float]] = []
+        entries: List[Tuple[int, int, float]] = []
+        for pos, (key, value) in enumerate(accounts.items()):
+            try:
+                number = int(key)
+            except (TypeError, ValueError):
+                continue
+            entries.append((number, pos, value))
+            if isinstance(key, str) and str(number) == key:
+                canon.append((number, value))
+        canon.sort(key=lambda e: e[0])
+        entries.sort(key=lambda e: (e[0], e[1]))
+        self._canon_keys = [n for n, _ in canon]
+        self._canon_values = [v for _, v in canon]
+        self._all_keys = [n for n, _, _ in entries]
+        self._all_entries = entries
+
+    @classmethod
+    def coerce(cls, accounts: Union[Dict[str, float], "AccountIndex", None]) -> "AccountIndex":
+        """Accept either an accounts dict or an already built index."""
+        if isinstance(accounts, AccountIndex):
+            return accounts
+        return cls(accounts or {})
+
+    def canonical_range(self, lo: int, hi: int) -> Iterator[float]:
+        """Balances of canonical accounts lo..hi in ascending account order."""
+        i = bisect_left(self._canon_keys, lo)
+        j = bisect_right(self._canon_keys, hi)
+        return iter(self._canon_values[i:j])
+
+    def range_in_insertion_order(self, lo: int, hi: int) -> List[float]:
+        """Balances of all int-parsable accounts lo..hi in the dict's own order."""
+        i = bisect_left(self._all_keys, lo)
+        j = bisect_right(self._all_keys, hi)
+        hits = self._all_entries[i:j]
+        if len(hits) > 1:
+            hits = sorted(hits, key=lambda e: e[1])
+        return [value for _, _, value in hits]
+
+    def apply_terms(self, total: float, terms: Tuple[Term, ...], sign: int = 1) -> float:
+        """Add (sign=1) or subtract (sign=-1) the balances selected by compiled terms, range-walk style."""
+        accounts = self.accounts
+        for term in terms:
+            if term[0] == 'range':
+                for value in self.canonical_range(term[1], term[2]):
+                    total = total + value if sign > 0 else total - value
+            elif term[1] in accounts:
+                value = accounts[term[1]]
+                total = total + value if sign > 0 else total - value
+        return total
+
+    def sum_included(self, terms: Tuple[Term, ...]) -> float:
+        """Sum for sum_included_accounts: ranges match any int-parsable key, singles default to 0.0."""
+        total = 0.0
+        accounts = self.accounts
+        for term in terms:
+            if term[0] == 'range':
+                for value in self.range_in_insertion_order(term[1], term[2]):
+                    total += value
+            else:
+                total += accounts.get(term[1], 0.0)
+        return total
@@ -0,0 +1,262 @@
+"""
+Annual Report Renderer
+Renders annual report PDFs (generate_full_annual_report_pdf) on a process pool
+and stores the results in the artifact cache (services/artifact_cache.py), so
+a render never blocks the event loop and a stored report is only rendered
+again when its company_data changes or its cached PDF has expired. There is
+no separate PDF directory; the artifact cache's TTL and size limit apply.
+
+Back-pressure: at most ANNUAL_REPORT_RENDER_WORKERS renders run and up to
+ANNUAL_REPORT_RENDER_MAX_QUEUE more wait. Interactive requests beyond that
+are rejected with RenderQueueFull (503, try again). Batch jobs only ever use
+the worker slots and wait for a free one, so a large batch (e.g. pre-rendering
+every signed report overnight) can't starve interactive requests of the queue.
+A batch takes at most ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS report ids. Their
+company_data is fetched a page of ANNUAL_REPORT_RENDER_WORKERS reports at a
+time as worker slots free up, and a report's data is dropped once its render
+is submitted, so a batch holds a few reports however many it covers.
+
+Rendered PDFs are keyed by artifact_key('annual-report', company_data);
+editing a report changes the key, so a stale render is never served.
+
+Usage:
+    pdf_bytes = await render_annual_report_pdf(company_data, artifact_key('annual-report', company_data))
+    job = start_render_batch(supabase, report_ids)
+    get_render_batch(job['job_id'])
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from .artifact_cache import artifact_key, get_artifact, has_artifact, store_artifact
+from .ink2_batch_export import iter_reports_in_windows
+
+ANNUAL_REPORT_RENDER_WORKERS = max(1, int(os.getenv("ANNUAL_REPORT_RENDER_WORKERS", str(min(2, os.cpu_count() or 1)))))
+ANNUAL_REPORT_RENDER_MAX_QUEUE = max(0, int(os.getenv("ANNUAL_REPORT_RENDER_MAX_QUEUE", "8")))
+ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS = max(1, int(os.getenv("ANNUAL_REPORT_RENDER_BATCH_MAX_REPORTS", "500")))
+RENDER_JOB_TTL_SECONDS = int(os.getenv("RENDER_JOB_TTL_SECONDS", str(24 * 3600)))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_slots = threading.Condition()
+_admitted = 0   # running + queued renders
+
+_jobs_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+class RenderQueueFull(Exception):
+    """Raised when all render workers are busy and the wait queue is full."""
+
+
+def _render_pdf(company_data: Dict[str, Any]) -> bytes:
+    # Runs in a worker process
+    from .pdf_annual_report import generate_full_annual_report_pdf
+    return generate_full_annual_report_pdf(company_data)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=ANNUAL_REPORT_RENDER_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+# --- Back-pressure ---
+
+def _admit(limit: int, block: bool) -> None:
+    global _admitted
+    with _slots:
+        while _admitted >= limit:
+            if not block:
+                raise RenderQueueFull(f"{_admitted} annual report renders running or queued")
+            _slots.wait()
+        _admitted += 1
+
+
+def _release(_future: Any = None) -> None:
+    global _admitted
+    with _slots:
+        _admitted -= 1
+        _slots.notify_all()
+
+
+def _submit(company_data: Dict[str, Any], limit: int, block: bool) -> Future:
+    """Admit and submit one render; the slot is released when the render finishes"""
+    _admit(limit, block)
+    try:
+        future = _get_pool().submit(_render_pdf, company_data)
+    except BaseException:
+        _release()
+        raise
+    future.add_done_callback(_release)
+    return future
+
+
+def render_queue_status() -> Dict[str, int]:
+    with _slots:
+        return {
+            "admitted": _admitted,
+            "workers": ANNUAL_REPORT_RENDER_WORKERS,
+            "max_queue": ANNUAL_REPORT_RENDER_MAX_QUEUE,
+        }
+
+
+async def render_annual_report_pdf(company_data: Dict[str, Any], cache_key: Optional[str] = None) -> bytes:
+    """
+    Annual report PDF rendered off the event loop. With a cache_key the cached
+    render is reused and a new render is stored; without one nothing is stored.
+    Raises RenderQueueFull when the render queue is full.
+    """
+    if cache_key:
+        pdf_bytes = get_artifact('annual-report', cache_key)
+        if pdf_bytes is not None:
+            return pdf_bytes
+
+    try:
+        future = _submit(company_data, ANNUAL_REPORT_RENDER_WORKERS + ANNUAL_REPORT_RENDER_MAX_QUEUE, block=False)
+        pdf_bytes = await asyncio.wrap_future(future)
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Annual report render pool unavailable ({e}), rendering in a thread")
+        _reset_pool()
+        pdf_bytes = await asyncio.to_thread(_render_pdf, company_data)
+
+    if cache_key:
+        store_artifact('annual-report', cache_key, pdf_bytes)
+    return pdf_bytes
+
+
+# --- Batch jobs ---
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(job, errors=list(job["errors"]), not_found=list(job["not_found"]))
+
+
+def _prune_jobs_locked(now: float) -> None:
+    expired = [k for k, job in _jobs.items()
+               if job["finished_at"] is not None and now - job["finished_at"] > RENDER_JOB_TTL_SECONDS]
+    for k in expired:
+        del _jobs[k]
+
+
+def _finish_render(job: Dict[str, Any], report_id: str, key: str, future: Future) -> None:
+    try:
+        store_artifact('annual-report', key, future.result())
+        with _jobs_lock:
+            job["rendered"] += 1
+    except Exception as e:
+        print(f"Error rendering annual report {report_id}: {str(e)}")
+        if isinstance(e, BrokenProcessPool):
+            _reset_pool()
+        with _jobs_lock:
+            job["failed"] += 1
+            job["errors"].append({"report_id": report_id, "error": str(e)})
+
+
+def _finish_done(job: Dict[str, Any], pending: List[Tuple[str, str, Future]]) -> List[Tuple[str, str, Future]]:
+    """Store finished renders right away so their bytes aren't held until the batch ends"""
+    still_pending = []
+    for report_id, key, future in pending:
+        if future.done():
+            _finish_render(job, report_id, key, future)
+        else:
+            still_pending.append((report_id, key, future))
+    return still_pending
+
+
+def _run_batch(job: Dict[str, Any], supabase, report_ids: List[str]) -> None:
+    # Only (report_id, cache key, future) is kept per submitted render, not its company_data
+    pending: List[Tuple[str, str, Future]] = []
+    try:
+        # The next page is fetched once the previous page's reports have all been submitted
+        for report_id, report in iter_reports_in_windows(supabase, report_ids, ANNUAL_REPORT_RENDER_WORKERS,
+                                                         columns='id, company_data'):
+            if report is None:
+                with _jobs_lock:
+                    job["not_found"].append(report_id)
+                continue
+            company_data = report.get('company_data') or {}
+            report = None  # the row isn't needed past this point
+            if not company_data:
+                with _jobs_lock:
+                    job["failed"] += 1
+                    job["errors"].append({"report_id": report_id, "error": "No company data stored for this report"})
+                continue
+            key = artifact_key('annual-report', company_data)
+            if has_artifact('annual-report', key):
+                with _jobs_lock:
+                    job["cached"] += 1
+                continue
+            try:
+                # Waits for a free worker slot; the interactive queue stays available
+                future = _submit(company_data, ANNUAL_REPORT_RENDER_WORKERS, block=True)
+            except Exception as e:
+                print(f"Annual report render pool unavailable ({e})")
+                _reset_pool()
+                with _jobs_lock:
+                    job["failed"] += 1
+                    job["errors"].append({"report_id": report_id, "error": str(e)})
+                continue
+            finally:
+                company_data = None
+            pending.append((report_id, key, future))
+            pending = _finish_done(job, pending)
+    except Exception as e:
+        # Fetching a page failed: the remaining reports are not rendered
+        print(f"Error fetching reports for annual report batch {job['job_id']}: {str(e)}")
+        with _jobs_lock:
+            job["errors"].append({"report_id": None, "error": str(e)})
+
+    for report_id, key, future in pending:
+        _finish_render(job, report_id, key, future)  # waits for the render
+    with _jobs_lock:
+        job.update(status="done", finished_at=time.time())
+    print(f"✓ Annual report batch {job['job_id']}: {job['rendered']} rendered, "
+          f"{job['cached']} already stored, {job['failed']} failed, {len(job['not_found'])} not found")
+
+
+def start_render_batch(supabase, report_ids: List[str]) -> Dict[str, Any]:
+    """Render and store PDFs for the stored reports report_ids in the background"""
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "status": "running",
+        "total": len(report_ids),
+        "rendered": 0,
+        "cached": 0,
+        "failed": 0,
+        "errors": [],
+        "not_found": [],
+        "started_at": time.time(),
+        "finished_at": None,
+    }
+    with _jobs_lock:
+        _prune_jobs_locked(time.time())
+        _jobs[job["job_id"]] = job
+    threading.Thread(target=_run_batch, args=(job, supabase, report_ids), name="annual-report-batch", daemon=True).start()
+    return get_render_batch(job["job_id"])
+
+
+def get_render_batch(job_id: str) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return _public(job) if job is not None else None
@@ -0,0 +1,164 @@
+"""
+Artifact Cache
+Generated report files (annual report PDF, INK2 PDF, SRU ZIP,
+bokföringsinstruktion, XBRL) stored on local disk, keyed by a hash of the
+company_data they were generated from plus the generator version.
+
+The same key doubles as the HTTP ETag: a repeat download of an unchanged
+report is answered with 304 (If-None-Match) or served from the cache instead
+of being generated again.
+
+What goes into a key:
+- the artifact kind and GENERATOR_VERSIONS[kind] (bump it when a generator's
+  output changes for the same input)
+- the mapping version for artifacts built from the mapping tables
+- today's date (Europe/Stockholm) for artifacts that stamp the creation date
+  (INK2 DatFramst, SRU #IDENTITET, XBRL signing date), so they are
+  regenerated once per day at most
+- extra parameters (e.g. subsetFonts) and the company_data itself
+
+Files older than ARTIFACT_CACHE_TTL_SECONDS are not served, and the oldest
+files are removed once the directory holds more than ARTIFACT_CACHE_MAX_BYTES.
+
+Usage:
+    key = artifact_key('sru', company_data)
+    data = get_or_create_artifact('sru', key, lambda: generate_sru_file(company_data))
+    headers = artifact_headers(filename, key)
+"""
+
+import datetime as dt
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "report_artifacts"))
+ARTIFACT_CACHE_MAX_BYTES = int(os.getenv("ARTIFACT_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+ARTIFACT_CACHE_TTL_SECONDS = int(os.getenv("ARTIFACT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+# Bump when a generator's output changes for the same company_data
+GENERATOR_VERSIONS: Dict[str, str] = {
+    'annual-report': '1',
+    'ink2-form': '1',
+    'sru': '1',
+    'bokforing-instruktion': '1',
+    'xbrl': '1',
+}
+# Built from the mapping tables (ink2_form, variable_mapping_*)
+MAPPING_ARTIFACTS = frozenset({'ink2-form', 'sru', 'xbrl'})
+# Contain today's date
+DATED_ARTIFACTS = frozenset({'ink2-form', 'sru', 'xbrl'})
+
+_prune_lock = threading.Lock()
+
+
+def _today() -> str:
+    try:
+        from zoneinfo import ZoneInfo
+        return dt.datetime.now(ZoneInfo("Europe/Stockholm")).strftime('%Y-%m-%d')
+    except Exception:
+        return dt.date.today().isoformat()
+
+
+def artifact_key(kind: str, company_data: Dict[str, Any], **params: Any) -> str:
+    """Content key (and ETag value) of an artifact generated from company_data"""
+    mapping = None
+    if kind in MAPPING_ARTIFACTS:
+        from .database_parser import mapping_version
+        mapping = mapping_version()
+    payload = json.dumps([kind, GENERATOR_VERSIONS[kind], mapping,
+                          _today() if kind in DATED_ARTIFACTS else None,
+                          params, company_data or {}], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _path(kind: str, key: str) -> str:
+    return os.path.join(ARTIFACT_CACHE_DIR, f"{kind}-{key}")
+
+
+def get_artifact(kind: str, key: str) -> Optional[bytes]:
+    path = _path(kind, key)
+    try:
+        if time.time() - os.path.getmtime(path) > ARTIFACT_CACHE_TTL_SECONDS:
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        os.utime(path)  # recently used files are pruned last
+        return data
+    except OSError:
+        return None
+
+
+def has_artifact(kind: str, key: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(_path(kind, key)) <= ARTIFACT_CACHE_TTL_SECONDS
+    except OSError:
+        return False
+
+
+def _prune() -> None:
+    with _prune_lock:
+        entries = []
+        for entry in os.scandir(ARTIFACT_CACHE_DIR):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in sorted(entries):
+            if total <= ARTIFACT_CACHE_MAX_BYTES and now - mtime <= ARTIFACT_CACHE_TTL_SECONDS:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+def store_artifact(kind: str, key: str, data: bytes) -> None:
+    """Write atomically; a failing disk only costs the cache, never the request"""
+    try:
+        os.makedirs(ARTIFACT_CACHE_DIR, exist_ok=True)
+        path = _path(kind, key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        _prune()
+    except OSError as e:
+        print(f"⚠ Warning: Could not store {kind} artifact - {e}")
+
+
+def get_or_create_artifact(kind: str, key: str, generate: Callable[[], Optional[bytes]]) -> Optional[bytes]:
+    """Cached artifact, else generate() and store it (None results are not stored)"""
+    data = get_artifact(kind, key)
+    if data is None:
+        data = generate()
+        if data is not None:
+            store_artifact(kind, key, data)
+    return data
+
+
+def etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    """If-None-Match header matches the artifact key (weak comparison)"""
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(',')]
+    return '*' in tags or any(t.removeprefix('W/').strip('"') == key for t in tags)
+
+
+def artifact_headers(filename: str, key: str) -> Dict[str, str]:
+    """Download headers: cacheable by the client, but revalidated with the ETag on every use"""
+    return {
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'ETag': f'W/"{key}"',  # weak: a regenerated file is equivalent, not byte-identical
+        'Cache-Control': 'private, no-cache',
+    }
@@ -1,7 +1,8 @@
-import re
-from collections import defaultdict
+from typing import Union
 
-def parse_bygg_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: str = None) -> dict:
+from .sie_document import SieDocument
+
+def parse_bygg_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: Union[str, SieDocument] = None) -> dict:
     """
     BYGG-note (K2) parser.
 
@@ -28,32 +29,12 @@ def parse_bygg_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fl
       ack_uppskr_bygg_ib, arets_uppskr_bygg, arets_avskr_uppskr_bygg, aterfor_uppskr_fsg_bygg, ack_uppskr_bygg_ub,
       ack_nedskr_bygg_ib, arets_nedskr_bygg, aterfor_nedskr_bygg, aterfor_nedskr_fsg_bygg, ack_nedskr_bygg_ub
     """
-    # Normalize whitespace and NBSP so numbers like "58 216 440,00" parse
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
+    # Tokenized SIE document (NBSP/thousand spaces in amounts handled by the tokenizer)
+    doc = SieDocument.coerce(sie_text)
 
-    # --- Parse SRU codes and account descriptions ---
-    sru_codes = {}
-    account_descriptions = {}
-    
-    sru_re = re.compile(r'^#SRU\s+(\d+)\s+(\d+)\s*$')
-    konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"')
-    
-    for raw in lines:
-        s = raw.strip()
-        # Parse SRU codes
-        m = sru_re.match(s)
-        if m:
-            account = int(m.group(1))
-            sru = int(m.group(2))
-            sru_codes[account] = sru
-        
-        # Parse account descriptions
-        m = konto_re.match(s)
-        if m:
-            account = int(m.group(1))
-            description = m.group(2)
-            account_descriptions[account] = description
+    # --- SRU codes and account descriptions ---
+    sru_codes = doc.sru_codes
+    account_descriptions = doc.account_names
 
     # --- CONFIG (K2 – bygg/mark) ---
     # Use original base logic - no SRU integration here
@@ -73,70 +54,12 @@ def parse_bygg_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fl
     def in_building_assets(acct: int) -> bool:
         return any(lo <= acct <= hi for lo,hi in BUILDING_ASSET_RANGES)
 
-    def _to_float(s: str) -> float:
-        # tolerant for "123 456,78" and "123,456.78"
-        return float(s.strip().replace(" ", "").replace(",", "."))
-
     def get_balance(kind_flag: str, accounts):
         """Sum #IB or #UB for the given account set/ranges (current year '0' rows)."""
-        total = 0.0
-        # allow thousand spaces; allow optional trailing text after number
-        bal_re = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-        for raw in lines:
-            s = raw.strip()
-            m = bal_re.match(s)
-            if not m:
-                continue
-            acct = int(m.group(1))
-            amount = _to_float(m.group(2))
-            if isinstance(accounts, (set, frozenset)):
-                ok = acct in accounts
-            else:
-                ok = any(lo <= acct <= hi for lo,hi in accounts)
-            if ok:
-                total += amount
-        return total
-
-    # --- Parse vouchers ---
-    ver_header_re = re.compile(
-        r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"[^"]*"|.+))?\s*$'
-    )
-    trans_re = re.compile(
-        r'^#(?:TRANS|RTRANS)\s+'          # <-- no BTRANS here
-        r'(\d{3,4})'                            
-        r'(?:\s+\{.*?\})?'                      
-        r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'  # amount only
-        r'(?:\s+\d{8})?'                        
-        r'(?:\s+".*?")?'                        
-        r'\s*$'
-    )
+        return doc.balance_sum(kind_flag, 0, accounts)
 
-    trans_by_ver = defaultdict(list)
-    current_ver = None
-    in_block = False
-
-    for raw in lines:
-        t = raw.strip()
-        mh = ver_header_re.match(t)
-        if mh:
-            current_ver = (mh.group(1), int(mh.group(2)))
-            continue
-        if t == "{":
-            in_block = True
-            continue
-        if t == "}":
-            in_block = False
-            current_ver = None
-            continue
-        # Ignore removed items explicitly (defensive)
-        if t.startswith('#BTRANS'):
-            continue
-        if in_block and current_ver:
-            mt = trans_re.match(t)
-            if mt:
-                acct = int(mt.group(1))
-                amt = _to_float(mt.group(2))
-                trans_by_ver[current_ver].append((acct, amt))
+    # --- Vouchers (#TRANS/#RTRANS only; removed #BTRANS rows are skipped) ---
+    trans_by_ver = doc.trans_by_ver()
 
     # --- IB balances ---
     bygg_ib               = get_balance('IB', BUILDING_ASSET_RANGES)  # asset (incl. uppskrivning since posted on asset)
@@ -350,45 +273,26 @@ def parse_bygg_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fl
         #   - ACC_IMP_BYGG         : accumulated impairment accounts (e.g., 1158, etc.)
         #   - UPSKR_FOND           : asset-side revaluation adjustment account (2085)
 
-        def _get_balance_prev(lines, kind_flag: str, accounts) -> float:
+        def _get_balance_prev(kind_flag: str, accounts) -> float:
             """
             Sum #IB -1 or #UB -1 for the given accounts (set or ranges).
             kind_flag ∈ {"IB", "UB"}.
             If 'accounts' is None or empty, returns 0.0.
             """
-            if not accounts:
-                return 0.0
-            total = 0.0
-            bal_re_prev = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-            for raw in lines:
-                s = raw.strip()
-                m = bal_re_prev.match(s)
-                if not m:
-                    continue
-                acct = int(m.group(1))
-                # Handle both sets and ranges like the original get_balance function
-                if isinstance(accounts, (set, frozenset)):
-                    ok = acct in accounts
-                elif isinstance(accounts, int):
-                    ok = acct == accounts
-                else:
-                    ok = any(lo <= acct <= hi for lo, hi in accounts)
-                if ok:
-                    total += _to_float(m.group(2))
-            return total
+            return doc.balance_sum(kind_flag, -1, accounts)
 
         # --- Previous-year balances using SAME sets as current year ---
-        bygg_ib_prev  = _get_balance_prev(lines, 'IB', BUILDING_ASSET_RANGES)
-        bygg_ub_prev  = _get_balance_prev(lines, 'UB', BUILDING_ASSET_RANGES)
+        bygg_ib_prev  = _get_balance_prev('IB', BUILDING_ASSET_RANGES)
+        bygg_ub_prev  = _get_balance_prev('UB', BUILDING_ASSET_RANGES)
 
-        ack_avskr_bygg_ib_prev = _get_balance_prev(lines, 'IB', ACC_DEP_BYGG)
-        ack_avskr_bygg_ub_prev = _get_balance_prev(lines, 'UB', ACC_DEP_BYGG)
+        ack_avskr_bygg_ib_prev = _get_balance_prev('IB', ACC_DEP_BYGG)
+        ack_avskr_bygg_ub_prev = _get_balance_prev('UB', ACC_DEP_BYGG)
 
-        ack_nedskr_bygg_ib_prev = _get_balance_prev(lines, 'IB', ACC_IMP_BYGG)
-        ack_nedskr_bygg_ub_prev = _get_balance_prev(lines, 'UB', ACC_IMP_BYGG)
+        ack_nedskr_bygg_ib_prev = _get_balance_prev('IB', ACC_IMP_BYGG)
+        ack_nedskr_bygg_ub_prev = _get_balance_prev('UB', ACC_IMP_BYGG)
 
-        uppskr_bygg_ib_prev = _get_balance_prev(lines, 'IB', UPSKR_FOND)
-        uppskr_bygg_ub_prev = _get_balance_prev(lines, 'UB', UPSKR_FOND)
+        uppskr_bygg_ib_prev = _get_balance_prev('IB', UPSKR_FOND)
+        uppskr_bygg_ub_prev = _get_balance_prev('UB', UPSKR_FOND)
 
         # Redovisat värde (prev) = UB cost + UB uppskr + UB acc. impairments + UB acc. depreciation
         red_varde_bygg_prev = (
@@ -0,0 +1,84 @@
+"""
+Company Scrape Jobs
+Fetches rating.se/Ratsit company data in the background so uploads don't wait
+on third-party sites. Jobs are keyed by organization number (digits only) and
+polled via GET /api/company-scrape/{organization_number}.
+
+Job states: 'pending' -> 'done' | 'error'. Finished jobs are kept for
+SCRAPE_JOB_TTL_SECONDS; a new upload for the same company within that window
+reuses the result instead of scraping again.
+"""
+
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from rating_bolag_scraper import get_company_info_with_search
+
+SCRAPE_WORKERS = max(1, int(os.getenv("SCRAPE_WORKERS", "2")))
+SCRAPE_JOB_TTL_SECONDS = int(os.getenv("SCRAPE_JOB_TTL_SECONDS", "1800"))
+
+_executor = ThreadPoolExecutor(max_workers=SCRAPE_WORKERS, thread_name_prefix="scrape")
+_lock = threading.Lock()
+_jobs: Dict[str, Dict[str, Any]] = {}
+
+
+def orgnr_key(orgnr: Optional[str]) -> str:
+    return re.sub(r"\D", "", orgnr or "")
+
+
+def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "status": job["status"],
+        "orgnr": job["orgnr"],
+        "scraped_company_data": job["data"],
+    }
+
+
+def _run_job(job: Dict[str, Any], company_name: Optional[str]) -> None:
+    orgnr = job["orgnr"]
+    try:
+        data = get_company_info_with_search(orgnr=orgnr, company_name=company_name)
+    except Exception as e:
+        data = {"error": str(e), "orgnr": orgnr, "company_name": company_name}
+    # get_company_info_with_search reports failures as {"error": ...}
+    status = "error" if data.get("error") else "done"
+    with _lock:
+        job.update(status=status, data=data, finished_at=time.time())
+
+
+def _prune_locked(now: float) -> None:
+    expired = [k for k, job in _jobs.items()
+               if job["finished_at"] is not None and now - job["finished_at"] > SCRAPE_JOB_TTL_SECONDS]
+    for k in expired:
+        del _jobs[k]
+
+
+def start_company_scrape(orgnr: str, company_name: Optional[str] = None, force: bool = False) -> Dict[str, Any]:
+    """Start (or reuse) a background scrape for orgnr and return its current state."""
+    key = orgnr_key(orgnr)
+    if not key:
+        raise ValueError("organization number required")
+    now = time.time()
+    with _lock:
+        _prune_locked(now)
+        job = _jobs.get(key)
+        if job is not None and not force and job["status"] != "error":
+            return _public(job)
+        job = {"status": "pending", "orgnr": orgnr, "data": None, "started_at": now, "finished_at": None}
+        _jobs[key] = job
+        result = _public(job)
+    _executor.submit(_run_job, job, company_name)
+    return result
+
+
+def get_company_scrape(orgnr: str) -> Optional[Dict[str, Any]]:
+    """Current state of the scrape job for orgnr, or None if none is known."""
+    key = orgnr_key(orgnr)
+    with _lock:
+        _prune_locked(time.time())
+        job = _jobs.get(key)
+        return _public(job) if job is not None else None
@@ -5,11 +5,20 @@ Replaces hardcoded BR_STRUCTURE and RR_STRUCTURE with database queries
 
 import os
 import re
+import time
+import json
+import hashlib
+import threading
 import unicodedata
 import math
+from types import MappingProxyType
 from typing import Dict, List, Any, Optional, Union
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from .sie_document import SieDocument
+from .account_index import AccountIndex, compile_accounts_included, compile_mappings, compile_variable_spec
+from .financial_statement import StatementRows
+from .formula_engine import FormulaPlan, build_formula_plans, compile_formula, row_value_lookup
 
 # Load environment variables
 load_dotenv()
@@ -19,6 +28,9 @@ supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_ANON_KEY")
 supabase: Client = create_client(supabase_url, supabase_key)
 
+# Plain variable names (letters, digits, underscore)
+_WORD_RE = re.compile(r'\w+')
+
 # Feature flags
 USE_168X_RECLASS = os.getenv("USE_168X_RECLASS", "1") == "1"  # default ON
 USE_17XX_RECLASS = os.getenv("USE_17XX_RECLASS", "1") == "1"  # default ON
@@ -46,6 +58,185 @@ RECLASS_PAIRS = [
      "debt_row": 414, "debt_label": "Övriga kortfristiga skulder"},
 ]
 
+# Process-wide mapping snapshot shared by all DatabaseParser instances.
+# Loaded once from Supabase, reused until the TTL expires or invalidate_mapping_cache()
+# is called after a mapping table has been edited.
+MAPPING_CACHE_TTL_SECONDS = int(os.getenv("MAPPING_CACHE_TTL_SECONDS", "600"))
+SUPABASE_PAGE_SIZE = 1000  # PostgREST default max rows per request
+
+_mapping_cache = {"snapshot": None, "loaded_at": 0.0}
+_mapping_cache_lock = threading.Lock()
+
+
+def _fetch_all_rows(table_name: str) -> List[Dict[str, Any]]:
+    """Fetch every row of a table, paging past the PostgREST row limit"""
+    rows: List[Dict[str, Any]] = []
+    start = 0
+    while True:
+        response = supabase.table(table_name).select('*').range(start, start + SUPABASE_PAGE_SIZE - 1).execute()
+        page = response.data or []
+        rows.extend(page)
+        if len(page) < SUPABASE_PAGE_SIZE:
+            return rows
+        start += SUPABASE_PAGE_SIZE
+
+
+def _fetch_optional_rows(table_name: str) -> Optional[List[Dict[str, Any]]]:
+    """Rows of a table only some generators use; None if it can't be fetched, so parsing still works"""
+    try:
+        return _fetch_all_rows(table_name)
+    except Exception as e:
+        print(f"⚠ Warning: Could not load {table_name} - {e}")
+        return None
+
+
+def _apply_rr_not_migration(noter_mappings: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply the rr_not column migration if it hasn't been applied yet"""
+    try:
+        # Check if NOT2 block already has rr_not set
+        not2_mapping = None
+        for mapping in noter_mappings or []:
+            if mapping.get('block') == 'NOT2':
+                not2_mapping = mapping
+                break
+        
+        if not2_mapping and not not2_mapping.get('rr_not'):
+            # Update the NOT2 block with rr_not = 252 (Personalkostnader)
+            supabase.table('variable_mapping_noter').update({
+                'rr_not': 252
+            }).eq('block', 'NOT2').execute()
+            
+            print(f"DEBUG: ✅ Updated NOT2 block with rr_not=252")
+            
+            # Reload noter mappings to get the updated data
+            return _fetch_all_rows('variable_mapping_noter')
+            
+    except Exception as e:
+        pass
+    return noter_mappings
+
+
+def _normalize_global_variables(rows: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Normalize global variable values to floats; treat % values as decimals"""
+    global_variables = {}
+    for var in rows:
+        name = var.get('variable_name')
+        raw = var.get('value')
+        had_percent = False
+        if isinstance(raw, str) and '%' in raw:
+            had_percent = True
+        if isinstance(raw, (int, float)):
+            value = float(raw)
+        else:
+            text = str(raw or '').strip().replace('%', '').replace(' ', '').replace(',', '.')
+            try:
+                value = float(text)
+            except ValueError:
+                value = 0.0
+        if had_percent or name.lower().startswith('skattesats') or name.lower() == 'statslaneranta':
+            # Convert percent like 2.62 to 0.0262
+            value = value / 100.0
+        global_variables[name] = value
+    return global_variables
+
+
+def _build_accounts_lookup(rows: List[Dict[str, Any]]) -> Dict[Any, str]:
+    """Map account texts by both int and string id for robustness"""
+    accounts_lookup = {}
+    for acc in rows:
+        acc_id = acc.get('account_id')
+        text = acc.get('account_text') or f"Konto {acc_id}" 
+        # int key
+        try:
+            accounts_lookup[int(acc_id)] = text
+        except Exception:
+            pass
+        # string key
+        accounts_lookup[str(acc_id)] = text
+    return accounts_lookup
+
+
+def _load_mapping_snapshot() -> Dict[str, Any]:
+    """Load all mapping tables from Supabase into a read-only snapshot"""
+    rr_mappings = _fetch_all_rows('variable_mapping_rr')
+    br_mappings = _fetch_all_rows('variable_mapping_br')
+    ink2_mappings = _fetch_all_rows('variable_mapping_ink2')
+    noter_mappings = _apply_rr_not_migration(_fetch_all_rows('variable_mapping_noter'))
+    # Only used by the XBRL renderer, which renders without the FB lookups if the table is unavailable
+    fb_mappings = _fetch_optional_rows('variable_mapping_fb') or []
+    # None when unavailable: get_ink2_form_plan() raises and the SRU generator falls back to the CSV
+    ink2_form_rows = _fetch_optional_rows('ink2_form')
+    global_variable_rows = _fetch_all_rows('global_variables')
+    account_rows = _fetch_all_rows('accounts_table')
+    
+    # Content hash so downstream caches can key on the mapping version
+    digest = hashlib.sha1(json.dumps(
+        [rr_mappings, br_mappings, ink2_mappings, noter_mappings, global_variable_rows, fb_mappings, ink2_form_rows,
+         account_rows],
+        sort_keys=True, default=str
+    ).encode('utf-8')).hexdigest()[:16]
+    
+    # Compile account specs up front so parsing never re-splits the mapping strings
+    for mappings in (rr_mappings, br_mappings, ink2_mappings, noter_mappings):
+        compile_mappings(mappings)
+    
+    rr_mappings = tuple(rr_mappings)
+    br_mappings = tuple(br_mappings)
+    
+    return {
+        'rr_mappings': rr_mappings,
+        'br_mappings': br_mappings,
+        'ink2_mappings': tuple(ink2_mappings),
+        'noter_mappings': tuple(noter_mappings),
+        'fb_mappings': tuple(fb_mappings),
+        # INK2 declaration form (PDF field / SRU code per row), see ink2_form_plan
+        'ink2_form': tuple(ink2_form_rows) if ink2_form_rows is not None else None,
+        'global_variables': MappingProxyType(_normalize_global_variables(global_variable_rows)),
+        'accounts_lookup': MappingProxyType(_build_accounts_lookup(account_rows)),
+        # Formula dependency order (and cycle check) for the RR/BR sum rows
+        'formula_plans': MappingProxyType(build_formula_plans(RR=rr_mappings, BR=br_mappings)),
+        'version': digest,
+    }
+
+
+def get_mapping_snapshot(force_reload: bool = False) -> Dict[str, Any]:
+    """
+    Return the process-wide mapping snapshot, loading it on first use or when the TTL expired.
+    The snapshot is shared between requests and must be treated as read-only.
+    """
+    snapshot = _mapping_cache["snapshot"]
+    if (not force_reload and snapshot is not None
+            and time.monotonic() - _mapping_cache["loaded_at"] < MAPPING_CACHE_TTL_SECONDS):
+        return snapshot
+    
+    with _mapping_cache_lock:
+        # Another thread may have refreshed the snapshot while we waited for the lock
+        snapshot = _mapping_cache["snapshot"]
+        if (not force_reload and snapshot is not None
+                and time.monotonic() - _mapping_cache["loaded_at"] < MAPPING_CACHE_TTL_SECONDS):
+            return snapshot
+        
+        snapshot = _load_mapping_snapshot()
+        _mapping_cache["snapshot"] = snapshot
+        _mapping_cache["loaded_at"] = time.monotonic()
+        return snapshot
+
+
+def invalidate_mapping_cache() -> None:
+    """Drop the cached mapping snapshot; the next parser reloads it from Supabase"""
+    with _mapping_cache_lock:
+        _mapping_cache["snapshot"] = None
+        _mapping_cache["loaded_at"] = 0.0
+
+
+def mapping_version() -> str:
+    """Content hash of the current mapping snapshot (for keying derived caches)"""
+    try:
+        return get_mapping_snapshot()['version']
+    except Exception:
+        return 'unavailable'
+
+
 class DatabaseParser:
     """Database-driven parser for financial data"""
     
@@ -56,66 +247,24 @@ class DatabaseParser:
         self.noter_mappings = None
         self.global_variables = None
         self.accounts_lookup = None
+        self.mapping_version = None
+        self.formula_plans = {}
         self.sie_account_descriptions = {}  # Cache for SIE file account descriptions
+        self._ink2_mapping_index = None  # (ink2_mappings, variable_name -> mapping), see _ink2_mapping_by_variable
         self._load_mappings()
     
     def _load_mappings(self):
-        """Load variable mappings from database"""
+        """Attach the shared mapping snapshot (loaded from database at most once per TTL)"""
         try:
-            # Load RR mappings
-            rr_response = supabase.table('variable_mapping_rr').select('*').execute()
-            self.rr_mappings = rr_response.data
-            
-            # Load BR mappings
-            br_response = supabase.table('variable_mapping_br').select('*').execute()
-            self.br_mappings = br_response.data
-            
-            # Load INK2 mappings
-            ink2_response = supabase.table('variable_mapping_ink2').select('*').execute()
-            self.ink2_mappings = ink2_response.data
-            
-            # Load Noter mappings
-            noter_response = supabase.table('variable_mapping_noter').select('*').execute()
-            self.noter_mappings = noter_response.data
-            
-            # Apply rr_not migration if needed
-            self._apply_rr_not_migration()
-            
-            # Load global variables (normalize values to floats; treat % values as decimals)
-            global_vars_response = supabase.table('global_variables').select('*').execute()
-            self.global_variables = {}
-            for var in global_vars_response.data:
-                name = var.get('variable_name')
-                raw = var.get('value')
-                had_percent = False
-                if isinstance(raw, str) and '%' in raw:
-                    had_percent = True
-                if isinstance(raw, (int, float)):
-                    value = float(raw)
-                else:
-                    text = str(raw or '').strip().replace('%', '').replace(' ', '').replace(',', '.')
-                    try:
-                        value = float(text)
-                    except ValueError:
-                        value = 0.0
-                if had_percent or name.lower().startswith('skattesats') or name.lower() == 'statslaneranta':
-                    # Convert percent like 2.62 to 0.0262
-                    value = value / 100.0
-                self.global_variables[name] = value
-            
-            # Load accounts lookup (map by both int and string id for robustness)
-            accounts_response = supabase.table('accounts_table').select('*').execute()
-            self.accounts_lookup = {}
-            for acc in accounts_response.data:
-                acc_id = acc.get('account_id')
-                text = acc.get('account_text') or f"Konto {acc_id}" 
-                # int key
-                try:
-                    self.accounts_lookup[int(acc_id)] = text
-                except Exception:
-                    pass
-                # string key
-                self.accounts_lookup[str(acc_id)] = text
+            snapshot = get_mapping_snapshot()
+            self.rr_mappings = snapshot['rr_mappings']
+            self.br_mappings = snapshot['br_mappings']
+            self.ink2_mappings = snapshot['ink2_mappings']
+            self.noter_mappings = snapshot['noter_mappings']
+            self.global_variables = snapshot['global_variables']
+            self.accounts_lookup = snapshot['accounts_lookup']
+            self.mapping_version = snapshot['version']
+            self.formula_plans = dict(snapshot['formula_plans'])
             
         except Exception as e:
             print(f"Error loading mappings: {e}")
@@ -125,248 +274,53 @@ class DatabaseParser:
             self.noter_mappings = []
             self.global_variables = {}
             self.accounts_lookup = {}
-    
-    def _apply_rr_not_migration(self):
-        """Apply the rr_not column migration if it hasn't been applied yet"""
-        try:
-            # Check if NOT2 block already has rr_not set
-            not2_mapping = None
-            for mapping in self.noter_mappings or []:
-                if mapping.get('block') == 'NOT2':
-                    not2_mapping = mapping
-                    break
-            
-            if not2_mapping and not not2_mapping.get('rr_not'):
-                # Update the NOT2 block with rr_not = 252 (Personalkostnader)
-                response = supabase.table('variable_mapping_noter').update({
-                    'rr_not': 252
-                }).eq('block', 'NOT2').execute()
-                
-                print(f"DEBUG: ✅ Updated NOT2 block with rr_not=252")
-                
-                # Reload noter mappings to get the updated data
-                noter_response = supabase.table('variable_mapping_noter').select('*').execute()
-                self.noter_mappings = noter_response.data
-                
-            elif not2_mapping and not2_mapping.get('rr_not'):
-                pass
-            else:
-                pass
-                
-        except Exception as e:
-            pass
+            self.mapping_version = None
+            self.formula_plans = {}
 
-    def parse_account_balances(self, se_content: str) -> tuple[Dict[str, float], Dict[str, float], Dict[str, float], Dict[str, float]]:
+    def parse_account_balances(self, se_content: Union[str, SieDocument]) -> tuple[Dict[str, float], Dict[str, float], Dict[str, float], Dict[str, float]]:
         """Parse account balances from SE file content using the correct format"""
-        current_accounts = {}
-        previous_accounts = {}
-        current_ib_accounts = {}  # Incoming balances for current year
-        previous_ib_accounts = {}  # Incoming balances for previous year
+        doc = SieDocument.coerce(se_content)
         
-        # Parse SE file content to extract account balances
-        lines = se_content.split('\n')
+        # BR accounts: #UB (Uppgjord Balans), RR accounts: #RES (Resultat) - both years
+        current_accounts = dict(doc.balances('UB', 0))
+        current_accounts.update(doc.balances('RES', 0))
+        previous_accounts = dict(doc.balances('UB', -1))
+        previous_accounts.update(doc.balances('RES', -1))
         
-        for line in lines:
-            line = line.strip()
-            
-            # Handle BR accounts: #UB (Uppgjord Balans) - both years
-            if line.startswith('#UB '):
-                parts = line.split()
-                if len(parts) >= 4:
-                    try:
-                        fiscal_year = int(parts[1])
-                        account_id = parts[2]
-                        balance = float(parts[3])
-                        
-                        if fiscal_year == 0:  # Current year
-                            current_accounts[account_id] = balance
-                        elif fiscal_year == -1:  # Previous year
-                            previous_accounts[account_id] = balance
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Handle IB accounts: #IB (Ingående Balans) - both years
-            if line.startswith('#IB '):
-                parts = line.split()
-                if len(parts) >= 4:
-                    try:
-                        fiscal_year = int(parts[1])
-                        account_id = parts[2]
-                        balance = float(parts[3])
-                        
-                        if fiscal_year == 0:  # Current year
-                            current_ib_accounts[account_id] = balance
-                        elif fiscal_year == -1:  # Previous year
-                            previous_ib_accounts[account_id] = balance
-                    except (ValueError, TypeError):
-                        continue
-                        
-            # Handle RR accounts: #RES (Resultat) - both years
-            elif line.startswith('#RES '):
-                parts = line.split()
-                if len(parts) >= 4:
-                    try:
-                        fiscal_year = int(parts[1])
-                        account_id = parts[2]
-                        balance = float(parts[3])
-                        
-                        if fiscal_year == 0:  # Current year
-                            current_accounts[account_id] = balance
-                        elif fiscal_year == -1:  # Previous year
-                            previous_accounts[account_id] = balance
-                    except (ValueError, TypeError):
-                        continue
-                        
-            # Handle legacy #VER format (fallback)
-            elif line.startswith('#VER'):
-                parts = line.split()
-                if len(parts) >= 3:
-                    account_id = parts[1]
-                    try:
-                        balance = float(parts[2])
-                        current_accounts[account_id] = balance
-                    except ValueError:
-                        continue
+        # IB accounts: #IB (Ingående Balans) - both years
+        current_ib_accounts = dict(doc.balances('IB', 0))
+        previous_ib_accounts = dict(doc.balances('IB', -1))
+        
+        # Handle legacy #VER format (fallback)
+        current_accounts.update(doc.legacy_balances)
         
         return current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts
     
-    def parse_ib_ub_balances(self, se_content: str) -> tuple[Dict[str, float], Dict[str, float], Dict[str, float], Dict[str, float]]:
+    def parse_ib_ub_balances(self, se_content: Union[str, SieDocument]) -> tuple[Dict[str, float], Dict[str, float], Dict[str, float], Dict[str, float]]:
         """Parse both IB and UB balances from SE file for noter calculations"""
-        current_ub_accounts = {}
-        previous_ub_accounts = {}
-        current_ib_accounts = {}
-        previous_ib_accounts = {}
-        
-        lines = se_content.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Handle UB accounts: #UB
-            if line.startswith('#UB '):
-                parts = line.split()
-                if len(parts) >= 4:
-                    try:
-                        fiscal_year = int(parts[1])
-                        account_id = parts[2]
-                        balance = float(parts[3])
-                        
-                        if fiscal_year == 0:  # Current year
-                            current_ub_accounts[account_id] = balance
-                        elif fiscal_year == -1:  # Previous year
-                            previous_ub_accounts[account_id] = balance
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Handle IB accounts: #IB
-            if line.startswith('#IB '):
-                parts = line.split()
-                if len(parts) >= 4:
-                    try:
-                        fiscal_year = int(parts[1])
-                        account_id = parts[2]
-                        balance = float(parts[3])
-                        
-                        if fiscal_year == 0:  # Current year
-                            current_ib_accounts[account_id] = balance
-                        elif fiscal_year == -1:  # Previous year
-                            previous_ib_accounts[account_id] = balance
-                    except (ValueError, TypeError):
-                        continue
-        
-        return current_ub_accounts, previous_ub_accounts, current_ib_accounts, previous_ib_accounts
+        doc = SieDocument.coerce(se_content)
+        return (
+            dict(doc.balances('UB', 0)),
+            dict(doc.balances('UB', -1)),
+            dict(doc.balances('IB', 0)),
+            dict(doc.balances('IB', -1)),
+        )
     
-    def calculate_variable_value(self, mapping: Dict[str, Any], accounts: Dict[str, float]) -> float:
+    def calculate_variable_value(self, mapping: Dict[str, Any], accounts: Union[Dict[str, float], AccountIndex]) -> float:
         """Calculate value for a specific variable based on its mapping"""
-        total = 0.0
+        # Account columns are compiled once per spec; ranges are answered from the sorted index
+        spec = compile_variable_spec(mapping)
+        index = AccountIndex.coerce(accounts)
         
-        # Get account ranges to include
-        start = mapping.get('accounts_included_start')
-        end = mapping.get('accounts_included_end')
-        
-        # Include accounts in range
-        if start and end:
-            for account_id in range(start, end + 1):
-                account_str = str(account_id)
-                if account_str in accounts:
-                    total += accounts[account_str]
+        # Include accounts (start/end range first, then accounts_included in order)
+        total = index.apply_terms(0.0, spec.included)
         
-        # Include additional specific accounts
-        additional_accounts = mapping.get('accounts_included')
-        if additional_accounts:
-            for account_spec in additional_accounts.split(';'):
-                account_spec = account_spec.strip()
-                if '-' in account_spec:
-                    # Range specification (e.g., "4910-4931")
-                    range_start, range_end = map(int, account_spec.split('-'))
-                    for account_id in range(range_start, range_end + 1):
-                        account_str = str(account_id)
-                        if account_str in accounts:
-                            total += accounts[account_str]
-                else:
-                    # Single account
-                    if account_spec in accounts:
-                        total += accounts[account_spec]
-        
-        # Exclude accounts in range
-        exclude_start = mapping.get('accounts_excluded_start')
-        exclude_end = mapping.get('accounts_excluded_end')
-        
-        if exclude_start and exclude_end:
-            for account_id in range(exclude_start, exclude_end + 1):
-                account_str = str(account_id)
-                if account_str in accounts:
-                    total -= accounts[account_str]
-        
-        # Exclude additional specific accounts
-        excluded_accounts = mapping.get('accounts_excluded')
-        if excluded_accounts:
-            for account_spec in excluded_accounts.split(';'):
-                account_spec = account_spec.strip()
-                if '-' in account_spec:
-                    # Range specification
-                    range_start, range_end = map(int, account_spec.split('-'))
-                    for account_id in range(range_start, range_end + 1):
-                        account_str = str(account_id)
-                        if account_str in accounts:
-                            total -= accounts[account_str]
-                else:
-                    # Single account
-                    if account_spec in accounts:
-                        total -= accounts[account_spec]
+        # Exclude accounts (start/end range first, then accounts_excluded in order)
+        total = index.apply_terms(total, spec.excluded, sign=-1)
         
         # Apply sign based on SE file data structure
         # All account balances from 2000-8989 need to be reversed regardless of balance_type
-        
-        # Check if any accounts in the 2000-8989 range are being used
-        should_reverse = False
-        
-        # Check account range
-        start = mapping.get('accounts_included_start')
-        end = mapping.get('accounts_included_end')
-        if start and end and 2000 <= start <= 8989:
-            should_reverse = True
-        
-        # Check additional specific accounts
-        additional_accounts = mapping.get('accounts_included')
-        if additional_accounts:
-            for account_spec in additional_accounts.split(';'):
-                account_spec = account_spec.strip()
-                if '-' in account_spec:
-                    # Range specification
-                    range_start, range_end = map(int, account_spec.split('-'))
-                    if 2000 <= range_start <= 8989:
-                        should_reverse = True
-                        break
-                else:
-                    # Single account
-                    try:
-                        account_id = int(account_spec)
-                        if 2000 <= account_id <= 8989:
-                            should_reverse = True
-                            break
-                    except ValueError:
-                        continue
+        should_reverse = spec.should_reverse
         
         # Optional explicit sign override from mapping column (e.g., '+/-' or 'sign')
         sign_override = mapping.get('+/-') or mapping.get('sign') or mapping.get('plus_minus')
@@ -382,84 +336,35 @@ class DatabaseParser:
         else:
             return total
     
-    def calculate_formula_value(self, mapping: Dict[str, Any], accounts: Dict[str, float], existing_results: List[Dict[str, Any]], use_previous_year: bool = False, rr_data: List[Dict[str, Any]] = None) -> float:
-        """Calculate value using a formula that references variable names"""
+    def _evaluate_formula(self, mapping: Dict[str, Any], lookup, error_label: str = "Formula evaluation error") -> float:
+        """Evaluate the mapping's compiled calculation_formula; invalid formulas give 0.0"""
         formula = mapping.get('calculation_formula', '')
         if not formula:
             return 0.0
-        
-        # Parse formula like "NETTOOMSATTNING + OVRIGA_INTEKNINGAR"
-        # Use variable names instead of row references
-        import re
-        
-        # Replace variable references with their calculated values
-        # Formula format: variable names like SumRorelseintakter, SumRorelsekostnader, etc.
-        # Use word boundaries to match complete variable names
-        pattern = r'\b([A-Z][a-zA-Z0-9_]*)\b'
-        
-        def replace_variable(match):
-            var_name = match.group(1)
-            # Use the new helper method to get calculated values
-            value = self._get_calculated_value(var_name, existing_results, use_previous_year, rr_data)
-
-            return str(value)
-        
-        # Replace all variable references
-        formula_with_values = re.sub(pattern, replace_variable, formula)
-        
         try:
-            # Evaluate the formula
-            result = eval(formula_with_values)
-            return float(result)
+            return compile_formula(formula).evaluate(lookup)
         except Exception as e:
-            print(f"Formula evaluation error: {e}")
+            print(f"{error_label}: {e}")
             return 0.0
 
-    def _recalculate_formula_from_results(self, mapping: Dict[str, Any], results: List[Dict[str, Any]], use_previous_year: bool = False, rr_data: List[Dict[str, Any]] = None) -> float:
-        """
-        Recalculate a formula-based row using current values from results.
-        
-        This is used after reclassification to update sum rows with the new values.
-        Unlike calculate_formula_value, this doesn't need account data - it reads
-        directly from the already-calculated results.
-        
-        Also searches rr_data for variables like AretsResultat that come from RR.
-        """
+    def _formula_plan(self, section: str) -> FormulaPlan:
+        """Dependency-ordered calculated rows for 'RR' or 'BR' (rebuilt if the mappings were replaced)"""
+        mappings = self.rr_mappings if section == 'RR' else self.br_mappings
+        plan = self.formula_plans.get(section)
+        if plan is None or plan.source is not mappings:
+            plan = FormulaPlan(mappings, section)
+            self.formula_plans[section] = plan
+        return plan
+
+    def _references_rr_only(self, mapping: Dict[str, Any], br_rows: StatementRows, rr_rows: StatementRows) -> bool:
+        """True if the formula uses a variable that exists in RR but not in BR (e.g. AretsResultat)"""
+        if not rr_rows:
+            return False
         formula = mapping.get('calculation_formula', '')
-        if not formula:
-            return 0.0
-        
-        import re
-        
-        # Map variable names to their values from results
-        pattern = r'\b([A-Z][a-zA-Z0-9_]*)\b'
-        
-        def replace_variable(match):
-            var_name = match.group(1)
-            # First, find the variable in BR results
-            for item in results:
-                if item.get('variable_name') == var_name:
-                    value = item.get('previous_amount' if use_previous_year else 'current_amount', 0)
-                    return str(value if value is not None else 0)
-            # If not found in BR, try RR data (for AretsResultat, etc.)
-            if rr_data:
-                for item in rr_data:
-                    if item.get('variable_name') == var_name:
-                        value = item.get('previous_amount' if use_previous_year else 'current_amount', 0)
-                        return str(value if value is not None else 0)
-            return '0'
-        
-        # Replace all variable references
-        formula_with_values = re.sub(pattern, replace_variable, formula)
-        
-        try:
-            result = eval(formula_with_values)
-            return float(result)
-        except Exception as e:
-            print(f"Formula recalculation error: {e}")
-            return 0.0
+        return any(rr_rows.find(var_name) is not None and br_rows.find(var_name) is None
+                   for var_name in re.findall(r'\b([A-Z][a-zA-Z0-9_]*)\b', formula))
     
-    def parse_rr_data(self, current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, sie_text: Optional[str] = None) -> List[Dict[str, Any]]:
+    def parse_rr_data(self, current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, sie_text: Optional[Union[str, SieDocument]] = None) -> List[Dict[str, Any]]:
         """Parse RR (Resultaträkning) data using database mappings"""
         if not self.rr_mappings:
             return []
@@ -470,6 +375,10 @@ class DatabaseParser:
         
         results = []
         
+        # Sorted account indexes, built once and shared by every mapping row
+        current_index = AccountIndex(current_accounts)
+        previous_index = AccountIndex(previous_accounts or {})
+        
         # First pass: Create all rows with direct calculations
         for mapping in self.rr_mappings:
             show_tag = mapping.get('show_tag', False)
@@ -503,8 +412,8 @@ class DatabaseParser:
                     previous_amount = 0.0
                 else:
                     # Direct account calculation
-                    current_amount = self.calculate_variable_value(mapping, current_accounts)
-                    previous_amount = self.calculate_variable_value(mapping, previous_accounts or {})
+                    current_amount = self.calculate_variable_value(mapping, current_index)
+                    previous_amount = self.calculate_variable_value(mapping, previous_index)
                 
                 results.append({
                     'id': mapping['row_id'],
@@ -527,28 +436,23 @@ class DatabaseParser:
                 })
         
         # Second pass: Calculate formulas using all available data
-        
-        # Sort calculated mappings by row_id to ensure dependencies are calculated first
-        calculated_mappings = [(i, mapping) for i, mapping in enumerate(self.rr_mappings) 
-                              if mapping.get('is_calculated')]
-        calculated_mappings.sort(key=lambda x: int(x[1]['row_id']))
-        
-        for i, mapping in calculated_mappings:
-
-                
-                current_amount = self.calculate_formula_value(mapping, current_accounts, results, use_previous_year=False)
-                previous_amount = self.calculate_formula_value(mapping, previous_accounts or {}, results, use_previous_year=True)
-
-                
-                # Find and update the correct result by row_id
-                for result in results:
-                    if result['id'] == mapping['row_id']:
-                        result['current_amount'] = current_amount
-                        result['previous_amount'] = previous_amount
-                        # Update account_details if show_tag is true (for calculated rows, we still use direct account mapping)
-                        if mapping.get('show_tag', False):
-                            result['account_details'] = self._get_br_account_details(mapping, current_accounts)
-                        break
+        # Calculated rows come in formula dependency order (row_id order among independent rows)
+        result_rows = StatementRows(results)
+        current_lookup = row_value_lookup(result_rows)
+        previous_lookup = row_value_lookup(result_rows, use_previous_year=True)
+        
+        for mapping in self._formula_plan('RR').order:
+            current_amount = self._evaluate_formula(mapping, current_lookup)
+            previous_amount = self._evaluate_formula(mapping, previous_lookup)
+            
+            # Update the result for this row_id
+            result = result_rows.find_id(mapping['row_id'])
+            if result is not None:
+                result['current_amount'] = current_amount
+                result['previous_amount'] = previous_amount
+                # Update account_details if show_tag is true (for calculated rows, we still use direct account mapping)
+                if mapping.get('show_tag', False):
+                    result['account_details'] = self._get_br_account_details(mapping, current_accounts)
         
         # Store calculated values in database for future use
         self.store_calculated_values(results, 'RR')
@@ -558,7 +462,7 @@ class DatabaseParser:
         
         return results
     
-    def _calculate_noter_amounts(self, mapping: Dict[str, Any], current_ub: Dict[str, float], previous_ub: Dict[str, float], current_ib: Dict[str, float], previous_ib: Dict[str, float]) -> tuple[float, float]:
+    def _calculate_noter_amounts(self, mapping: Dict[str, Any], current_ub: Union[Dict[str, float], AccountIndex], previous_ub: Union[Dict[str, float], AccountIndex], current_ib: Union[Dict[str, float], AccountIndex], previous_ib: Union[Dict[str, float], AccountIndex]) -> tuple[float, float]:
         """Calculate current and previous amounts for a noter mapping based on ib_ub column"""
         accounts_included = mapping.get('accounts_included', '')
         ib_ub = mapping.get('ib_ub', 'UB')  # Default to UB
@@ -656,24 +560,7 @@ class DatabaseParser:
         except Exception as e:
             print(f"Error storing calculated values: {e}")
     
-    def _get_calculated_value(self, variable_name: str, results: List[Dict[str, Any]], use_previous_year: bool = False, rr_data: List[Dict[str, Any]] = None) -> float:
-        """Get calculated value for a variable from results or RR data"""
-        # First check in the current results (BR data)
-        for item in results:
-            if item.get('variable_name') == variable_name:
-                value = item.get('previous_amount' if use_previous_year else 'current_amount', 0)
-                return value if value is not None else 0
-        
-        # If not found in current results, check in RR data
-        if rr_data:
-            for item in rr_data:
-                if item.get('variable_name') == variable_name:
-                    value = item.get('previous_amount' if use_previous_year else 'current_amount', 0)
-                    return value if value is not None else 0
-        
-        return 0
-    
-    def parse_br_data(self, current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, rr_data: List[Dict[str, Any]] = None, sie_text: Optional[str] = None) -> List[Dict[str, Any]]:
+    def parse_br_data(self, current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, rr_data: List[Dict[str, Any]] = None, sie_text: Optional[Union[str, SieDocument]] = None) -> List[Dict[str, Any]]:
         """Parse BR (Balansräkning) data using database mappings"""
         if not self.br_mappings:
             return []
@@ -684,6 +571,10 @@ class DatabaseParser:
         
         results = []
         
+        # Sorted account indexes, built once and shared by every mapping row
+        current_index = AccountIndex(current_accounts)
+        previous_index = AccountIndex(previous_accounts or {})
+        
         # First pass: Create all rows with direct calculations
         for mapping in self.br_mappings:
             show_tag = mapping.get('show_tag', False)
@@ -718,8 +609,8 @@ class DatabaseParser:
                     previous_amount = 0.0
                 else:
                     # Direct account calculation
-                    current_amount = self.calculate_variable_value(mapping, current_accounts)
-                    previous_amount = self.calculate_variable_value(mapping, previous_accounts or {})
+                    current_amount = self.calculate_variable_value(mapping, current_index)
+                    previous_amount = self.calculate_variable_value(mapping, previous_index)
                 
                 results.append({
                     'id': mapping['row_id'],
@@ -743,24 +634,25 @@ class DatabaseParser:
                 })
         
         # Second pass: Calculate formulas using all available data
-        # Sort calculated mappings by row_id to ensure dependencies are calculated first
-        calculated_mappings = [(i, mapping) for i, mapping in enumerate(self.br_mappings) 
-                              if mapping.get('is_calculated')]
-        calculated_mappings.sort(key=lambda x: int(x[1]['row_id']))
-        
-        for i, mapping in calculated_mappings:
-                current_amount = self.calculate_formula_value(mapping, current_accounts, results, use_previous_year=False, rr_data=rr_data)
-                previous_amount = self.calculate_formula_value(mapping, previous_accounts or {}, results, use_previous_year=True, rr_data=rr_data)
-                
-                # Find and update the correct result by row_id
-                for result in results:
-                    if result['id'] == mapping['row_id']:
-                        result['current_amount'] = current_amount
-                        result['previous_amount'] = previous_amount
-                        # Update account_details if show_tag is true (for calculated rows, we still use direct account mapping)
-                        if mapping.get('show_tag', False):
-                            result['account_details'] = self._get_br_account_details(mapping, current_accounts)
-                        break
+        # Calculated rows come in formula dependency order (row_id order among independent rows)
+        formula_plan = self._formula_plan('BR')
+        rr_rows = StatementRows.coerce(rr_data)
+        result_rows = StatementRows(results)
+        current_lookup = row_value_lookup(result_rows, rr_rows)
+        previous_lookup = row_value_lookup(result_rows, rr_rows, use_previous_year=True)
+        
+        for mapping in formula_plan.order:
+            current_amount = self._evaluate_formula(mapping, current_lookup)
+            previous_amount = self._evaluate_formula(mapping, previous_lookup)
+            
+            # Update the result for this row_id
+            result = result_rows.find_id(mapping['row_id'])
+            if result is not None:
+                result['current_amount'] = current_amount
+                result['previous_amount'] = previous_amount
+                # Update account_details if show_tag is true (for calculated rows, we still use direct account mapping)
+                if mapping.get('show_tag', False):
+                    result['account_details'] = self._get_br_account_details(mapping, current_accounts)
         
         # Track account movements during reclassification for account_details updates
         account_movements = {}  # {row_id: {'added': [accounts], 'removed': [accounts]}}
@@ -870,40 +762,27 @@ class DatabaseParser:
         
         # THIRD PASS: Recalculate ONLY sum rows that don't reference RR data
         # Skip rows that get values from RR (like AretsResultat) - those are already correct
-        for i, mapping in calculated_mappings:
-            formula = mapping.get('calculation_formula', '')
-            if not formula:
+        # Reclassification may have added rows, so index the results again
+        result_rows = StatementRows(results)
+        current_lookup = row_value_lookup(result_rows, rr_rows)
+        previous_lookup = row_value_lookup(result_rows, rr_rows, use_previous_year=True)
+        
+        for mapping in formula_plan.order:
+            if not mapping.get('calculation_formula', ''):
                 continue
             
-            # Check if this formula references any RR variables - if so, skip recalculation
-            # to preserve the correct RR->BR transfer (e.g., AretsResultat)
-            references_rr = False
-            if rr_data:
-                import re
-                var_pattern = r'\b([A-Z][a-zA-Z0-9_]*)\b'
-                formula_vars = re.findall(var_pattern, formula)
-                for var_name in formula_vars:
-                    # Check if this variable exists in RR but not in BR
-                    in_br = any(r.get('variable_name') == var_name for r in results)
-                    in_rr = any(r.get('variable_name') == var_name for r in rr_data)
-                    if in_rr and not in_br:
-                        references_rr = True
-                        break
-            
-            if references_rr:
-                # Skip recalculation - keep original value from second pass
+            # Preserve the correct RR->BR transfer (e.g., AretsResultat) - keep the second pass value
+            if self._references_rr_only(mapping, result_rows, rr_rows):
                 continue
             
             # Safe to recalculate - this is a pure BR sum row
-            current_amount = self._recalculate_formula_from_results(mapping, results, use_previous_year=False, rr_data=rr_data)
-            previous_amount = self._recalculate_formula_from_results(mapping, results, use_previous_year=True, rr_data=rr_data)
+            current_amount = self._evaluate_formula(mapping, current_lookup, "Formula recalculation error")
+            previous_amount = self._evaluate_formula(mapping, previous_lookup, "Formula recalculation error")
             
-            # Update the result
-            for result in results:
-                if result['id'] == mapping['row_id']:
-                    result['current_amount'] = current_amount
-                    result['previous_amount'] = previous_amount
-                    break
+            result = result_rows.find_id(mapping['row_id'])
+            if result is not None:
+                result['current_amount'] = current_amount
+                result['previous_amount'] = previous_amount
         
         # Store calculated values in database for future use
         self.store_calculated_values(results, 'BR')
@@ -913,7 +792,7 @@ class DatabaseParser:
            
         return results
     
-    def reclass_using_koncern_note(self, br_rows: list[dict], koncern_note: dict, current_accounts: Dict[str, float] = None, sie_text: str = None, *, verbose: bool = True) -> list[dict]:
+    def reclass_using_koncern_note(self, br_rows: list[dict], koncern_note: dict, current_accounts: Dict[str, float] = None, sie_text: Union[str, SieDocument] = None, *, verbose: bool = True) -> list[dict]:
         """
         Make BR consistent with KONCERN note (K2):
         - Force 'Andelar i koncernföretag' to match NOTE 'red_varde_koncern'
@@ -998,14 +877,7 @@ class DatabaseParser:
             # Parse account names from SIE to identify AAT accounts in 1320-1329
             import re
             import unicodedata
-            konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"', re.IGNORECASE)
-            account_names = {}
-            for line in sie_text.splitlines():
-                m = konto_re.match(line.strip())
-                if m:
-                    acct = int(m.group(1))
-                    name = m.group(2) or ""
-                    account_names[acct] = name
+            account_names = dict(SieDocument.coerce(sie_text).account_names)
             
             # Helper functions matching koncern parser logic
             def _normalize(s: str) -> str:
@@ -1082,25 +954,25 @@ class DatabaseParser:
         return br_rows
 
     def parse_br_data_with_koncern(self,
-                                   se_content: str,
+                                   se_content: Union[str, SieDocument],
                                    current_accounts: Dict[str, float],
                                    previous_accounts: Dict[str, float] = None,
                                    rr_data: List[Dict[str, Any]] = None,
                                    two_files_flag: bool = False,
-                                   previous_year_se_content: str = None) -> List[Dict[str, Any]]:
+                                   previous_year_se_content: Union[str, SieDocument] = None) -> List[Dict[str, Any]]:
         """Regular BR parsing + KONCERN-note reconciliation for Andelar/fordringar."""
+        # Tokenize once; BR reclass and the KONCERN note share the same document
+        se_content = SieDocument.coerce(se_content)
+        previous_year_se_content = SieDocument.coerce(previous_year_se_content or None)
+
         # 1) Normal BR (with 168x reclass)
         br_rows = self.parse_br_data(current_accounts, previous_accounts, rr_data=rr_data, sie_text=se_content)
 
         # 2) Parse KONCERN note and reconcile
         try:
-            from .koncern_k2_parser import parse_koncern_k2_from_sie_text
-            koncern_note = parse_koncern_k2_from_sie_text(
-                se_content, 
-                debug=False, 
-                two_files_flag=two_files_flag, 
-                previous_year_sie_text=previous_year_se_content
-            )
+            # Memoized on the document, so parse_noter_data reuses this result
+            from .k2_notes import run_k2_note_parser
+            koncern_note = run_k2_note_parser('koncern', se_content, two_files_flag, previous_year_se_content)
         except Exception as e:
             print(f"KONCERN note parse failed: {e}")
             return br_rows
@@ -1111,7 +983,7 @@ class DatabaseParser:
         return br_rows
     
     # ----------------- 168x → 351/352/353 BR RECLASS (uses SIE text) -----------------
-    def _reclassify_168x_short_term_group_receivables(self, sie_text: str, br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
+    def _reclassify_168x_short_term_group_receivables(self, sie_text: Union[str, SieDocument], br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
         import re, unicodedata
 
         def _norm(s: str) -> str:
@@ -1187,7 +1059,7 @@ class DatabaseParser:
         if abs(total_168_ub) < 0.5:
             return
 
-        konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"', re.IGNORECASE)
+        doc = SieDocument.coerce(sie_text)
 
         # learn tokens & phrases from 13xx
         koncern_keys, intresse_keys, ovriga_keys = set(), set(), set()
@@ -1202,12 +1074,7 @@ class DatabaseParser:
         # also map 168x kontonamn for per-account classification
         name_168x: dict[int, str] = {}
 
-        for raw in sie_text.splitlines():
-            m = konto_re.match(raw.strip())
-            if not m: 
-                continue
-            acct = int(m.group(1))
-            nm = m.group(2) or ""
+        for acct, nm in doc.account_names.items():
             if 1680 <= acct <= 1689:
                 name_168x[acct] = nm
             b = _bucket_for_13xx(acct)
@@ -1356,7 +1223,7 @@ class DatabaseParser:
                         account_movements[row_id_354]['removed'].extend([acc['account_id'] for acc in cat_accounts])
     
     # ----------------- 17xx → 351/352/353 BR RECLASS (uses SIE text) -----------------
-    def _reclassify_17xx_prepaid_and_accrued_group_receivables(self, sie_text: str, br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
+    def _reclassify_17xx_prepaid_and_accrued_group_receivables(self, sie_text: Union[str, SieDocument], br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
         """
         Reclassify 1700–1799 (Förutbetalda kostnader och upplupna intäkter, etc.) into:
           351 Kortfristiga fordringar hos koncernföretag
@@ -1438,7 +1305,7 @@ class DatabaseParser:
         if abs(total_17xx) < 0.5:
             return
 
-        konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"', re.IGNORECASE)
+        doc = SieDocument.coerce(sie_text)
 
         # learn company tokens/phrases from 13xx buckets
         koncern_keys, intresse_keys, ovriga_keys = set(), set(), set()
@@ -1451,11 +1318,7 @@ class DatabaseParser:
             if (1336 <= acct <= 1337) or (1346 <= acct <= 1347): return "ovriga"
             return None
 
-        for raw in sie_text.splitlines():
-            m = konto_re.match(raw.strip())
-            if not m:
-                continue
-            acct = int(m.group(1)); nm = m.group(2) or ""
+        for acct, nm in doc.account_names.items():
             if 1700 <= acct <= 1799:
                 name_17xx[acct] = nm
             b = _bucket_for_13xx(acct)
@@ -1630,7 +1493,7 @@ class DatabaseParser:
         # debug - targets verified
 
     # ----------------- 296x → 410/411/412 BR RECLASS (uses SIE text) -----------------
-    def _reclassify_296x_short_term_group_liabilities(self, sie_text: str, br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
+    def _reclassify_296x_short_term_group_liabilities(self, sie_text: Union[str, SieDocument], br_rows: List[Dict[str, Any]], current_accounts: Dict[str, float], previous_accounts: Dict[str, float] = None, account_movements: Dict[int, Dict[str, Any]] = None) -> None:
         """
         Reclassify accrued interest payables (2960–2969) from generic short-term
         liabilities to:
@@ -1723,7 +1586,7 @@ class DatabaseParser:
             return
 
         # learn company names from 13xx
-        konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"', re.IGNORECASE)
+        doc = SieDocument.coerce(sie_text)
         name_296x: dict[int, str] = {}
 
         def _bucket_for_13xx(acct: int) -> str | None:
@@ -1735,11 +1598,7 @@ class DatabaseParser:
         koncern_keys, intresse_keys, ovriga_keys = set(), set(), set()
         koncern_phr,  intresse_phr,  ovriga_phr  = set(), set(), set()
 
-        for raw in sie_text.splitlines():
-            m = konto_re.match(raw.strip())
-            if not m:
-                continue
-            acct = int(m.group(1)); nm = m.group(2) or ""
+        for acct, nm in doc.account_names.items():
             if 2960 <= acct <= 2969:
                 name_296x[acct] = nm
             b = _bucket_for_13xx(acct)
@@ -1937,7 +1796,7 @@ class DatabaseParser:
     # ----------------- 28xx POSITIVE BALANCE → 351 BR RECLASS (anomaly handler) -----------------
     def _reclassify_positive_28xx_liabilities_to_receivables(
         self, 
-        sie_text: str, 
+        sie_text: Union[str, SieDocument], 
         br_rows: List[Dict[str, Any]], 
         current_accounts: Dict[str, float],
         previous_accounts: Dict[str, float] = None,
@@ -1987,12 +1846,8 @@ class DatabaseParser:
             return None
 
         # Parse account names from SIE to understand which 28xx accounts are koncern-related
-        konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"', re.IGNORECASE)
-        account_names: Dict[int, str] = {}
-        for line in sie_text.splitlines():
-            m = konto_re.match(line.strip())
-            if m:
-                account_names[int(m.group(1))] = m.group(2)
+        doc = SieDocument.coerce(sie_text)
+        account_names: Dict[int, str] = dict(doc.account_names)
 
         def _classify_28xx(acct: int) -> str | None:
             """Classify 28xx account to koncern/intresse/ovriga based on name patterns."""
@@ -2029,20 +1884,11 @@ class DatabaseParser:
         def _get_prev_ub_balance(acct: int) -> float:
             """Get UB -1 balance for an account. If no UB -1, use IB 0 as proxy."""
             # First try UB -1
-            ub_rx = re.compile(rf'^#UB\s+-1\s+{acct}\s+(-?[\d\s.,]+)')
-            for line in sie_text.splitlines():
-                m = ub_rx.match(line.strip())
-                if m:
-                    return float(m.group(1).replace(" ", "").replace(",", "."))
+            if doc.has_balance('UB', -1, acct):
+                return doc.balance_sum('UB', -1, acct)
             
             # Fallback: IB 0 is the same as UB -1 (closing balance of previous year)
-            ib_rx = re.compile(rf'^#IB\s+0\s+{acct}\s+(-?[\d\s.,]+)')
-            for line in sie_text.splitlines():
-                m = ib_rx.match(line.strip())
-                if m:
-                    return float(m.group(1).replace(" ", "").replace(",", "."))
-            
-            return 0.0
+            return doc.balance_sum('IB', 0, acct)
 
         # Find destination and source rows
         row_351 = _find_by_id(br_rows, 351) or _find_by_label(br_rows, "Kortfristiga fordringar hos koncernföretag")
@@ -2480,51 +2326,38 @@ class DatabaseParser:
             print(f"Error retrieving financial data: {e}")
             return {'rr_data': {}, 'br_data': {}}
 
-    def extract_company_info(self, se_content: str) -> Dict[str, Any]:
+    def extract_company_info(self, se_content: Union[str, SieDocument]) -> Dict[str, Any]:
         """Extract company information from SE file headers"""
         from datetime import datetime
         
         company_info = {}
-        lines = se_content.split('\n')
+        doc = SieDocument.coerce(se_content)
         
         # Add report creation date and time (Framställningsdatum)
         now = datetime.now()
         company_info['DatFramst'] = now.strftime('%Y%m%d')  # YYYYMMDD format
         company_info['TidFramst'] = now.strftime('%H%M%S')  # HHMMSS format
         
-        for line in lines:
-            line = line.strip()
-            
-            if line.startswith('#FNAMN'):
-                # Company name: #FNAMN "Company Name"
-                parts = line.split('"', 2)
-                if len(parts) >= 2:
-                    company_info['company_name'] = parts[1]
-                    
-            elif line.startswith('#ORGNR'):
-                # Organization number: #ORGNR 556610-3643
-                parts = line.split()
-                if len(parts) >= 2:
-                    company_info['organization_number'] = parts[1]
-                    
-            elif line.startswith('#RAR'):
-                # Fiscal year: #RAR 0 20240101 20241231 or #RAR -1 20230101 20231231
-                parts = line.split()
-                if len(parts) >= 4:
-                    if parts[1] == '0':  # Current year
-                        company_info['fiscal_year'] = int(parts[2][:4])  # Extract year from date
-                        company_info['start_date'] = parts[2]
-                        company_info['end_date'] = parts[3]
-                    elif parts[1] == '-1':  # Previous year
-                        company_info['previous_start_date'] = parts[2]
-                        company_info['previous_end_date'] = parts[3]
-                        
-            elif line.startswith('#PROGRAM'):
-                # System info: #PROGRAM iOrdning 7.6.39
-                # Extract everything after #PROGRAM
-                system_info_text = line[len('#PROGRAM'):].strip()
-                if system_info_text:
-                    company_info['system_info'] = system_info_text
+        # Company name: #FNAMN "Company Name"
+        if doc.company_name is not None:
+            company_info['company_name'] = doc.company_name
+        
+        # Organization number: #ORGNR 556610-3643
+        if doc.organization_number is not None:
+            company_info['organization_number'] = doc.organization_number
+        
+        # Fiscal year: #RAR 0 20240101 20241231 or #RAR -1 20230101 20231231
+        if 0 in doc.fiscal_years:
+            start_date, end_date = doc.fiscal_years[0]
+            company_info['fiscal_year'] = int(start_date[:4])  # Extract year from date
+            company_info['start_date'] = start_date
+            company_info['end_date'] = end_date
+        if -1 in doc.fiscal_years:
+            company_info['previous_start_date'], company_info['previous_end_date'] = doc.fiscal_years[-1]
+        
+        # System info: #PROGRAM iOrdning 7.6.39 (everything after #PROGRAM)
+        if doc.program:
+            company_info['system_info'] = doc.program
         
         return company_info
     
@@ -2537,6 +2370,7 @@ class DatabaseParser:
                 'is_calculated': True
             }).eq('id', row_id).execute()
             
+            invalidate_mapping_cache()
             return True
             
         except Exception as e:
@@ -2613,15 +2447,14 @@ class DatabaseParser:
         # 413 = Skatteskulder - driven by INK2 beräknad skatt
         PROTECTED_ROW_IDS = {380, 413}
 
-        # Get calculated mappings sorted by row_id
-        calculated_mappings = [(mapping) for mapping in self.br_mappings
-                              if mapping.get('is_calculated')]
-        calculated_mappings.sort(key=lambda x: int(x['row_id']))
+        br_rows = StatementRows.coerce(br_data)
+        rr_rows = StatementRows.coerce(rr_data)
+        current_lookup = row_value_lookup(br_rows, rr_rows)
+        previous_lookup = row_value_lookup(br_rows, rr_rows, use_previous_year=True)
 
-        # Recalculate each sum row
-        for mapping in calculated_mappings:
-            formula = mapping.get('calculation_formula', '')
-            if not formula:
+        # Recalculate each sum row in formula dependency order
+        for mapping in self._formula_plan('BR').order:
+            if not mapping.get('calculation_formula', ''):
                 continue
 
             row_id = mapping.get('row_id')
@@ -2630,33 +2463,18 @@ class DatabaseParser:
             if int(row_id) in PROTECTED_ROW_IDS:
                 continue
 
-            # Check if this formula references any RR variables - if so, skip
-            references_rr = False
-            if rr_data:
-                import re
-                var_pattern = r'\b([A-Z][a-zA-Z0-9_]*)\b'
-                formula_vars = re.findall(var_pattern, formula)
-                for var_name in formula_vars:
-                    in_br = any(r.get('variable_name') == var_name for r in br_data)
-                    in_rr = any(r.get('variable_name') == var_name for r in rr_data)
-                    if in_rr and not in_br:
-                        references_rr = True
-                        break
-
-            if references_rr:
+            # Skip formulas that reference RR-only variables
+            if self._references_rr_only(mapping, br_rows, rr_rows):
                 continue
             
             # Recalculate from results
-            current_amount = self._recalculate_formula_from_results(mapping, br_data, use_previous_year=False, rr_data=rr_data)
-            previous_amount = self._recalculate_formula_from_results(mapping, br_data, use_previous_year=True, rr_data=rr_data)
+            current_amount = self._evaluate_formula(mapping, current_lookup, "Formula recalculation error")
+            previous_amount = self._evaluate_formula(mapping, previous_lookup, "Formula recalculation error")
             
-            # Update the result
-            for result in br_data:
-                result_id = result.get('id') or result.get('row_id')
-                if str(result_id) == str(row_id):
-                    result['current_amount'] = current_amount
-                    result['previous_amount'] = previous_amount
-                    break
+            result = br_rows.find_id(row_id)
+            if result is not None:
+                result['current_amount'] = current_amount
+                result['previous_amount'] = previous_amount
         
         return br_data
     
@@ -2682,15 +2500,13 @@ class DatabaseParser:
         # 279 = SumAretsResultat - depends on SkattAretsResultat
         PROTECTED_ROW_IDS = {277, 279}
 
-        # Get calculated mappings sorted by row_id
-        calculated_mappings = [mapping for mapping in self.rr_mappings
-                              if mapping.get('is_calculated')]
-        calculated_mappings.sort(key=lambda x: int(x['row_id']))
+        rr_rows = StatementRows.coerce(rr_data)
+        current_lookup = row_value_lookup(rr_rows)
+        previous_lookup = row_value_lookup(rr_rows, use_previous_year=True)
 
-        # Recalculate each sum row
-        for mapping in calculated_mappings:
-            formula = mapping.get('calculation_formula', '')
-            if not formula:
+        # Recalculate each sum row in formula dependency order
+        for mapping in self._formula_plan('RR').order:
+            if not mapping.get('calculation_formula', ''):
                 continue
 
             row_id = mapping.get('row_id')
@@ -2700,16 +2516,13 @@ class DatabaseParser:
                 continue
             
             # Recalculate from results
-            current_amount = self._recalculate_formula_from_results(mapping, rr_data, use_previous_year=False)
-            previous_amount = self._recalculate_formula_from_results(mapping, rr_data, use_previous_year=True)
+            current_amount = self._evaluate_formula(mapping, current_lookup, "Formula recalculation error")
+            previous_amount = self._evaluate_formula(mapping, previous_lookup, "Formula recalculation error")
             
-            # Update the result
-            for result in rr_data:
-                result_id = result.get('id') or result.get('row_id')
-                if str(result_id) == str(row_id):
-                    result['current_amount'] = current_amount
-                    result['previous_amount'] = previous_amount
-                    break
+            result = rr_rows.find_id(row_id)
+            if result is not None:
+                result['current_amount'] = current_amount
+                result['previous_amount'] = previous_amount
         
         return rr_data
 
@@ -2787,7 +2600,7 @@ class DatabaseParser:
             'rr_data': updated_rr_data
         }
     
-    def parse_ink2_data(self, current_accounts: Dict[str, float], fiscal_year: int = None, rr_data: List[Dict[str, Any]] = None, br_data: List[Dict[str, Any]] = None, sie_text: str = None, previous_accounts: Dict[str, float] = None) -> List[Dict[str, Any]]:
+    def parse_ink2_data(self, current_accounts: Dict[str, float], fiscal_year: int = None, rr_data: List[Dict[str, Any]] = None, br_data: List[Dict[str, Any]] = None, sie_text: Union[str, SieDocument] = None, previous_accounts: Dict[str, float] = None) -> List[Dict[str, Any]]:
         """
         Parse INK2 tax calculation data using database mappings.
         Returns simplified structure: row_title and amount only.
@@ -2796,13 +2609,18 @@ class DatabaseParser:
         if sie_text:
             self._parse_sie_account_descriptions(sie_text)
         
-        # Force reload mappings to get fresh data from database
-        self._load_mappings()
         if not self.ink2_mappings:
             return []
         
         results = []
         
+        # Index RR/BR rows once for all variable lookups below
+        rr_data = StatementRows.coerce(rr_data)
+        br_data = StatementRows.coerce(br_data)
+        
+        # Index the accounts once; every account-based variable reads from it
+        current_index = AccountIndex(current_accounts)
+        
         # Sort mappings by row_id to maintain correct order
         sorted_mappings = sorted(self.ink2_mappings, key=lambda x: x.get('row_id', 0))
         
@@ -2810,7 +2628,7 @@ class DatabaseParser:
         for mapping in sorted_mappings:
             try:
                 # Always calculate (or default to 0) so rows can be shown with blank amount if needed
-                amount = self.calculate_ink2_variable_value(mapping, current_accounts, fiscal_year, rr_data, ink_values, br_data, previous_accounts)
+                amount = self.calculate_ink2_variable_value(mapping, current_index, fiscal_year, rr_data, ink_values, br_data, previous_accounts)
                 
                 
                 # Special handling: hide INK4_header (duplicate "Skatteberäkning")
@@ -2850,7 +2668,7 @@ class DatabaseParser:
     
     def parse_ink2_data_with_overrides(self, current_accounts: Dict[str, float], fiscal_year: int = None, 
                                        rr_data: List[Dict[str, Any]] = None, br_data: List[Dict[str, Any]] = None,
-                                       manual_amounts: Dict[str, float] = None, sie_text: str = None, previous_accounts: Dict[str, float] = None) -> List[Dict[str, Any]]:
+                                       manual_amounts: Dict[str, float] = None, sie_text: Union[str, SieDocument] = None, previous_accounts: Dict[str, float] = None) -> List[Dict[str, Any]]:
         """
         Parse INK2 tax calculation data with manual amount overrides for dynamic recalculation.
         """
@@ -2858,17 +2676,46 @@ class DatabaseParser:
         if sie_text:
             self._parse_sie_account_descriptions(sie_text)
         
-        # Force reload mappings to get fresh data from database
-        self._load_mappings()
         if not self.ink2_mappings:
             return []
         
         manual_amounts = manual_amounts or {}
         results = []
         
-        # Sort mappings by row_id to maintain correct order
-        sorted_mappings = sorted(self.ink2_mappings, key=lambda x: x.get('row_id', 0))
+        # Index RR/BR rows once for all variable lookups below
+        rr_data = StatementRows.coerce(rr_data)
+        br_data = StatementRows.coerce(br_data)
+        
+        # Index the accounts once; every account-based variable reads from it
+        current_index = AccountIndex(current_accounts)
+        
+        ink_values = self.ink2_override_seed_values(manual_amounts)
+               
+        for mapping in self.ink2_sorted_mappings():
+            try:
+                result = self.evaluate_ink2_override_row(mapping, current_index, fiscal_year, rr_data, br_data,
+                                                         previous_accounts, manual_amounts, ink_values)
+                if result is not None:
+                    results.append(result)
+                
+            except Exception as e:
+                print(f"Error processing INK2 mapping {mapping.get('variable_name', 'unknown')}: {e}")
+                continue
         
+        # Add calculated values to ink_values to make them sticky
+        for result in results:
+            if result['variable_name'] in ['INK4.6a', 'INK4.6b', 'INK4.6d'] and result['amount'] != 0:
+                ink_values[result['variable_name']] = result['amount']
+                print(f"Added {result['variable_name']} to ink_values: {result['amount']}")
+        
+        return results
+
+    def ink2_sorted_mappings(self) -> List[Dict[str, Any]]:
+        """INK2 mappings sorted by row_id to maintain correct order"""
+        return sorted(self.ink2_mappings, key=lambda x: x.get('row_id', 0))
+
+    def ink2_override_seed_values(self, manual_amounts: Dict[str, float]) -> Dict[str, float]:
+        """ink_values injected from manual_amounts before any INK2 row is evaluated"""
         ink_values: Dict[str, float] = {}
         
         # Inject justering_sarskild_loneskatt into ink_values if provided
@@ -2898,69 +2745,66 @@ class DatabaseParser:
         for var_name in calculated_editable_vars:
             if var_name in manual_amounts:
                 ink_values[var_name] = manual_amounts[var_name]
-               
-        for mapping in sorted_mappings:
-            try:
-                variable_name = mapping.get('variable_name', '')
-                
-                # Force recalculation of dependent summary values even if not manually edited
-                force_recalculate = variable_name in ['INK_skattemassigt_resultat', 'INK_beraknad_skatt']
-                
-                # Check if this value has been manually overridden (but only for non-calculated fields)
-                if variable_name in manual_amounts and not force_recalculate:
-                    amount = manual_amounts[variable_name]
-                    ink_values[variable_name] = amount  # Store for dependencies
-                else:
-                    # Calculate normally (or force recalculate for dependent values)
-                    amount = self.calculate_ink2_variable_value(mapping, current_accounts, fiscal_year, rr_data, ink_values, br_data, previous_accounts)
-                    # Round all INK2 values to 0 decimals (skattemässigt resultat already has special rounding)
-                    if variable_name != 'INK_skattemassigt_resultat':
-                        amount = round(amount, 0)
-                    # IMPORTANT: Store calculated values for later formulas
-                    ink_values[variable_name] = amount
-                
-                
-                # Keep only essential debug for important tax calculations
-                
-                # Special handling: hide INK4_header (duplicate "Skatteberäkning")
-                if variable_name == 'INK4_header':
-                    continue  # Skip this row entirely
-                
-                # Return all rows - let frontend handle visibility logic
-                # Get account details for SHOW button if needed
-                account_details = []
-                if mapping.get('show_tag'):
-                    account_details = self._get_ink2_account_details(mapping, current_accounts, previous_accounts)
-                
-                results.append({
-                        'row_id': mapping.get('row_id', 0),
-                        'row_title': mapping['row_title'],
-                        'amount': amount,
-                        'variable_name': variable_name,
-                        'show_tag': mapping.get('show_tag', False),
-                        'accounts_included': mapping.get('accounts_included', ''),
-                        'show_amount': self._normalize_show_amount(mapping.get('show_amount')),
-                        'style': mapping.get('style', 'NORMAL'),
-                        'is_calculated': self._normalize_is_calculated(mapping.get('is_calculated')),
-                        'always_show': self._normalize_always_show(mapping.get('always_show', False)),
-                        'toggle_show': mapping.get('toggle_show', False),
-                        'explainer': mapping.get('explainer', ''),
-                        'block': mapping.get('block', ''),
-                        'header': mapping.get('header', False),
-                        'account_details': account_details
-                    })
-                
-            except Exception as e:
-                print(f"Error processing INK2 mapping {mapping.get('variable_name', 'unknown')}: {e}")
-                continue
         
-        # Add calculated values to ink_values to make them sticky
-        for result in results:
-            if result['variable_name'] in ['INK4.6a', 'INK4.6b', 'INK4.6d'] and result['amount'] != 0:
-                ink_values[result['variable_name']] = result['amount']
-                print(f"Added {result['variable_name']} to ink_values: {result['amount']}")
+        return ink_values
+
+    def evaluate_ink2_override_row(self, mapping: Dict[str, Any], current_accounts: Union[Dict[str, float], AccountIndex], fiscal_year: int,
+                                   rr_data, br_data, previous_accounts: Dict[str, float],
+                                   manual_amounts: Dict[str, float], ink_values: Dict[str, float]) -> Optional[Dict[str, Any]]:
+        """
+        Evaluate one INK2 mapping for parse_ink2_data_with_overrides: stores the amount in
+        ink_values and returns the result row (None for rows that are not returned).
+        """
+        variable_name = mapping.get('variable_name', '')
+        current_index = AccountIndex.coerce(current_accounts)
+        current_accounts = current_index.accounts
         
-        return results
+        # Force recalculation of dependent summary values even if not manually edited
+        force_recalculate = variable_name in ['INK_skattemassigt_resultat', 'INK_beraknad_skatt']
+        
+        # Check if this value has been manually overridden (but only for non-calculated fields)
+        if variable_name in manual_amounts and not force_recalculate:
+            amount = manual_amounts[variable_name]
+            ink_values[variable_name] = amount  # Store for dependencies
+        else:
+            # Calculate normally (or force recalculate for dependent values)
+            amount = self.calculate_ink2_variable_value(mapping, current_index, fiscal_year, rr_data, ink_values, br_data, previous_accounts)
+            # Round all INK2 values to 0 decimals (skattemässigt resultat already has special rounding)
+            if variable_name != 'INK_skattemassigt_resultat':
+                amount = round(amount, 0)
+            # IMPORTANT: Store calculated values for later formulas
+            ink_values[variable_name] = amount
+        
+        
+        # Keep only essential debug for important tax calculations
+        
+        # Special handling: hide INK4_header (duplicate "Skatteberäkning")
+        if variable_name == 'INK4_header':
+            return None  # Skip this row entirely
+        
+        # Return all rows - let frontend handle visibility logic
+        # Get account details for SHOW button if needed
+        account_details = []
+        if mapping.get('show_tag'):
+            account_details = self._get_ink2_account_details(mapping, current_accounts, previous_accounts)
+        
+        return {
+                'row_id': mapping.get('row_id', 0),
+                'row_title': mapping['row_title'],
+                'amount': amount,
+                'variable_name': variable_name,
+                'show_tag': mapping.get('show_tag', False),
+                'accounts_included': mapping.get('accounts_included', ''),
+                'show_amount': self._normalize_show_amount(mapping.get('show_amount')),
+                'style': mapping.get('style', 'NORMAL'),
+                'is_calculated': self._normalize_is_calculated(mapping.get('is_calculated')),
+                'always_show': self._normalize_always_show(mapping.get('always_show', False)),
+                'toggle_show': mapping.get('toggle_show', False),
+                'explainer': mapping.get('explainer', ''),
+                'block': mapping.get('block', ''),
+                'header': mapping.get('header', False),
+                'account_details': account_details
+            }
 
     def _normalize_show_amount(self, value: Any) -> bool:
         """Normalize show_amount to boolean. Handles string 'TRUE'/'FALSE' from database."""
@@ -2994,22 +2838,22 @@ class DatabaseParser:
                 return None  # Empty string or other values = None (show if amount != 0 OR toggle on)
         return None  # Default to None for any other type
     
-    def calculate_ink2_variable_value(self, mapping: Dict[str, Any], accounts: Dict[str, float], fiscal_year: int = None, rr_data: List[Dict[str, Any]] = None, ink_values: Optional[Dict[str, float]] = None, br_data: Optional[List[Dict[str, Any]]] = None, previous_accounts: Dict[str, float] = None) -> float:
+    def calculate_ink2_variable_value(self, mapping: Dict[str, Any], accounts: Union[Dict[str, float], AccountIndex], fiscal_year: int = None, rr_data: List[Dict[str, Any]] = None, ink_values: Optional[Dict[str, float]] = None, br_data: Optional[List[Dict[str, Any]]] = None, previous_accounts: Dict[str, float] = None) -> float:
         """
         Calculate the value for an INK2 variable using accounts and formulas.
         # Back to latest commit with all fixes
         """
         variable_name = mapping.get('variable_name', '')
+        # Ranges are summed from the sorted index, single accounts looked up in the dict
+        index = AccountIndex.coerce(accounts)
+        accounts = index.accounts
+
+        rr_data = StatementRows.coerce(rr_data)
+        br_data = StatementRows.coerce(br_data)
 
         # Helper to fetch RR variables
         def rr(var: str) -> float:
-            if not rr_data:
-                return 0.0
-            for item in rr_data:
-                if item.get('variable_name') == var:
-                    value = item.get('current_amount')
-                    return float(value) if value is not None else 0.0
-            return 0.0
+            return float(rr_data.get(var, 'current_amount', 0.0))
 
         # Explicit logic for key variables
         if variable_name == 'INK4.1':
@@ -3026,13 +2870,7 @@ class DatabaseParser:
         if variable_name == 'INK4.6a':
             # Periodiseringsfonder previous_year * statslaneranta
             rate = float(self.global_variables.get('statslaneranta', 0.0))
-            prev = 0.0
-            if br_data:
-                for item in br_data:
-                    if item.get('variable_name') == 'Periodiseringsfonder':
-                        val = item.get('previous_amount')
-                        prev = float(val) if val is not None else 0.0
-                        break
+            prev = float(br_data.get('Periodiseringsfonder', 'previous_amount', 0.0))
             return prev * rate
         
         if variable_name == 'INK4.6b':
@@ -3301,7 +3139,7 @@ class DatabaseParser:
             return self.calculate_ink2_formula_value(mapping, accounts, fiscal_year, rr_data, ink_values)
         
         # Otherwise, sum the included accounts (use absolute values for positive-only variables)
-        account_sum = self.sum_included_accounts(mapping.get('accounts_included', ''), accounts)
+        account_sum = self.sum_included_accounts(mapping.get('accounts_included', ''), index)
         # Variables that should always be positive (account-based calculations)
         positive_only_variables = [
             'INK4.3c', 'INK4.4a', 'INK4.5b', 'INK4.5c', 
@@ -3338,7 +3176,11 @@ class DatabaseParser:
                 
                 # Replace RR variable references - Use regex with word boundaries to prevent partial matches
                 import re
+                # Plain word names can only match if they are one of the formula's words
+                formula_words = set(re.findall(r'\w+', formula_with_values))
                 for var_name, var_value in rr_variables.items():
+                    if var_name not in formula_words and _WORD_RE.fullmatch(var_name):
+                        continue
                     # Use word boundaries (\b) to match whole words only
                     pattern = r'\b' + re.escape(var_name) + r'\b'
                     if re.search(pattern, formula_with_values):
@@ -3349,12 +3191,13 @@ class DatabaseParser:
             # Replace INK variable references with their calculated values
             if ink_values:
                 import re
-                for var_name, var_value in ink_values.items():
+                for var_name in list(ink_values):
                     # Use word boundaries to match whole words only
                     pattern = r'\b' + re.escape(var_name) + r'\b'
                     if re.search(pattern, formula_with_values):
+                        var_value = ink_values[var_name]
                         # Get the sign from the mapping for this variable
-                        var_mapping = next((m for m in self.ink2_mappings if m.get('variable_name') == var_name), None)
+                        var_mapping = self._ink2_mapping_by_variable().get(var_name)
                         if var_mapping:
                             sign_column = var_mapping.get('*/+/-', '+')
                             if sign_column == '-':
@@ -3389,6 +3232,17 @@ class DatabaseParser:
             print(f"Error evaluating formula '{formula}': {e}")
             return 0.0
     
+    def _ink2_mapping_by_variable(self) -> Dict[Any, Dict[str, Any]]:
+        """variable_name -> first INK2 mapping with that name (rebuilt if the mappings were replaced)"""
+        cached = self._ink2_mapping_index
+        if cached is None or cached[0] is not self.ink2_mappings:
+            index = {}
+            for m in self.ink2_mappings or []:
+                index.setdefault(m.get('variable_name'), m)
+            cached = (self.ink2_mappings, index)
+            self._ink2_mapping_index = cached
+        return cached[1]
+
     def _clean_formula_for_python(self, formula: str) -> str:
         """
         Interpret and convert formula logic to executable Python code.
@@ -3447,7 +3301,7 @@ class DatabaseParser:
         # that may not be calculated yet. This needs a more sophisticated approach.
         return '0'
     
-    def sum_included_accounts(self, accounts_included: str, accounts: Dict[str, float]) -> float:
+    def sum_included_accounts(self, accounts_included: str, accounts: Union[Dict[str, float], AccountIndex]) -> float:
         """
         Sum the values of included accounts.
         accounts_included format: "6072;6992;7632" or "6000-6999"
@@ -3455,45 +3309,9 @@ class DatabaseParser:
         if not accounts_included:
             return 0.0
         
-        total = 0.0
-        
-        # Split by both semicolon and comma for multiple accounts/ranges (handle both separators)
-        account_specs = accounts_included.replace(',', ';').split(';')
-        
-        for spec in account_specs:
-            spec = spec.strip()
-            if not spec:
-                continue
-                
-            if '-' in spec:
-                # Range format: "6000-6999"
-                try:
-                    start, end = spec.split('-')
-                    start_num = int(start.strip())
-                    end_num = int(end.strip())
-                    
-                    for account_id, balance in accounts.items():
-                        try:
-                            account_num = int(account_id)
-                            if start_num <= account_num <= end_num:
-                                total += balance
-                        except ValueError:
-                            continue
-                            
-                except ValueError:
-                    print(f"Invalid range format: {spec}")
-                    continue
-            else:
-                # Single account
-                try:
-                    account_id = spec.strip()
-                    balance = accounts.get(account_id, 0.0)
-                    total += balance
-                except Exception:
-                    print(f"Invalid account format: {spec}")
-                    continue
-        
-        return total
+        # Split by both semicolon and comma (compiled once per spec string)
+        terms = compile_accounts_included(accounts_included)
+        return AccountIndex.coerce(accounts).sum_included(terms)
     
     def _get_account_details(self, accounts_included: str, accounts: Dict[str, float]) -> List[Dict[str, Any]]:
         """
@@ -3753,7 +3571,7 @@ class DatabaseParser:
             # Standard account details for other variables
             return self._get_account_details(mapping.get('accounts_included', ''), accounts)
 
-    def _parse_sie_account_descriptions(self, sie_text: str):
+    def _parse_sie_account_descriptions(self, sie_text: Union[str, SieDocument]):
         """Parse account descriptions from SIE file #KONTO lines with character normalization"""
         import re
         import unicodedata
@@ -3776,24 +3594,16 @@ class DatabaseParser:
                 "Ý": "å", "ý": "å",
             }))
         
-        # Pre-normalize SIE text like other parsers
-        sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-        
-        konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"\s*$')
+        doc = SieDocument.coerce(sie_text)
         
-        for line in sie_text.splitlines():
-            line = line.strip()
-            match = konto_re.match(line)
-            if match:
-                account_id = int(match.group(1))
-                raw_description = match.group(2)
-                # Apply mojibake fixes but keep original case for display
-                description = _fix_mojibake(raw_description)
-                self.sie_account_descriptions[account_id] = description
-                self.sie_account_descriptions[str(account_id)] = description
+        for account_id, raw_description in doc.account_names.items():
+            # Apply mojibake fixes but keep original case for display
+            description = _fix_mojibake(raw_description)
+            self.sie_account_descriptions[account_id] = description
+            self.sie_account_descriptions[str(account_id)] = description
 
     def _get_account_text(self, account_id: Any) -> str:
-        """Return kontotext for given account id using SIE file first, then cache and DB fallback."""
+        """Return kontotext for given account id using SIE file first, then the cached accounts table."""
         # Try SIE account descriptions first (most accurate)
         try:
             acc_int = int(account_id)
@@ -3815,108 +3625,39 @@ class DatabaseParser:
         
         if key_str in self.accounts_lookup:
             return self.accounts_lookup[key_str]
-            
-        # Fallback: query Supabase directly and update cache
-        try:
-            resp = supabase.table('accounts_table').select('account_text,account_id').eq('account_id', key_str).limit(1).execute()
-            if resp.data:
-                text = resp.data[0].get('account_text') or f'Konto {key_str}'
-                if acc_int is not None:
-                    self.accounts_lookup[acc_int] = text
-                self.accounts_lookup[key_str] = text
-                return text
-        except Exception:
-            pass
+        
+        # The snapshot holds the full accounts_table, so a miss here is a miss in the database too
         return f'Konto {key_str}'
     
-    def parse_noter_data(self, se_content: str, user_toggles: Dict[str, bool] = None, two_files_flag: bool = False, previous_year_se_content: str = None) -> List[Dict[str, Any]]:
+    def parse_noter_data(self, se_content: Union[str, SieDocument], user_toggles: Dict[str, bool] = None, two_files_flag: bool = False, previous_year_se_content: Union[str, SieDocument] = None) -> List[Dict[str, Any]]:
         """
         Parse Noter (Notes) data using database mappings.
         Returns structure with current_amount and previous_amount for both fiscal year and previous year.
         """
-        # Force reload mappings to get fresh data from database
-        self._load_mappings()
         if not self.noter_mappings:
             print("No Noter mappings available")
             return []
         
+        # Tokenize once; the K2 note stage below reads from the same document
+        se_content = SieDocument.coerce(se_content)
+        previous_year_se_content = SieDocument.coerce(previous_year_se_content or None)
+        
         # Parse all balance types from SE file
         current_ub, previous_ub, current_ib, previous_ib = self.parse_ib_ub_balances(se_content)
         
-        # Get precise KONCERN calculations from transaction analysis
-        from .koncern_k2_parser import parse_koncern_k2_from_sie_text
-        koncern_k2_data = parse_koncern_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise INTRESSEFTG calculations from transaction analysis
-        from .intresseftg_k2_parser import parse_intresseftg_k2_from_sie_text
-        intresseftg_k2_data = parse_intresseftg_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise BYGG calculations from transaction analysis
-        from .bygg_k2_parser import parse_bygg_k2_from_sie_text
-        bygg_k2_data = parse_bygg_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise MASKINER calculations from transaction analysis
-        from .maskiner_k2_parser import parse_maskiner_k2_from_sie_text
-        maskiner_k2_data = parse_maskiner_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise INVENTARIER calculations from transaction analysis
-        from .inventarier_k2_parser import parse_inventarier_k2_from_sie_text
-        inventarier_k2_data = parse_inventarier_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise ÖVRIGA calculations from transaction analysis
-        from .ovriga_k2_parser import parse_ovriga_k2_from_sie_text
-        ovriga_k2_data = parse_ovriga_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise LVP calculations from transaction analysis
-        from .lvp_k2_parser import parse_lvp_k2_from_sie_text
-        lvp_k2_data = parse_lvp_k2_from_sie_text(
-            se_content, 
-            debug=False, 
-            two_files_flag=two_files_flag, 
-            previous_year_sie_text=previous_year_se_content
-        )
-        
-        # Get precise FORDRKONC calculations from transaction analysis
-        from .fordringar_koncern_k2_parser import parse_fordringar_koncern_k2_from_sie_text
-        fordrkonc_k2_data = parse_fordringar_koncern_k2_from_sie_text(se_content, debug=False)
-        
-        # Get precise FORDRINTRE calculations from transaction analysis
-        from .fordringar_intresseftg_k2_parser import parse_fordringar_intresseftg_k2_from_sie_text
-        fordrintre_k2_data = parse_fordringar_intresseftg_k2_from_sie_text(se_content, debug=False)
-        
-        # Get precise FORDROVRFTG calculations from transaction analysis
-        from .fordringar_ovrftg_k2_parser import parse_fordringar_ovrftg_k2_from_sie_text
-        fordrovrftg_k2_data = parse_fordringar_ovrftg_k2_from_sie_text(se_content, debug=False)
+        # Run all K2 note parsers as one stage on the shared document
+        from .k2_notes import run_k2_note_parsers
+        k2_results = run_k2_note_parsers(se_content, two_files_flag, previous_year_se_content)
+        koncern_k2_data = k2_results['koncern']
+        intresseftg_k2_data = k2_results['intresseftg']
+        bygg_k2_data = k2_results['bygg']
+        maskiner_k2_data = k2_results['maskiner']
+        inventarier_k2_data = k2_results['inventarier']
+        ovriga_k2_data = k2_results['ovriga']
+        lvp_k2_data = k2_results['lvp']
+        fordrkonc_k2_data = k2_results['fordrkonc']
+        fordrintre_k2_data = k2_results['fordrintre']
+        fordrovrftg_k2_data = k2_results['fordrovrftg']
         
         # Define all K2 variable names to exclude from database processing
         koncern_variables = set(koncern_k2_data.keys())
@@ -4039,6 +3780,9 @@ class DatabaseParser:
         # Sort mappings by row_id to maintain correct order
         sorted_mappings = sorted(self.noter_mappings, key=lambda x: x.get('row_id', 0))
         
+        # Sorted account indexes for UB/IB of both years, shared by every noter row
+        balance_indexes = [AccountIndex(b) for b in (current_ub, previous_ub, current_ib, previous_ib)]
+        
         # First pass: Calculate all account-based variables
         for mapping in sorted_mappings:
             variable_name = (mapping.get('variable_name') or '').strip()
@@ -4065,7 +3809,7 @@ class DatabaseParser:
                 
             # Use database calculation only for non-BYGG variables
             current_amount, previous_amount = self._calculate_noter_amounts(
-                mapping, current_ub, previous_ub, current_ib, previous_ib
+                mapping, *balance_indexes
             )
             
             calculated_variables[variable_name] = {
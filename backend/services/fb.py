@@ -3,10 +3,12 @@ Förvaltningsberättelse (FB) Module
 Standalone module for calculating "Förändring i eget kapital" table
 """
 
-import re
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, Optional, Tuple, Union
 from collections import defaultdict
 
+from .sie_document import SieDocument
+from .financial_statement import StatementRows
+
 
 class ForvaltningsberattelseFB:
     """Förvaltningsberättelse module for calculating Förändring i eget kapital"""
@@ -27,65 +29,22 @@ class ForvaltningsberattelseFB:
         except (ValueError, TypeError):
             return 0.0
     
-    def _parse_sie_verifications(self, sie_text: str) -> List[Dict[str, Any]]:
+    def _parse_sie_verifications(self, sie_text: Union[str, SieDocument]) -> List[Dict[str, Any]]:
         """Parse SIE file verifications and transactions"""
-        lines = sie_text.splitlines()
+        doc = SieDocument.coerce(sie_text)
         verifications = []
         
-        # Regex patterns for parsing
-        ver_header_re = re.compile(r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"([^"]*)"|(.+)))?\s*$')
-        trans_re = re.compile(
-            r'^#(?:BTRANS|RTRANS|TRANS)\s+'
-            r'(\d{3,4})'  # Account number
-            r'(?:\s+\{.*?\})?'  # Optional object
-            r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'  # Amount
-            r'(?:\s+\d{8})?'  # Optional date
-            r'(?:\s+"(.*?)")?'  # Optional text
-            r'\s*$'
-        )
-        
-        current_ver = None
-        in_block = False
-        
-        for line in lines:
-            line = line.strip()
-            
-            # Check for verification header
-            ver_match = ver_header_re.match(line)
-            if ver_match:
-                current_ver = {
-                    'series': ver_match.group(1),
-                    'number': int(ver_match.group(2)),
-                    'date': ver_match.group(3),
-                    'text': (ver_match.group(4) or ver_match.group(5) or "").strip('"'),
-                    'transactions': []
-                }
-                continue
-            
-            # Handle block start/end
-            if line == "{":
-                in_block = True
-                continue
-            elif line == "}":
-                in_block = False
-                if current_ver:
-                    verifications.append(current_ver)
-                    current_ver = None
-                continue
-            
-            # Parse transactions within blocks
-            if in_block and current_ver:
-                trans_match = trans_re.match(line)
-                if trans_match:
-                    account = int(trans_match.group(1))
-                    amount = self._normalize_float(trans_match.group(2))
-                    text = trans_match.group(3) or ""
-                    
-                    current_ver['transactions'].append({
-                        'account': account,
-                        'amount': amount,
-                        'text': text
-                    })
+        for ver in doc.vouchers:
+            verifications.append({
+                'series': ver.series,
+                'number': ver.number,
+                'date': ver.date,
+                'text': ver.text,
+                'transactions': [
+                    {'account': t.account, 'amount': t.amount, 'text': t.text}
+                    for t in ver.transactions
+                ]
+            })
         
         return verifications
     
@@ -278,13 +237,9 @@ class ForvaltningsberattelseFB:
     
     def _get_br_value(self, br_data: List[Dict[str, Any]], variable_name: str, use_previous_year: bool = False) -> float:
         """Get BR value by variable name, handling current_amount (UB) vs previous_amount (IB)"""
-        for item in br_data:
-            if item.get('variable_name') == variable_name:
-                value = item.get('previous_amount' if use_previous_year else 'current_amount', 0)
-                return value if value is not None else 0.0
-        return 0.0
+        return StatementRows.coerce(br_data).get(variable_name, 'previous_amount' if use_previous_year else 'current_amount', 0.0)
 
-    def calculate_forandring_eget_kapital(self, sie_text: str, br_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    def calculate_forandring_eget_kapital(self, sie_text: Union[str, SieDocument], br_data: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Calculate all variables for Förändring i eget kapital table
         br_data should be the list of BR results from database_parser.parse_br_data()
@@ -300,6 +255,7 @@ class ForvaltningsberattelseFB:
         uppskrfond_aterforing_balanserat_resultat = self._calculate_uppskrfond_aterforing_balanserat_resultat_from_verifications(verifications)
         
         # IB = previous_amount (Ingående balans), UB = current_amount (Utgående balans)
+        br_data = StatementRows.coerce(br_data)
         aktiekapital_ib = self._get_br_value(br_data, 'Aktiekapital', use_previous_year=True)
         aktiekapital_ub = self._get_br_value(br_data, 'Aktiekapital', use_previous_year=False)
         reservfond_ib = self._get_br_value(br_data, 'Reservfond', use_previous_year=True)
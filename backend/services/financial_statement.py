@@ -0,0 +1,123 @@
+"""
+Financial Statement Module
+Hash indexes over the RR/BR/INK2 row lists so resolvers look rows up in O(1).
+
+The row lists produced by DatabaseParser (and echoed back by the frontend) are
+lists of dicts keyed by 'variable_name' and 'id'/'row_id'. Resolvers used to
+scan those lists once per variable; StatementRows wraps a list with indexes
+built once, and FinancialStatement groups the three sections.
+
+StatementRows is itself a read-only sequence of the wrapped rows, so it can
+be passed to code that iterates the plain list. It keeps its own tuple of the
+rows, so rows appended to or removed from the original list afterwards are
+not seen; wrap the list again after changing it. Amounts are read from the
+row dicts on every lookup (rows may be updated in place).
+
+Usage:
+    statement = FinancialStatement(rr_data, br_data, ink2_data)
+    statement.value('RR', 'SumAretsResultat')
+    statement.value('BR', 'Periodiseringsfonder', previous_year=True)
+    rr = StatementRows.coerce(rr_data)
+    rr.find('SkattAretsResultat')
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+Row = Dict[str, Any]
+
+
+class StatementRows(Sequence):
+    """Rows of one statement section with indexes by variable_name and row id."""
+
+    __slots__ = ('rows', '_by_variable', '_by_id')
+
+    def __init__(self, rows: Optional[Sequence[Row]] = None):
+        self.rows: Tuple[Row, ...] = tuple(rows or ())
+        by_variable: Dict[str, List[Row]] = {}
+        by_id: Dict[str, Row] = {}
+        for row in self.rows:
+            name = row.get('variable_name')
+            if name:
+                by_variable.setdefault(name, []).append(row)
+            row_id = row.get('id') or row.get('row_id')
+            if row_id is not None:
+                by_id.setdefault(str(row_id), row)
+        self._by_variable = by_variable
+        self._by_id = by_id
+
+    @classmethod
+    def coerce(cls, rows: Union[Sequence[Row], "StatementRows", None]) -> "StatementRows":
+        """Accept either a list of row dicts or an already indexed StatementRows."""
+        if isinstance(rows, StatementRows):
+            return rows
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[Row]:
+        return iter(self.rows)
+
+    def __getitem__(self, i):
+        return self.rows[i]
+
+    def find(self, variable_name: str) -> Optional[Row]:
+        """First row with this variable_name, or None."""
+        matches = self._by_variable.get(variable_name)
+        return matches[0] if matches else None
+
+    def find_all(self, variable_name: str) -> List[Row]:
+        """All rows with this variable_name, in list order."""
+        return self._by_variable.get(variable_name, [])
+
+    def find_id(self, row_id: Any) -> Optional[Row]:
+        """First row whose id (or row_id) equals row_id, compared as strings."""
+        return self._by_id.get(str(row_id))
+
+    def get(self, variable_name: str, field: str, default: Any = None) -> Any:
+        """field of the first row with this variable_name; default if missing or None."""
+        row = self.find(variable_name)
+        if row is None:
+            return default
+        value = row.get(field)
+        return value if value is not None else default
+
+    def names(self) -> List[str]:
+        """Variable names present, in first-occurrence order."""
+        return list(self._by_variable)
+
+
+class FinancialStatement:
+    """RR, BR and INK2 rows of one company/year with O(1) lookups per section."""
+
+    # Amount column per section and year
+    AMOUNT_FIELDS = {
+        'RR': ('current_amount', 'previous_amount'),
+        'BR': ('current_amount', 'previous_amount'),
+        'INK2': ('amount', 'amount'),
+    }
+
+    def __init__(self, rr_data: Optional[Sequence[Row]] = None, br_data: Optional[Sequence[Row]] = None,
+                 ink2_data: Optional[Sequence[Row]] = None):
+        self.rr = StatementRows.coerce(rr_data)
+        self.br = StatementRows.coerce(br_data)
+        self.ink2 = StatementRows.coerce(ink2_data)
+
+    @classmethod
+    def coerce(cls, statement: Union["FinancialStatement", Dict[str, Any], None]) -> "FinancialStatement":
+        """Accept a FinancialStatement or a dict with rr_data/br_data/ink2_data lists."""
+        if isinstance(statement, FinancialStatement):
+            return statement
+        statement = statement or {}
+        return cls(statement.get('rr_data'), statement.get('br_data'), statement.get('ink2_data'))
+
+    def section(self, section: str) -> StatementRows:
+        return {'RR': self.rr, 'BR': self.br, 'INK2': self.ink2}[section.upper()]
+
+    def row(self, section: str, variable_name: str) -> Optional[Row]:
+        return self.section(section).find(variable_name)
+
+    def value(self, section: str, variable_name: str, previous_year: bool = False, default: Any = None) -> Any:
+        """Amount of variable_name in section ('RR', 'BR' or 'INK2') for the current or previous year."""
+        field = self.AMOUNT_FIELDS[section.upper()][1 if previous_year else 0]
+        return self.section(section).get(variable_name, field, default)
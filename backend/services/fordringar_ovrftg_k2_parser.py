@@ -1,8 +1,10 @@
 import re
 import unicodedata
-from collections import defaultdict
+from typing import Union
 
-def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: str, debug: bool = False) -> dict:
+from .sie_document import SieDocument
+
+def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False) -> dict:
     """
     FORDRINGAR ÖVRIGA FÖRETAG-note (K2) parser — Långfristiga fordringar hos övriga företag som det finns ett ägarintresse i
     
@@ -34,83 +36,27 @@ def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: str, debug: bool = False)
         s = re.sub(r"\s+", " ", s).strip()
         return s
 
-    def _to_float(s: str) -> float:
-        """Convert string to float, handling spaces and commas"""
-        return float((s or "0").replace(" ", "").replace(",", "."))
-
-    def _parse_accounts_and_sru(sie_text: str):
-        """Parse account names and SRU codes from SIE text"""
-        names, sru = {}, {}
-        rx_konto = re.compile(r'^#KONTO\s+(\d{4})\s+"(.*)"\s*$')
-        rx_sru   = re.compile(r'^#SRU\s+(\d{4})\s+(\d+)\s*$')
-        
-        for raw in sie_text.splitlines():
-            t = raw.strip()
-            mk = rx_konto.match(t)
-            if mk:
-                names[int(mk.group(1))] = _normalize(mk.group(2))
-                continue
-            ms = rx_sru.match(t)
-            if ms:
-                sru[int(ms.group(1))] = int(ms.group(2))
+    def _parse_accounts_and_sru(doc: SieDocument):
+        """Account names (normalized) and SRU codes for 4-digit accounts"""
+        names = {a: _normalize(nm) for a, nm in doc.account_names.items() if 1000 <= a <= 9999}
+        sru = {a: code for a, code in doc.sru_codes.items() if 1000 <= a <= 9999}
         return names, sru
 
-    def _get_balance(lines, kind_flag: str, accounts: set) -> float:
+    def _get_balance(doc: SieDocument, kind_flag: str, accounts: set) -> float:
         """Get IB or UB balance for specified accounts"""
-        if not accounts: 
-            return 0.0
-        rx = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)')
-        acct_set = set(accounts)
-        tot = 0.0
-        for raw in lines:
-            m = rx.match(raw.strip())
-            if not m: 
-                continue
-            a = int(m.group(1))
-            if a in acct_set:
-                tot += _to_float(m.group(2))
-        return tot
-
-    def _parse_vouchers(lines):
-        """Parse vouchers from SIE lines"""
-        rx_ver = re.compile(r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"([^"]*)"|.+))?\s*$')
-        rx_tx  = re.compile(
-            r'^#(?:BTRANS|RTRANS|TRANS)\s+'
-            r'(\d{3,4})(?:\s+\{.*?\})?\s+'
-            r'(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'
-            r'(?:\s+\d{8})?(?:\s+".*?")?\s*$'
-        )
-        trans_by_ver = defaultdict(list)
-        text_by_ver = {}
-        cur = None
-        in_block = False
-        
-        for raw in lines:
-            t = raw.strip()
-            mh = rx_ver.match(t)
-            if mh:
-                cur = (mh.group(1), int(mh.group(2)))
-                text_by_ver[cur] = _normalize(mh.group(4) or "")
-                continue
-            if t == "{": 
-                in_block = True
-                continue
-            if t == "}": 
-                in_block = False
-                cur = None
-                continue
-            if in_block and cur:
-                mt = rx_tx.match(t)
-                if mt:
-                    trans_by_ver[cur].append((int(mt.group(1)), _to_float(mt.group(2))))
+        return doc.balance_sum(kind_flag, 0, set(accounts or ()))
+
+    def _parse_vouchers(doc: SieDocument):
+        """Vouchers incl. #BTRANS rows, plus normalized voucher titles"""
+        trans_by_ver = doc.trans_by_ver(include_btrans=True)
+        text_by_ver = {key: _normalize(text) for key, text in doc.voucher_texts().items()}
         return trans_by_ver, text_by_ver
 
     # ---------- Main parsing logic ----------
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
+    doc = SieDocument.coerce(sie_text)
 
     # Parse accounts and SRU codes
-    names, sru = _parse_accounts_and_sru(sie_text)
+    names, sru = _parse_accounts_and_sru(doc)
 
     # Name detectors (on normalized text)
     ACK_TOK = re.compile(r'\b(?:ack\w*|ackum\w*)\b')
@@ -140,10 +86,10 @@ def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: str, debug: bool = False)
         pass
 
     # Get IB/UB factual balances
-    fordr_ovrigaftg_ib = _get_balance(lines, "IB", ASSET_SET)
-    ack_nedskr_fordr_ovrigaftg_ib = _get_balance(lines, "IB", IMP_SET)
-    fordr_ovrigaftg_ub_actual = _get_balance(lines, "UB", ASSET_SET)
-    ack_nedskr_fordr_ovrigaftg_ub_act = _get_balance(lines, "UB", IMP_SET)
+    fordr_ovrigaftg_ib = _get_balance(doc, "IB", ASSET_SET)
+    ack_nedskr_fordr_ovrigaftg_ib = _get_balance(doc, "IB", IMP_SET)
+    fordr_ovrigaftg_ub_actual = _get_balance(doc, "UB", ASSET_SET)
+    ack_nedskr_fordr_ovrigaftg_ub_act = _get_balance(doc, "UB", IMP_SET)
 
     # Initialize flow accumulators
     nya_fordr_ovrigaftg = 0.0
@@ -170,7 +116,7 @@ def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: str, debug: bool = False)
         return 6000 <= a <= 8999 and not (8120 <= a <= 8139 or a in (8240,))
 
     # Parse vouchers
-    trans_by_ver, text_by_ver = _parse_vouchers(lines)
+    trans_by_ver, text_by_ver = _parse_vouchers(doc)
 
     # Classify each voucher
     for key, txs in trans_by_ver.items():
@@ -247,37 +193,25 @@ def parse_fordringar_ovrftg_k2_from_sie_text(sie_text: str, debug: bool = False)
     # PREVIOUS YEAR (FROM SAME SIE; NO VOUCHERS)
     # =========================
 
-    def _get_balance_prev(lines, kind_flag: str, accounts: set[int] | None) -> float:
-        if not accounts:
-            return 0.0
-        total = 0.0
-        rx = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-        for raw in lines:
-            s = raw.strip()
-            m = rx.match(s)
-            if not m:
-                continue
-            acct = int(m.group(1))
-            if acct in accounts:
-                total += _to_float(m.group(2))
-        return total
+    def _get_balance_prev(kind_flag: str, accounts: set[int] | None) -> float:
+        return doc.balance_sum(kind_flag, -1, accounts)
 
     ASSET_SET_SAFE     = ASSET_SET if 'ASSET_SET' in locals() else None
     ACC_IMP_SET_SAFE   = IMP_SET if 'IMP_SET' in locals() else None
     ACC_AVSKR_SET_SAFE = locals().get("ACC_AVSKR_SET")
     UPP_SET_SAFE       = locals().get("UPP_SET")
 
-    fordr_ovrftg_ib_prev  = _get_balance_prev(lines, 'IB', ASSET_SET_SAFE)
-    fordr_ovrftg_ub_prev  = _get_balance_prev(lines, 'UB', ASSET_SET_SAFE)
+    fordr_ovrftg_ib_prev  = _get_balance_prev('IB', ASSET_SET_SAFE)
+    fordr_ovrftg_ub_prev  = _get_balance_prev('UB', ASSET_SET_SAFE)
 
-    ack_nedskr_fordr_ovrftg_ib_prev = _get_balance_prev(lines, 'IB', ACC_IMP_SET_SAFE)
-    ack_nedskr_fordr_ovrftg_ub_prev = _get_balance_prev(lines, 'UB', ACC_IMP_SET_SAFE)
+    ack_nedskr_fordr_ovrftg_ib_prev = _get_balance_prev('IB', ACC_IMP_SET_SAFE)
+    ack_nedskr_fordr_ovrftg_ub_prev = _get_balance_prev('UB', ACC_IMP_SET_SAFE)
 
     # optional
-    ack_avskr_fordr_ovrftg_ib_prev = _get_balance_prev(lines, 'IB', ACC_AVSKR_SET_SAFE)
-    ack_avskr_fordr_ovrftg_ub_prev = _get_balance_prev(lines, 'UB', ACC_AVSKR_SET_SAFE)
-    uppskr_fordr_ovrftg_ib_prev    = _get_balance_prev(lines, 'IB', UPP_SET_SAFE)
-    uppskr_fordr_ovrftg_ub_prev    = _get_balance_prev(lines, 'UB', UPP_SET_SAFE)
+    ack_avskr_fordr_ovrftg_ib_prev = _get_balance_prev('IB', ACC_AVSKR_SET_SAFE)
+    ack_avskr_fordr_ovrftg_ub_prev = _get_balance_prev('UB', ACC_AVSKR_SET_SAFE)
+    uppskr_fordr_ovrftg_ib_prev    = _get_balance_prev('IB', UPP_SET_SAFE)
+    uppskr_fordr_ovrftg_ub_prev    = _get_balance_prev('UB', UPP_SET_SAFE)
 
     red_varde_fordr_ovrftg_prev = (
         (fordr_ovrftg_ub_prev or 0.0)
@@ -0,0 +1,185 @@
+"""
+Formula Engine
+Safe, compiled evaluation of the calculation_formula column of the RR/BR mappings.
+
+Formulas like "SumRorelseintakter - SumRorelsekostnader" are parsed once with
+ast into a small closure tree (no eval). Variable references are resolved
+through a lookup function over StatementRows, so callers index their rows once
+instead of scanning them per token.
+
+A FormulaPlan orders the calculated rows of a mapping table topologically
+over their formula references (ties keep row_id order). Cycles are reported
+once when the plan is built; rows in a cycle are evaluated last, in row_id order.
+"""
+
+import ast
+import heapq
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .financial_statement import StatementRows
+
+# Same rule as the old regex substitution: identifiers starting with A-Z are variables
+_VARIABLE_RE = re.compile(r'^[A-Z][a-zA-Z0-9_]*$')
+
+_BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPS = {
+    ast.USub: operator.neg,
+    ast.UAdd: operator.pos,
+}
+_FUNCTIONS = {
+    'abs': abs,
+    'round': round,
+    'min': min,
+    'max': max,
+}
+
+Lookup = Callable[[str], Any]
+
+
+class FormulaError(ValueError):
+    """Raised for formulas that can't be compiled or evaluated."""
+
+
+def _to_number(value: Any) -> float:
+    if isinstance(value, str):
+        return float(value)
+    return value
+
+
+def _compile_node(node: ast.AST, variables: List[str]) -> Callable[[Lookup], Any]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        value = node.value
+        return lambda lookup: value
+    if isinstance(node, ast.Name):
+        name = node.id
+        if not _VARIABLE_RE.match(name):
+            raise FormulaError(f"name '{name}' is not defined")
+        if name not in variables:
+            variables.append(name)
+        return lambda lookup: _to_number(lookup(name))
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+        op = _BINARY_OPS[type(node.op)]
+        left = _compile_node(node.left, variables)
+        right = _compile_node(node.right, variables)
+        return lambda lookup: op(left(lookup), right(lookup))
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPS:
+        op = _UNARY_OPS[type(node.op)]
+        operand = _compile_node(node.operand, variables)
+        return lambda lookup: op(operand(lookup))
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id in _FUNCTIONS and not node.keywords):
+        func = _FUNCTIONS[node.func.id]
+        args = [_compile_node(arg, variables) for arg in node.args]
+        return lambda lookup: func(*(arg(lookup) for arg in args))
+    raise FormulaError(f"Unsupported operation: {type(node).__name__}")
+
+
+class CompiledFormula:
+    """A parsed formula with its variable references resolved to names."""
+
+    __slots__ = ('formula', 'variables', 'error', '_fn')
+
+    def __init__(self, formula: str):
+        self.formula = formula
+        self.error: Optional[str] = None
+        variables: List[str] = []
+        try:
+            self._fn = _compile_node(ast.parse(formula.strip(), mode='eval').body, variables)
+        except (SyntaxError, FormulaError) as e:
+            self._fn = None
+            self.error = str(e)
+        self.variables: Tuple[str, ...] = tuple(variables)
+
+    def evaluate(self, lookup: Lookup) -> float:
+        """Evaluate with lookup(variable_name) -> value; raises on invalid formulas or math errors."""
+        if self._fn is None:
+            raise FormulaError(self.error)
+        return float(self._fn(lookup))
+
+
+@lru_cache(maxsize=4096)
+def compile_formula(formula: str) -> CompiledFormula:
+    return CompiledFormula(formula)
+
+
+def row_value_lookup(primary: StatementRows, fallback: Optional[StatementRows] = None,
+                     use_previous_year: bool = False) -> Lookup:
+    """Lookup reading current/previous amounts from indexed rows; unknown names and None read as 0."""
+    key = 'previous_amount' if use_previous_year else 'current_amount'
+
+    def lookup(name: str) -> Any:
+        row = primary.find(name)
+        if row is None and fallback:
+            row = fallback.find(name)
+        if row is None:
+            return 0
+        value = row.get(key, 0)
+        return value if value is not None else 0
+
+    return lookup
+
+
+class FormulaPlan:
+    """Calculated rows of one mapping table in dependency order."""
+
+    def __init__(self, mappings: Iterable[Dict[str, Any]], section: str = ''):
+        self.source = mappings
+        mappings = list(mappings or ())
+        calculated = [(i, m) for i, m in enumerate(mappings) if m.get('is_calculated')]
+
+        # Results are built in mapping order, so the first row with a variable name wins
+        first_row_by_variable: Dict[str, int] = {}
+        for i, m in enumerate(mappings):
+            name = m.get('variable_name')
+            if name and name not in first_row_by_variable:
+                first_row_by_variable[name] = i
+
+        calculated_ids = {i for i, _ in calculated}
+        dependents: Dict[int, List[int]] = {i: [] for i in calculated_ids}
+        indegree: Dict[int, int] = {i: 0 for i in calculated_ids}
+        for i, m in calculated:
+            formula = m.get('calculation_formula') or ''
+            if not formula:
+                continue
+            for name in set(compile_formula(formula).variables):
+                dep = first_row_by_variable.get(name)
+                if dep is not None and dep in calculated_ids:
+                    dependents[dep].append(i)
+                    indegree[i] += 1
+
+        def sort_key(i: int) -> Tuple[int, int]:
+            return (int(mappings[i]['row_id']), i)
+
+        heap = [sort_key(i) for i in calculated_ids if indegree[i] == 0]
+        heapq.heapify(heap)
+        order: List[int] = []
+        while heap:
+            _, i = heapq.heappop(heap)
+            order.append(i)
+            for j in dependents[i]:
+                indegree[j] -= 1
+                if indegree[j] == 0:
+                    heapq.heappush(heap, sort_key(j))
+
+        cyclic = sorted((i for i in calculated_ids if indegree[i] > 0), key=sort_key)
+        self.cycles: List[str] = [str(mappings[i].get('variable_name') or mappings[i]['row_id']) for i in cyclic]
+        if self.cycles:
+            print(f"Formula cycle in {section or 'mapping'} rows: {', '.join(self.cycles)}")
+
+        self.order: Tuple[Dict[str, Any], ...] = tuple(mappings[i] for i in order + cyclic)
+
+
+def build_formula_plans(**sections: Iterable[Dict[str, Any]]) -> Dict[str, FormulaPlan]:
+    """FormulaPlan per section name, e.g. build_formula_plans(RR=rr_mappings, BR=br_mappings)."""
+    return {name: FormulaPlan(mappings, name) for name, mappings in sections.items()}
@@ -0,0 +1,173 @@
+"""
+INK2 Batch Export
+SRU files and filled INK2 PDFs for many stored reports in one ZIP.
+
+Accounting firms close many companies at once; instead of one
+/api/sru/generate/{report_id} call per report (each with its own
+annual_report_data fetch), the reports are fetched one window at a time, a
+single query per window, and generated in parallel on a bounded thread pool. The INK2 form plan and the
+PDF template are cached process-wide, so the workers only do the per-company
+evaluation and filling, and filled INK2 PDFs come from the artifact cache
+when the report is unchanged.
+
+The ZIP is streamed: entries are written in request order as soon as each
+report is done, with at most INK2_EXPORT_WORKERS * 2 reports in flight.
+company_data is fetched in windows of that size just before the reports are
+submitted and dropped once their entries are written, so at most two windows
+of reports are held however many reports are requested. Each report gets a
+folder with INFO.SRU + BLANKETTER.SRU and the INK2 PDF; reports that are
+missing or fail are listed in ERRORS.txt instead of failing the whole job.
+
+Usage:
+    for chunk in stream_ink2_export(supabase, report_ids): ...
+"""
+
+import io
+import os
+import re
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+INK2_EXPORT_WORKERS = max(1, int(os.getenv("INK2_EXPORT_WORKERS", str(min(4, os.cpu_count() or 1)))))
+INK2_EXPORT_MAX_REPORTS = max(1, int(os.getenv("INK2_EXPORT_MAX_REPORTS", "200")))
+
+REPORT_COLUMNS = 'id, company_data, company_name, organization_number, fiscal_year_end'
+
+_executor = ThreadPoolExecutor(max_workers=INK2_EXPORT_WORKERS, thread_name_prefix="ink2-export")
+
+
+def unique_report_ids(report_ids: List[Any]) -> List[str]:
+    """Report ids as strings, duplicates and blanks dropped, request order kept"""
+    return list(dict.fromkeys(str(r).strip() for r in report_ids or () if str(r or '').strip()))
+
+
+def fetch_reports(supabase, report_ids: List[str], columns: str = REPORT_COLUMNS) -> Dict[str, Dict[str, Any]]:
+    """annual_report_data rows by id, one query for all ids"""
+    if not report_ids:
+        return {}
+    result = supabase.table('annual_report_data')\
+        .select(columns)\
+        .in_('id', report_ids)\
+        .execute()
+    return {str(row.get('id')): row for row in result.data or []}
+
+
+def iter_reports_in_windows(supabase, report_ids: List[str], window: int,
+                            columns: str = REPORT_COLUMNS) -> Iterator[Tuple[str, Optional[Dict[str, Any]]]]:
+    """(report_id, row or None if missing) in request order; rows are fetched window ids per query, when first needed"""
+    for start in range(0, len(report_ids), window):
+        window_ids = report_ids[start:start + window]
+        reports = fetch_reports(supabase, window_ids, columns)
+        for report_id in window_ids:
+            yield report_id, reports.pop(report_id, None)
+
+
+def _clean_name(name: str) -> str:
+    return re.sub(r'[^\w\s-]', '', name or '').strip().replace(' ', '_') or 'bolag'
+
+
+def report_folder(report: Dict[str, Any]) -> str:
+    """Folder name in the ZIP: company, fiscal year and id prefix (company names need not be unique)"""
+    fiscal_year_end = report.get('fiscal_year_end') or ''
+    parts = [_clean_name(report.get('company_name')), fiscal_year_end[:4], str(report.get('id'))[:8]]
+    return '_'.join(p for p in parts if p)
+
+
+def export_report_files(report: Dict[str, Any], include_sru: bool = True,
+                        include_pdf: bool = True) -> List[Tuple[str, bytes]]:
+    """(ZIP path, content) for one stored report; raises ValueError when it can't be exported"""
+    from .artifact_cache import artifact_key, get_or_create_artifact
+    from .ink2_pdf_filler import generate_filled_ink2_pdf
+    from .sru_generator import build_sru_files
+
+    company_data = report.get('company_data') or {}
+    if not company_data:
+        raise ValueError("No company data stored for this report")
+
+    folder = report_folder(report)
+    files: List[Tuple[str, bytes]] = []
+    if include_sru:
+        files.extend((f'{folder}/{filename}', data) for filename, data in build_sru_files(company_data).items())
+    if include_pdf:
+        organization_number = report.get('organization_number')
+        if not organization_number:
+            raise ValueError("No organization number for this report")
+        fiscal_year_end = report.get('fiscal_year_end') or ''
+        fiscal_year = fiscal_year_end[:4]
+        # Shared with /api/pdf/ink2-form/{report_id}
+        key = artifact_key('ink2-form', company_data, organization_number=organization_number, fiscal_year=fiscal_year)
+        pdf_bytes = get_or_create_artifact('ink2-form', key, lambda: generate_filled_ink2_pdf(
+            organization_number, fiscal_year, company_data))
+        company_name = report.get('company_name') or 'bolag'
+        files.append((f'{folder}/INK2_inkomstdeklaration_{_clean_name(company_name)}_{fiscal_year}.pdf', pdf_bytes))
+    return files
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target for ZipFile; written bytes are collected until drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_ink2_export(supabase, report_ids: List[str], include_sru: bool = True,
+                       include_pdf: bool = True) -> Iterator[bytes]:
+    """
+    ZIP bytes in chunks (one per report). Blocking: iterate it on a worker thread,
+    e.g. via StreamingResponse with a sync iterator.
+    """
+    sink = _ChunkSink()
+    errors: List[str] = []
+    pending: deque = deque()
+    window = INK2_EXPORT_WORKERS * 2
+    reports = iter_reports_in_windows(supabase, report_ids, window)
+
+    def submit_next() -> None:
+        for report_id, report in reports:
+            if report is None:
+                pending.append((report_id, None))
+            else:
+                pending.append((report_id, _executor.submit(export_report_files, report, include_sru, include_pdf)))
+            return
+
+    try:
+        with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for _ in range(window):
+                submit_next()
+            while pending:
+                report_id, future = pending.popleft()
+                submit_next()
+                if future is None:
+                    errors.append(f"{report_id}: Report not found")
+                    continue
+                try:
+                    files = future.result()
+                except Exception as e:
+                    print(f"Error exporting INK2 for report {report_id}: {str(e)}")
+                    errors.append(f"{report_id}: {str(e)}")
+                    continue
+                for path, data in files:
+                    zf.writestr(path, data)
+                yield sink.drain()
+            if errors:
+                zf.writestr('ERRORS.txt', '\n'.join(errors) + '\n')
+        yield sink.drain()
+    finally:
+        # Client went away (or an error): don't generate reports nobody will read
+        for _, future in pending:
+            if future is not None:
+                future.cancel()
@@ -0,0 +1,195 @@
+"""
+INK2 Recalculation Engine
+Incremental re-evaluation of the INK2 rows for /api/recalculate-ink2.
+
+Chat interactions post the same accounts/RR/BR data again and again with one
+manual amount changed. A session (keyed by a hash of the mapping version and
+every input except manual_amounts) keeps the last evaluated state of each
+INK2 row: its amount, result row and which ink_values it read while it was
+computed. Given new manual_amounts, only rows whose override changed or that
+read a changed value are evaluated again; the rest are replayed from the
+session.
+
+Rows are still evaluated by DatabaseParser.evaluate_ink2_override_row, so an
+incremental pass gives exactly what parse_ink2_data_with_overrides would.
+When the set of injected manual keys changes, or a row starts/stops storing
+its value, the session falls back to a full evaluation.
+
+Usage:
+    rows = recalculate_ink2_rows(parser, current_accounts, fiscal_year, rr_data, br_data, manual_amounts)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+INK2_SESSION_CACHE_ENTRIES = max(0, int(os.getenv("INK2_SESSION_CACHE_ENTRIES", "64")))
+
+_sessions: "OrderedDict[str, Ink2Session]" = OrderedDict()
+_sessions_lock = threading.Lock()
+
+
+class _TrackedValues(dict):
+    """ink_values that records the keys read and written by the row being evaluated."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.reads: Optional[Set[str]] = None
+        self.writes: Optional[Set[str]] = None
+
+    def _read(self, key) -> None:
+        if self.reads is not None:
+            self.reads.add(key)
+
+    def __getitem__(self, key):
+        self._read(key)
+        return super().__getitem__(key)
+
+    def __contains__(self, key) -> bool:
+        self._read(key)
+        return super().__contains__(key)
+
+    def get(self, key, default=None):
+        self._read(key)
+        return super().get(key, default)
+
+    def items(self):
+        if self.reads is not None:
+            self.reads.update(super().keys())
+        return super().items()
+
+    def values(self):
+        if self.reads is not None:
+            self.reads.update(super().keys())
+        return super().values()
+
+    def __setitem__(self, key, value) -> None:
+        if self.writes is not None:
+            self.writes.add(key)
+        super().__setitem__(key, value)
+
+
+def _same(a: Any, b: Any) -> bool:
+    # 5 and 5.0 render differently in the response, so the type counts as well
+    return type(a) is type(b) and a == b
+
+
+class _RowState:
+    __slots__ = ('mapping', 'variable_name', 'reads', 'wrote', 'value', 'result')
+
+    def __init__(self, mapping: Dict[str, Any]):
+        self.mapping = mapping
+        self.variable_name = mapping.get('variable_name', '')
+        self.reads: Set[str] = set()
+        self.wrote = False
+        self.value: Any = None
+        self.result: Optional[Dict[str, Any]] = None
+
+
+class Ink2Session:
+    """Last evaluated INK2 state for one set of accounts/RR/BR inputs."""
+
+    def __init__(self, parser, current_accounts: Dict[str, float], fiscal_year: int, rr_data, br_data,
+                 previous_accounts: Optional[Dict[str, float]] = None):
+        from .account_index import AccountIndex
+        from .financial_statement import StatementRows
+
+        self.parser = parser
+        self.current_index = AccountIndex(current_accounts)
+        self.fiscal_year = fiscal_year
+        self.rr_data = StatementRows.coerce(rr_data)
+        self.br_data = StatementRows.coerce(br_data)
+        self.previous_accounts = previous_accounts
+        self.lock = threading.Lock()
+        self.rows: Optional[List[_RowState]] = None
+        self.seed: Dict[str, Any] = {}
+        self.manual_amounts: Dict[str, Any] = {}
+        self.last_evaluated = 0  # rows evaluated by the last call (for diagnostics)
+
+    def _evaluate_row(self, state: _RowState, manual_amounts: Dict[str, Any], ink_values: _TrackedValues) -> None:
+        state.reads = set()
+        writes: Set[str] = set()
+        ink_values.reads, ink_values.writes = state.reads, writes
+        try:
+            state.result = self.parser.evaluate_ink2_override_row(
+                state.mapping, self.current_index, self.fiscal_year, self.rr_data, self.br_data,
+                self.previous_accounts, manual_amounts, ink_values)
+        except Exception as e:
+            print(f"Error processing INK2 mapping {state.mapping.get('variable_name', 'unknown')}: {e}")
+            state.result = None
+        finally:
+            ink_values.reads = ink_values.writes = None
+        state.wrote = state.variable_name in writes
+        state.value = dict.get(ink_values, state.variable_name) if state.wrote else None
+
+    def _full(self, manual_amounts: Dict[str, Any], seed: Dict[str, Any]) -> None:
+        ink_values = _TrackedValues(seed)
+        rows = [_RowState(mapping) for mapping in self.parser.ink2_sorted_mappings()]
+        for state in rows:
+            self._evaluate_row(state, manual_amounts, ink_values)
+        self.rows = rows
+        self.last_evaluated = len(rows)
+
+    def _incremental(self, manual_amounts: Dict[str, Any], seed: Dict[str, Any]) -> bool:
+        """Re-evaluate rows downstream of the changed manual amounts; False if a full pass is needed."""
+        changed_manual = {name for name in set(manual_amounts) | set(self.manual_amounts)
+                          if name not in manual_amounts or name not in self.manual_amounts
+                          or not _same(manual_amounts[name], self.manual_amounts[name])}
+        changed = {name for name in seed if not _same(seed[name], self.seed[name])}
+        ink_values = _TrackedValues(seed)
+        evaluated = 0
+        for state in self.rows:
+            if state.variable_name in changed_manual or not state.reads.isdisjoint(changed):
+                wrote, value = state.wrote, state.value
+                self._evaluate_row(state, manual_amounts, ink_values)
+                evaluated += 1
+                if state.wrote != wrote:
+                    return False
+                if state.wrote and not _same(state.value, value):
+                    changed.add(state.variable_name)
+            elif state.wrote:
+                dict.__setitem__(ink_values, state.variable_name, state.value)
+        self.last_evaluated = evaluated
+        return True
+
+    def evaluate(self, manual_amounts: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """INK2 result rows for manual_amounts (fresh row dicts, safe to mutate)."""
+        manual_amounts = dict(manual_amounts or {})
+        with self.lock:
+            if not self.parser.ink2_mappings:
+                return []
+            seed = self.parser.ink2_override_seed_values(manual_amounts)
+            if self.rows is None or set(seed) != set(self.seed) or not self._incremental(manual_amounts, seed):
+                self._full(manual_amounts, seed)
+            self.seed = seed
+            self.manual_amounts = manual_amounts
+            return [dict(state.result) for state in self.rows if state.result is not None]
+
+
+def ink2_session_key(mapping_version: Optional[str], current_accounts: Dict[str, float], fiscal_year: int,
+                     rr_data, br_data, previous_accounts: Optional[Dict[str, float]] = None) -> str:
+    payload = json.dumps([mapping_version, fiscal_year, current_accounts, previous_accounts,
+                          list(rr_data or []), list(br_data or [])], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def recalculate_ink2_rows(parser, current_accounts: Dict[str, float], fiscal_year: int, rr_data, br_data,
+                          manual_amounts: Dict[str, Any], previous_accounts: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Same rows as parser.parse_ink2_data_with_overrides(...), evaluated incrementally per session."""
+    if not INK2_SESSION_CACHE_ENTRIES or not parser.mapping_version:
+        return parser.parse_ink2_data_with_overrides(current_accounts=current_accounts, fiscal_year=fiscal_year,
+                                                     rr_data=rr_data, br_data=br_data, manual_amounts=manual_amounts,
+                                                     previous_accounts=previous_accounts)
+    key = ink2_session_key(parser.mapping_version, current_accounts, fiscal_year, rr_data, br_data, previous_accounts)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = Ink2Session(parser, current_accounts, fiscal_year, rr_data, br_data, previous_accounts)
+            _sessions[key] = session
+        _sessions.move_to_end(key)
+        while len(_sessions) > INK2_SESSION_CACHE_ENTRIES:
+            _sessions.popitem(last=False)
+    return session.evaluate(manual_amounts)
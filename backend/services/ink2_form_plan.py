@@ -0,0 +1,192 @@
+"""
+INK2 Form Plan
+The ink2_form table (form field, SRU code, type and variable_map per row of the
+INK2 declaration) compiled once per mapping version.
+
+INK2PdfFiller and the SRU generator used to query ink2_form on every request
+and re-parse each variable_map while evaluating it. The plan holds the rows in
+form order (Id) with both expression forms pre-parsed:
+
+- pdf_terms: top-level '+' pieces with their own (IF>0)/(IF<0) condition, as
+  evaluated by ink2_pdf_filler.eval_terms (override-first resolver)
+- sru_terms/sru_cond: '+' tokens (condition stripped, normalized key) and the
+  trailing condition on the total, as evaluated by sru_generator.VarResolver
+
+The two generators keep their own resolution rules; only the parsing and the
+table fetch are shared. Plans are shared between requests: treat them as
+read-only.
+
+Usage:
+    plan = get_ink2_form_plan()
+    for field in plan.pdf_fields: ...
+    for field in plan.sru_fields: ...
+"""
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Regex for conditional expressions (space before parenthesis required)
+COND_RE = re.compile(r"^\s*(?P<name>.+?)\s+\((?P<cond>IF[<>]=?0|IF[<>]0)\)\s*$", re.I)
+
+# SRU: trailing guard on the whole expression, and per-token guards
+SRU_COND_RE = re.compile(r"\(IF([<>]=?0|[<>]0)\)$", re.I)
+SRU_COND_STRIP_RE = re.compile(r"\s*\(IF[<>]=?0\)$|\s*\(IF[<>]0\)$")
+SRU_TOKEN_COND_RE = re.compile(r"\s*\(IF[<>]=?0\)$", re.I)
+
+# Start/end dates, written explicitly on both SRU forms
+SRU_PERIOD_CODES = (7011, 7012)
+
+PdfTerm = Tuple[str, Optional[str]]
+SruTerm = Tuple[str, str]
+
+
+def split_top_level_plus(expr: str) -> List[str]:
+    """
+    Split expression on '+' but only at top level (not inside parentheses).
+    This keeps variable names like INK4.9(+) intact.
+
+    Args:
+        expr: Expression to split (e.g., "A+B", "INK4.9(+)+INK4.10(-)")
+
+    Returns:
+        List of parts
+    """
+    parts, buf, depth = [], [], 0
+    for ch in expr or "":
+        if ch == "(":
+            depth += 1
+            buf.append(ch)
+        elif ch == ")":
+            depth = max(0, depth - 1)
+            buf.append(ch)
+        elif ch == "+" and depth == 0:
+            # Top-level plus - split here
+            parts.append("".join(buf).strip())
+            buf = []
+        else:
+            buf.append(ch)
+
+    if buf:
+        parts.append("".join(buf).strip())
+
+    return [p for p in parts if p]
+
+
+def compile_pdf_terms(expr: Optional[str]) -> Tuple[PdfTerm, ...]:
+    """(name, condition) per top-level piece; condition is 'IF>0', 'IF<0', ... or None"""
+    if not expr or not expr.strip():
+        return ()
+    terms = []
+    for piece in split_top_level_plus(expr.strip()):
+        m = COND_RE.match(piece)
+        if m:
+            terms.append((m.group("name").strip(), m.group("cond").upper()))
+        else:
+            terms.append((piece.strip(), None))  # keeps INK4.9(+) intact
+    return tuple(terms)
+
+
+def normalize_key(x: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "", (x or "").lower())
+
+
+def compile_sru_terms(expr: Any) -> Tuple[Optional[Tuple[SruTerm, ...]], Optional[str]]:
+    """
+    ((token, normalized key) per '+' part, trailing condition '>0'/'<0'/None).
+    Terms are None when the expression resolves to nothing (missing or 'nan').
+    """
+    if expr is None:
+        return None, None
+    s = str(expr)
+    if not s or s.lower() == "nan":
+        return None, None
+
+    s = s.strip()
+    cond: Optional[str] = None
+    m = SRU_COND_RE.search(s)
+    if m:
+        cond = m.group(1).replace("=", "")
+        s = SRU_COND_STRIP_RE.sub("", s).strip()
+
+    terms = []
+    for part in s.split("+"):
+        token = SRU_TOKEN_COND_RE.sub("", part.strip())
+        terms.append((token, normalize_key(token)))
+    return tuple(terms), cond
+
+
+def _sru_code(x: Any) -> Optional[int]:
+    try:
+        return int(x)
+    except Exception:
+        return None
+
+
+class Ink2FormField(NamedTuple):
+    id: int
+    form_field: str
+    field_type: Optional[str]
+    variable_map: Optional[str]
+    variable_map_lower: str
+    sru: Optional[int]
+    sru_form: str  # 'R' (INK2R) or 'S' (INK2S, everything under section 4.)
+    pdf_terms: Tuple[PdfTerm, ...]
+    sru_terms: Optional[Tuple[SruTerm, ...]]
+    sru_cond: Optional[str]
+
+
+def compile_form_field(row: Dict[str, Any]) -> Ink2FormField:
+    variable_map = row.get('variable_map')
+    form_field = str(row.get('form_field') or '')
+    sru_terms, sru_cond = compile_sru_terms(variable_map)
+    return Ink2FormField(
+        id=int(row.get('Id') or row.get('id') or 0),
+        form_field=form_field,
+        field_type=row.get('type'),
+        variable_map=variable_map,
+        variable_map_lower=variable_map.lower() if isinstance(variable_map, str) else '',
+        sru=_sru_code(row.get('sru')),
+        sru_form='S' if form_field.strip().startswith('4.') else 'R',
+        pdf_terms=compile_pdf_terms(variable_map) if isinstance(variable_map, str) else (),
+        sru_terms=sru_terms,
+        sru_cond=sru_cond,
+    )
+
+
+class Ink2FormPlan:
+    """Compiled ink2_form rows of one mapping version, in form order (Id)"""
+
+    def __init__(self, rows: Iterable[Dict[str, Any]], version: Optional[str] = None):
+        self.version = version
+        self.rows: Tuple[Dict[str, Any], ...] = tuple(sorted(rows or (), key=lambda r: int(r.get('Id') or r.get('id') or 0)))
+        self.fields: Tuple[Ink2FormField, ...] = tuple(compile_form_field(row) for row in self.rows)
+        # PDF: rows with both a form field and a variable_map
+        self.pdf_fields = tuple(f for f in self.fields if f.form_field and f.variable_map)
+        # SRU: numeric codes with a resolvable variable_map; 7011/7012 are written separately
+        self.sru_fields = tuple(f for f in self.fields
+                                if f.sru is not None and f.sru not in SRU_PERIOD_CODES and f.sru_terms is not None)
+
+
+_registry: Dict[str, Any] = {"plan": None}
+_registry_lock = threading.Lock()
+
+
+def get_ink2_form_plan() -> Ink2FormPlan:
+    """Plan for the current mapping version; raises if the mapping snapshot or ink2_form can't be loaded"""
+    from .database_parser import get_mapping_snapshot
+
+    snapshot = get_mapping_snapshot()
+    plan = _registry["plan"]
+    if plan is not None and plan.version == snapshot['version']:
+        return plan
+    with _registry_lock:
+        plan = _registry["plan"]
+        if plan is None or plan.version != snapshot['version']:
+            if snapshot.get('ink2_form') is None:
+                raise RuntimeError("ink2_form table could not be loaded")
+            plan = Ink2FormPlan(snapshot.get('ink2_form', ()), snapshot['version'])
+            _registry["plan"] = plan
+            print(f"✓ Built INK2 form plan for mapping version {plan.version}: "
+                  f"{len(plan.pdf_fields)} PDF fields, {len(plan.sru_fields)} SRU codes")
+        return plan
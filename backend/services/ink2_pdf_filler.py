@@ -5,13 +5,15 @@ Populates the INK2_form.pdf with data from the database based on ink2_form table
 
 import os
 import re
-from typing import Dict, Any, Optional, List, Tuple
+import threading
+from typing import Dict, Any, Optional, List, NamedTuple, Tuple
 from io import BytesIO
 from PyPDF2 import PdfReader, PdfWriter
 from PyPDF2.generic import TextStringObject, NameObject, BooleanObject
-from supabase import create_client, Client
 from dotenv import load_dotenv
 from datetime import datetime
+from .financial_statement import FinancialStatement
+from .ink2_form_plan import Ink2FormPlan, compile_pdf_terms, get_ink2_form_plan
 
 # --- Normalization helpers ---
 def _norm(s: str) -> str:
@@ -145,17 +147,9 @@ except ImportError:
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase client
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_ANON_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
-
 # Regex to strip Acrobat suffixes like #0, #1, [0], [1]
 SUFFIX_RE = re.compile(r"(#\d+|\[\d+\])$")
 
-# Regex for conditional expressions (space before parenthesis required)
-COND_RE = re.compile(r"^\s*(?P<name>.+?)\s+\((?P<cond>IF[<>]=?0|IF[<>]0)\)\s*$", re.I)
-
 # Variable name aliases for DB lookup
 ALIASES = {
     # Meta fields
@@ -206,38 +200,6 @@ def get_meta_value(company_data: Dict[str, Any], key: str) -> str:
     return ""
 
 
-def split_top_level_plus(expr: str) -> List[str]:
-    """
-    Split expression on '+' but only at top level (not inside parentheses).
-    This keeps variable names like INK4.9(+) intact.
-    
-    Args:
-        expr: Expression to split (e.g., "A+B", "INK4.9(+)+INK4.10(-)")
-        
-    Returns:
-        List of parts
-    """
-    parts, buf, depth = [], [], 0
-    for ch in expr or "":
-        if ch == "(":
-            depth += 1
-            buf.append(ch)
-        elif ch == ")":
-            depth = max(0, depth - 1)
-            buf.append(ch)
-        elif ch == "+" and depth == 0:
-            # Top-level plus - split here
-            parts.append("".join(buf).strip())
-            buf = []
-        else:
-            buf.append(ch)
-    
-    if buf:
-        parts.append("".join(buf).strip())
-    
-    return [p for p in parts if p]
-
-
 class VarResolver:
     """Universal variable resolver that prefers client overrides, then DB values."""
     
@@ -252,6 +214,7 @@ class VarResolver:
         self.rr_data = rr_data
         self.br_data = br_data
         self.ink2_data = ink2_data
+        self.statement = FinancialStatement(rr_data, br_data, ink2_data)
         self.ov = build_override_map(company_data)  # freshest stuff from UI
         self.cache = {}
         
@@ -287,34 +250,12 @@ class VarResolver:
         names_to_try = [name] + ALIASES.get(name, [])
         
         for n in names_to_try:
-            # Search in RR data
-            for item in self.rr_data:
-                if item.get('variable_name') == n:
-                    value = item.get('current_amount')
-                    if value is not None:
-                        try:
-                            float_value = float(value)
-                            self.cache[name] = float_value
-                            return float_value
-                        except (ValueError, TypeError):
-                            pass
-            
-            # Search in BR data
-            for item in self.br_data:
-                if item.get('variable_name') == n:
-                    value = item.get('current_amount')
-                    if value is not None:
-                        try:
-                            float_value = float(value)
-                            self.cache[name] = float_value
-                            return float_value
-                        except (ValueError, TypeError):
-                            pass
-            
-            # Search in INK2 data
-            for item in self.ink2_data:
-                if item.get('variable_name') == n:
-                    value = item.get('amount')
+            # Search in RR, then BR, then INK2 data
+            for rows, field in ((self.statement.rr, 'current_amount'),
+                                (self.statement.br, 'current_amount'),
+                                (self.statement.ink2, 'amount')):
+                for item in rows.find_all(n):
+                    value = item.get(field)
                     if value is not None:
                         try:
                             float_value = float(value)
@@ -326,47 +267,53 @@ class VarResolver:
         return None
 
 
-def eval_mapping(expr: str, R: VarResolver) -> Optional[float]:
+def eval_terms(terms, R: VarResolver) -> Optional[float]:
     """
-    Evaluate a variable mapping expression with conditional support.
-    Supports: A + B + INK4.9(+)
-              X (IF>0)   Y (IF<0)   (conditions only when there's a space before '(')
+    Evaluate pre-parsed mapping terms (see ink2_form_plan.compile_pdf_terms).
+    Conditional terms add the value only when it has the right sign
+    (IF<0 adds its absolute value).
     
     Args:
-        expr: Expression to evaluate
+        terms: (name, condition) pairs
         R: VarResolver instance
         
     Returns:
         Computed value or None
     """
-    parts = split_top_level_plus(expr)
-    if not parts:
-        return None
-    
     total, seen = 0.0, False
-    for piece in parts:
-        m = COND_RE.match(piece)
-        if m:
-            name, cond = m.group("name").strip(), m.group("cond").upper()
-            v = R.get(name)
-            if v is None:
-                continue
-            if cond in ("IF>0", "IF>=0") and v > 0:
-                total += v
-                seen = True
-            elif cond in ("IF<0", "IF<=0") and v < 0:
-                total += abs(v)
-                seen = True
-        else:
-            v = R.get(piece.strip())  # keeps INK4.9(+) intact
-            if v is None:
-                continue
+    for name, cond in terms:
+        v = R.get(name)
+        if v is None:
+            continue
+        if cond is None:
+            total += v
+            seen = True
+        elif cond in ("IF>0", "IF>=0") and v > 0:
             total += v
             seen = True
+        elif cond in ("IF<0", "IF<=0") and v < 0:
+            total += abs(v)
+            seen = True
     
     return total if seen else None
 
 
+def eval_mapping(expr: str, R: VarResolver) -> Optional[float]:
+    """
+    Evaluate a variable mapping expression with conditional support.
+    Supports: A + B + INK4.9(+)
+              X (IF>0)   Y (IF<0)   (conditions only when there's a space before '(')
+    
+    Args:
+        expr: Expression to evaluate
+        R: VarResolver instance
+        
+    Returns:
+        Computed value or None
+    """
+    return eval_terms(compile_pdf_terms(expr), R)
+
+
 def detect_name_style(widget_names: set) -> str:
     """
     Detect the naming style used by the PDF form.
@@ -439,7 +386,83 @@ def normalize_field_name(name: str) -> str:
     return s.lower()
 
 
-def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], company_data: Dict[str, Any] = None) -> bytes:
+class WidgetRef(NamedTuple):
+    """Location of one form widget in the template"""
+    page: int
+    xref: int
+    field_name: str
+    rect: Tuple[float, float, float, float]
+    field_type: int
+
+
+class INK2TemplateIndex:
+    """
+    Template PDF bytes with its widgets indexed by normalized field name.
+    Built once per template file; filling opens the bytes and loads only the
+    widgets that get a value (by xref), instead of walking every page.
+    """
+    
+    def __init__(self, pdf_bytes: bytes):
+        self.pdf_bytes = pdf_bytes
+        
+        # Build set of raw field names to detect the naming style
+        raw_names = set()
+        widgets_by_name: Dict[str, List[WidgetRef]] = {}
+        
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            for page in doc:
+                for widget in page.widgets():
+                    # PyMuPDF exposes widget.field_name (widget /T) and widget.field_label (parent /T)
+                    raw = widget.field_name or widget.field_label or ""
+                    if not raw:
+                        continue
+                    
+                    raw_names.add(raw.strip())
+                    ref = WidgetRef(page.number, widget.xref, raw, tuple(widget.rect), widget.field_type)
+                    
+                    # Create key variants (with/without trailing colon, #0 suffix)
+                    # Normalize handles #0 and : removal
+                    base = normalize_field_name(raw)
+                    key_variants = {
+                        base,
+                        normalize_field_name(raw + ":"),
+                        normalize_field_name(raw[:-1] if raw.endswith(":") else raw),
+                    }
+                    
+                    for key in key_variants:
+                        widgets_by_name.setdefault(key, []).append(ref)
+        finally:
+            doc.close()
+        
+        self.raw_names = frozenset(raw_names)
+        self.widgets_by_name = widgets_by_name
+        # Detect naming style from raw field names
+        self.style = detect_name_style(raw_names)
+
+
+# Template indexes by path: {path: (mtime, index)}
+_template_cache: Dict[str, Tuple[float, INK2TemplateIndex]] = {}
+_template_cache_lock = threading.Lock()
+
+
+def get_ink2_template(pdf_path: str) -> INK2TemplateIndex:
+    """Template index for pdf_path, read and indexed once (again only if the file changes)"""
+    mtime = os.path.getmtime(pdf_path)
+    cached = _template_cache.get(pdf_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _template_cache_lock:
+        cached = _template_cache.get(pdf_path)
+        if cached is None or cached[0] != mtime:
+            with open(pdf_path, 'rb') as f:
+                cached = (mtime, INK2TemplateIndex(f.read()))
+            _template_cache[pdf_path] = cached
+        return cached[1]
+
+
+def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], company_data: Dict[str, Any] = None,
+                           template: Optional[INK2TemplateIndex] = None) -> bytes:
     """
     Fill INK2 PDF form using PyMuPDF (generates appearance streams + flattens).
     
@@ -447,6 +470,7 @@ def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], compan
         pdf_bytes: Template PDF bytes
         assignments: Dict mapping logical names ('2.17', '3.12(+)', etc.) to values
         company_data: Optional company data for extracting org number
+        template: Precomputed index of pdf_bytes (see get_ink2_template); built here if omitted
         
     Returns:
         Filled and flattened PDF bytes
@@ -454,35 +478,27 @@ def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], compan
     if not HAS_PYMUPDF:
         raise RuntimeError("PyMuPDF is required for INK2 PDF filling")
     
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    if template is None:
+        template = INK2TemplateIndex(pdf_bytes)
     
-    # Build set of raw field names to detect the naming style
-    raw_names = set()
-    widgets_by_name = {}
+    doc = fitz.open(stream=template.pdf_bytes, filetype="pdf")
+    style = template.style
     
-    for page in doc:
-        for widget in page.widgets():
-            # PyMuPDF exposes widget.field_name (widget /T) and widget.field_label (parent /T)
-            raw = widget.field_name or widget.field_label or ""
-            if not raw:
-                continue
-            
-            raw_names.add(raw.strip())
-            
-            # Create key variants (with/without trailing colon, #0 suffix)
-            # Normalize handles #0 and : removal
-            base = normalize_field_name(raw)
-            key_variants = {
-                base,
-                normalize_field_name(raw + ":"),
-                normalize_field_name(raw[:-1] if raw.endswith(":") else raw),
-            }
-            
-            for key in key_variants:
-                widgets_by_name.setdefault(key, []).append((page, widget))
+    # Pages and widgets are loaded on first use; keep the pages referenced while their widgets are used
+    pages: Dict[int, Any] = {}
+    widgets: Dict[int, Any] = {}
     
-    # Detect naming style from raw field names
-    style = detect_name_style(raw_names)
+    def lookup(key: str) -> List[Tuple[Any, Any]]:
+        hits = []
+        for ref in template.widgets_by_name.get(key, ()):
+            widget = widgets.get(ref.xref)
+            if widget is None:
+                page = pages.get(ref.page)
+                if page is None:
+                    page = pages[ref.page] = doc[ref.page]
+                widget = widgets[ref.xref] = page.load_widget(ref.xref)
+            hits.append((pages[ref.page], widget))
+        return hits
     
     # Extract organization number variants if company_data provided
     if company_data:
@@ -509,7 +525,7 @@ def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], compan
                 continue
             pdf_name = to_pdf_field_name(logical_name, style)
             key = normalize_field_name(pdf_name)
-            hits = widgets_by_name.get(key, [])
+            hits = lookup(key)
             for page, widget in hits:
                 try:
                     widget.field_value = str(value)
@@ -519,9 +535,9 @@ def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], compan
         
         # Safety net: auto-probe any field with "org" in name and set to dashed format
         if dashed:
-            for key, widgets in widgets_by_name.items():
+            for key in template.widgets_by_name:
                 if "org" in key:
-                    for page, widget in widgets:
+                    for page, widget in lookup(key):
                         try:
                             widget.field_value = dashed
                             widget.update()
@@ -536,7 +552,7 @@ def fill_ink2_with_pymupdf(pdf_bytes: bytes, assignments: Dict[str, str], compan
         # Convert logical name to PDF field name using detected style
         pdf_name = to_pdf_field_name(logical_name, style)
         normalized = normalize_field_name(pdf_name)
-        hits = widgets_by_name.get(normalized, [])
+        hits = lookup(normalized)
         
         # Special-case the four checkboxes on page 4
         is_checkbox = pdf_name in ("23a", "23b", "24a", "24b")
@@ -594,6 +610,7 @@ class INK2PdfFiller:
         self.organization_number = organization_number
         self.fiscal_year = fiscal_year
         self.form_mappings = []
+        self.form_plan: Optional[Ink2FormPlan] = None
         self.company_data = company_data or {}
         
         # Create universal resolver (override-first, then DB)
@@ -608,12 +625,9 @@ class INK2PdfFiller:
         pass
         
     def _load_form_mappings(self):
-        """Load form field mappings from ink2_form table"""
-        try:
-            response = supabase.table('ink2_form').select('*').order('Id').execute()
-            self.form_mappings = response.data
-        except Exception as e:
-            raise
+        """Load the compiled ink2_form plan (cached per mapping version)"""
+        self.form_plan = get_ink2_form_plan()
+        self.form_mappings = self.form_plan.rows
     
     def _fetch_variable_value(self, variable_name: str) -> Optional[float]:
         """
@@ -647,7 +661,7 @@ class INK2PdfFiller:
         if not mapping or mapping.strip() == '':
             return None
         
-        return eval_mapping(mapping.strip(), self.resolver)
+        return eval_mapping(mapping, self.resolver)
     
     def _format_value_for_field(self, value: Optional[float], field_type: str = None, form_field: str = None) -> str:
         """
@@ -790,13 +804,11 @@ class INK2PdfFiller:
         # Prepare assignments (logical name -> value)
         assignments = {}
         
-        for mapping in self.form_mappings:
-            form_field_raw = mapping.get('form_field')
-            variable_map = mapping.get('variable_map')
-            field_type = mapping.get('type')
-            
-            if not form_field_raw or not variable_map:
-                continue
+        # Rows with a form field and a variable_map, expressions pre-parsed
+        for field in self.form_plan.pdf_fields:
+            form_field_raw = field.form_field
+            variable_map = field.variable_map
+            field_type = field.field_type
             
             # Check if this is a special value (exact match first)
             if variable_map in special_values:
@@ -804,7 +816,7 @@ class INK2PdfFiller:
                 continue
             
             # Check case-insensitive
-            variable_map_lower = variable_map.lower()
+            variable_map_lower = field.variable_map_lower
             if variable_map_lower in special_values_lower:
                 assignments[form_field_raw] = special_values_lower[variable_map_lower]
                 continue
@@ -824,8 +836,8 @@ class INK2PdfFiller:
             if found_in_special:
                 continue
             
-            # Parse the variable mapping (looks in RR/BR/INK2 data)
-            value = self._parse_variable_mapping(variable_map)
+            # Evaluate the variable mapping (looks in RR/BR/INK2 data)
+            value = eval_terms(field.pdf_terms, self.resolver)
             
             if value is not None:
                 formatted_value = self._format_value_for_field(value, field_type, form_field_raw)
@@ -875,12 +887,11 @@ class INK2PdfFiller:
             assignments['24a'] = '/Off'  # PDF standard format for unchecked checkbox
             assignments['24b'] = '/Yes'  # PDF standard format for checked checkbox
         
-        # Load template PDF
-        with open(pdf_path, 'rb') as f:
-            template_bytes = f.read()
+        # Template PDF and its widget index (read once per process)
+        template = get_ink2_template(pdf_path)
         
         # Fill using PyMuPDF (generates appearance streams + flattens)
-        filled_pdf = fill_ink2_with_pymupdf(template_bytes, assignments, company_data)
+        filled_pdf = fill_ink2_with_pymupdf(template.pdf_bytes, assignments, company_data, template)
         
         return filled_pdf
 
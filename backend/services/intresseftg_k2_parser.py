@@ -1,6 +1,8 @@
 import re
 import unicodedata
-from collections import defaultdict
+from typing import Union
+
+from .sie_document import SieDocument
 
 # ------------------ utils ------------------
 def _norm(s: str) -> str:
@@ -12,11 +14,8 @@ def _norm(s: str) -> str:
     s = re.sub(r"\s+", " ", s).strip()
     return s
 
-def _to_float(s: str) -> float:
-    return float((s or "0").strip().replace(" ", "").replace(",", "."))
-
 # ---------- discovery step: build dynamic 133x sets ----------
-def discover_equity_account_map_for_range_133x(sie_text: str):
+def discover_equity_account_map_for_range_133x(sie_text: Union[str, SieDocument]):
     """
     Scan #KONTO/#SRU in 1330–1339 and classify accounts into:
       - ASSET: investment cost accounts (andelar)
@@ -24,24 +23,9 @@ def discover_equity_account_map_for_range_133x(sie_text: str):
       - CONTRIB: aktieägartillskott accounts (company-specific)
     Uses robust name matching and SRU hints (if present).
     """
-    lines = sie_text.splitlines()
-    konto_re = re.compile(r'^#KONTO\s+(\d{4})\s+"(.*)"')
-    sru_re   = re.compile(r'^#SRU\s+(\d{4})\s+(\d+)')
-    name_by_acc, sru_by_acc = {}, {}
-
-    for raw in lines:
-        t = raw.strip()
-        mk = konto_re.match(t)
-        if mk:
-            acc = int(mk.group(1))
-            if 1330 <= acc <= 1339:
-                name_by_acc[acc] = mk.group(2)
-            continue
-        ms = sru_re.match(t)
-        if ms:
-            acc = int(ms.group(1))
-            if 1330 <= acc <= 1339:
-                sru_by_acc[acc] = int(ms.group(2))
+    doc = SieDocument.coerce(sie_text)
+    name_by_acc = {acc: nm for acc, nm in doc.account_names.items() if 1330 <= acc <= 1339}
+    sru_by_acc  = {acc: sru for acc, sru in doc.sru_codes.items() if 1330 <= acc <= 1339}
 
     # Defaults (BAS)
     default_asset  = {1330, 1331, 1333, 1336}
@@ -81,54 +65,16 @@ def discover_equity_account_map_for_range_133x(sie_text: str):
     ASSET -= CONTRIB
     return {"ASSET": ASSET, "ACC_IMP": ACC_IMP, "CONTRIB": CONTRIB, "names": name_by_acc, "sru": sru_by_acc}
 
-def _get_balance(lines, kind_flag: str, accounts: set[int]) -> float:
-    total = 0.0
-    bal_re = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-    for raw in lines:
-        m = bal_re.match(raw.strip())
-        if not m: 
-            continue
-        acct = int(m.group(1))
-        if acct in accounts:
-            total += _to_float(m.group(2))
-    return total
-
-def _parse_vouchers(lines):
-    ver_header_re = re.compile(r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"([^"]*)"|.+))?\s*$')
-    # Accept only normal + supplementary transactions; ignore removed items
-    trans_re = re.compile(
-        r'^#(?:TRANS|RTRANS)\s+'          # <-- no BTRANS here
-        r'(\d{3,4})'
-        r'(?:\s+\{.*?\})?'
-        r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'
-        r'(?:\s+\d{8})?'
-        r'(?:\s+"(.*?)")?'
-        r'\s*$'
-    )
-    trans_by_ver = defaultdict(list)
-    text_by_ver = {}
-    cur = None; in_block = False
-    for raw in lines:
-        t = raw.strip()
-        mh = ver_header_re.match(t)
-        if mh:
-            cur = (mh.group(1), int(mh.group(2)))
-            text_by_ver[cur] = (mh.group(4) or "").lower()
-            continue
-        if t == "{": in_block = True;  continue
-        if t == "}": in_block = False; cur = None; continue
-        # Ignore removed items explicitly (defensive)
-        if t.startswith('#BTRANS'):
-            continue
-        if in_block and cur:
-            mt = trans_re.match(t)
-            if mt:
-                acct = int(mt.group(1))
-                amt  = _to_float(mt.group(2))
-                trans_by_ver[cur].append((acct, amt))
+def _get_balance(doc: SieDocument, kind_flag: str, accounts: set[int]) -> float:
+    return doc.balance_sum(kind_flag, 0, accounts)
+
+def _parse_vouchers(doc: SieDocument):
+    # Only normal + supplementary transactions; removed items (#BTRANS) are ignored
+    trans_by_ver = doc.trans_by_ver()
+    text_by_ver = {key: (text or "").lower() for key, text in doc.voucher_texts().items()}
     return trans_by_ver, text_by_ver
 
-def parse_intresseftg_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: str = None) -> dict:
+def parse_intresseftg_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: Union[str, SieDocument] = None) -> dict:
     """
     K2 – Andelar i intresseföretag / gemensamt styrda / övriga (1330–1339)
     
@@ -156,11 +102,10 @@ def parse_intresseftg_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
     • AAT flows handled separately from sales
     • Sophisticated impairment detection
     """
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
+    doc = SieDocument.coerce(sie_text)
 
     # Discover actual account sets
-    m = discover_equity_account_map_for_range_133x(sie_text)
+    m = discover_equity_account_map_for_range_133x(doc)
     ASSET_SET   = m["ASSET"]
     CONTRIB_SET = m["CONTRIB"]
     ACC_IMP_SET = m["ACC_IMP"]
@@ -169,12 +114,12 @@ def parse_intresseftg_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
         pass
 
     # IB / UB (from SIE)
-    intresseftg_ib            = _get_balance(lines, 'IB', ASSET_SET | CONTRIB_SET)
-    ack_nedskr_intresseftg_ib = _get_balance(lines, 'IB', ACC_IMP_SET)
+    intresseftg_ib            = _get_balance(doc, 'IB', ASSET_SET | CONTRIB_SET)
+    ack_nedskr_intresseftg_ib = _get_balance(doc, 'IB', ACC_IMP_SET)
 
     # factual UB (USED for final results)
-    cost_ub_actual = _get_balance(lines, 'UB', ASSET_SET | CONTRIB_SET)
-    ack_ub_actual  = _get_balance(lines, 'UB', ACC_IMP_SET)
+    cost_ub_actual = _get_balance(doc, 'UB', ASSET_SET | CONTRIB_SET)
+    ack_ub_actual  = _get_balance(doc, 'UB', ACC_IMP_SET)
 
     # Accumulators (flows)
     inkop_intresseftg                         = 0.0
@@ -204,7 +149,7 @@ def parse_intresseftg_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
         return 1900 <= a <= 1999
 
     # Parse vouchers
-    trans_by_ver, text_by_ver = _parse_vouchers(lines)
+    trans_by_ver, text_by_ver = _parse_vouchers(doc)
 
     for key, txs in trans_by_ver.items():
         text = (text_by_ver.get(key, "") or "").lower()
@@ -346,29 +291,18 @@ def parse_intresseftg_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
         #   - cost set: ASSET_SET | CONTRIB_SET
         #   - impairment set: ACC_IMP_SET
 
-        def _get_balance_prev(lines, kind_flag: str, accounts: set[int]) -> float:
+        def _get_balance_prev(kind_flag: str, accounts: set[int]) -> float:
             """
             Sum #IB -1 or #UB -1 for the given accounts.
             kind_flag ∈ {"IB", "UB"}.
             """
-            if not accounts:
-                return 0.0
-            total = 0.0
-            bal_re_prev = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-            for raw in lines:
-                m = bal_re_prev.match(raw.strip())
-                if not m:
-                    continue
-                acct = int(m.group(1))
-                if acct in accounts:
-                    total += _to_float(m.group(2))
-            return total
+            return doc.balance_sum(kind_flag, -1, accounts)
 
         # --- Previous-year balances ---
-        intresseftg_ib_prev            = _get_balance_prev(lines, 'IB', ASSET_SET | CONTRIB_SET)
-        ack_nedskr_intresseftg_ib_prev = _get_balance_prev(lines, 'IB', ACC_IMP_SET)
-        intresseftg_ub_prev            = _get_balance_prev(lines, 'UB', ASSET_SET | CONTRIB_SET)
-        ack_nedskr_intresseftg_ub_prev = _get_balance_prev(lines, 'UB', ACC_IMP_SET)
+        intresseftg_ib_prev            = _get_balance_prev('IB', ASSET_SET | CONTRIB_SET)
+        ack_nedskr_intresseftg_ib_prev = _get_balance_prev('IB', ACC_IMP_SET)
+        intresseftg_ub_prev            = _get_balance_prev('UB', ASSET_SET | CONTRIB_SET)
+        ack_nedskr_intresseftg_ub_prev = _get_balance_prev('UB', ACC_IMP_SET)
 
         red_varde_intresseftg_prev = (intresseftg_ub_prev or 0.0) + (ack_nedskr_intresseftg_ub_prev or 0.0)
 
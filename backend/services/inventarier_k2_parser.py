@@ -1,7 +1,8 @@
-import re
-from collections import defaultdict
+from typing import Union
 
-def parse_inventarier_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: str = None) -> dict:
+from .sie_document import SieDocument
+
+def parse_inventarier_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: Union[str, SieDocument] = None) -> dict:
     """
     INVENTARIER-note (K2) parser.
     
@@ -31,19 +32,11 @@ def parse_inventarier_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
       • Återföring vid avyttring: D på ack. nedskrivning i samma verifikat
     """
 
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
+    # Tokenized SIE document (NBSP/thousand spaces in amounts handled by the tokenizer)
+    doc = SieDocument.coerce(sie_text)
 
-    # --- Parse SRU codes to filter accounts ---
-    sru_codes = {}
-    sru_re = re.compile(r'^#SRU\s+(\d+)\s+(\d+)\s*$')
-    for raw in lines:
-        s = raw.strip()
-        m = sru_re.match(s)
-        if m:
-            account = int(m.group(1))
-            sru = int(m.group(2))
-            sru_codes[account] = sru
+    # --- SRU codes to filter accounts ---
+    sru_codes = doc.sru_codes
 
     # --- CONFIG (K2 – inventarier) ---
     # Base account ranges for inventarier
@@ -100,65 +93,12 @@ def parse_inventarier_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
     def in_assets(acct: int) -> bool:
         return any(lo <= acct <= hi for lo, hi in ASSET_RANGES)
 
-    def _to_float(s: str) -> float:
-        return float(s.strip().replace(" ", "").replace(",", "."))
-
     def get_balance(kind_flag: str, accounts):
-        total = 0.0
-        bal_re = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-        for raw in lines:
-            s = raw.strip()
-            m = bal_re.match(s)
-            if not m:
-                continue
-            acct = int(m.group(1))
-            amount = _to_float(m.group(2))
-            if isinstance(accounts, (set, frozenset)):
-                ok = acct in accounts
-            else:
-                ok = any(lo <= acct <= hi for lo, hi in accounts)
-            if ok:
-                total += amount
-        return total
-
-    # --- Parse vouchers ---
-    ver_header_re = re.compile(r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"[^"]*"|.+))?\s*$')
-    trans_re = re.compile(
-        r'^#(?:TRANS|RTRANS)\s+'          # <-- no BTRANS here
-        r'(\d{3,4})'
-        r'(?:\s+\{.*?\})?'
-        r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'
-        r'(?:\s+\d{8})?'
-        r'(?:\s+".*?")?'
-        r'\s*$'
-    )
-
-    trans_by_ver = defaultdict(list)
-    current_ver = None
-    in_block = False
-
-    for raw in lines:
-        t = raw.strip()
-        mh = ver_header_re.match(t)
-        if mh:
-            current_ver = (mh.group(1), int(mh.group(2)))
-            continue
-        if t == "{":
-            in_block = True
-            continue
-        if t == "}":
-            in_block = False
-            current_ver = None
-            continue
-        # Ignore removed items explicitly (defensive)
-        if t.startswith('#BTRANS'):
-            continue
-        if in_block and current_ver:
-            mt = trans_re.match(t)
-            if mt:
-                acct = int(mt.group(1))
-                amt = _to_float(mt.group(2))
-                trans_by_ver[current_ver].append((acct, amt))
+        """Sum #IB or #UB for the given account set/ranges (current year '0' rows)."""
+        return doc.balance_sum(kind_flag, 0, accounts)
+
+    # --- Vouchers (#TRANS/#RTRANS only; removed #BTRANS rows are skipped) ---
+    trans_by_ver = doc.trans_by_ver()
 
     # --- IB balances ---
     inventarier_ib = get_balance('IB', ASSET_RANGES)
@@ -295,40 +235,23 @@ def parse_inventarier_k2_from_sie_text(sie_text: str, debug: bool = False, two_f
         #   - ACC_DEP         : accumulated depreciation accounts
         #   - ACC_IMP         : accumulated impairment accounts
 
-        def _get_balance_prev(lines, kind_flag: str, accounts) -> float:
+        def _get_balance_prev(kind_flag: str, accounts) -> float:
             """
             Sum #IB -1 or #UB -1 for the given accounts (set or ranges).
             kind_flag ∈ {"IB", "UB"}.
             If accounts is None/empty -> 0.0.
             """
-            if not accounts:
-                return 0.0
-            total = 0.0
-            bal_re_prev = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-            for raw in lines:
-                s = raw.strip()
-                m = bal_re_prev.match(s)
-                if not m:
-                    continue
-                acct = int(m.group(1))
-                # Handle both sets and ranges like the original get_balance function
-                if isinstance(accounts, (set, frozenset)):
-                    ok = acct in accounts
-                else:
-                    ok = any(lo <= acct <= hi for lo, hi in accounts)
-                if ok:
-                    total += _to_float(m.group(2))
-            return total
+            return doc.balance_sum(kind_flag, -1, accounts)
 
         # --- Previous-year balances using SAME sets as current year ---
-        inventarier_ib_prev  = _get_balance_prev(lines, 'IB', ASSET_RANGES)
-        inventarier_ub_prev  = _get_balance_prev(lines, 'UB', ASSET_RANGES)
+        inventarier_ib_prev  = _get_balance_prev('IB', ASSET_RANGES)
+        inventarier_ub_prev  = _get_balance_prev('UB', ASSET_RANGES)
 
-        ack_avskr_inventarier_ib_prev = _get_balance_prev(lines, 'IB', ACC_DEP)
-        ack_avskr_inventarier_ub_prev = _get_balance_prev(lines, 'UB', ACC_DEP)
+        ack_avskr_inventarier_ib_prev = _get_balance_prev('IB', ACC_DEP)
+        ack_avskr_inventarier_ub_prev = _get_balance_prev('UB', ACC_DEP)
 
-        ack_nedskr_inventarier_ib_prev = _get_balance_prev(lines, 'IB', ACC_IMP)
-        ack_nedskr_inventarier_ub_prev = _get_balance_prev(lines, 'UB', ACC_IMP)
+        ack_nedskr_inventarier_ib_prev = _get_balance_prev('IB', ACC_IMP)
+        ack_nedskr_inventarier_ub_prev = _get_balance_prev('UB', ACC_IMP)
 
         # No revaluation accounts in INVENTARIER parser, so set to 0
         uppskr_inventarier_ib_prev = 0.0
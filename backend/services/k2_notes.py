@@ -0,0 +1,184 @@
+"""
+K2 Notes Stage
+Runs the independent K2 note parsers (koncern, intresseftg, bygg, maskiner,
+inventarier, ovriga, lvp and the three fordringar parsers) as one stage.
+
+The SIE file is tokenized once into a SieDocument and its voucher indexes are
+built before the parsers run. On large ledgers the parsers run concurrently on
+a bounded process pool: the document is pickled once to a temp file, the
+parsers are split into one group per worker, and each group is a single task
+that gets only the file path, so the document never crosses the process pipe
+and is unpickled once per worker. The voucher indexes are left out of the
+pickle; rebuilding them in the worker is cheaper than unpickling them. Small
+files run sequentially since process hand-off costs more than the parsing
+itself.
+
+Results are memoized on the document, keyed by parser, content hash and flags,
+so each parser runs at most once per upload (BR reconciliation and Noter see
+the same KONCERN numbers).
+
+Usage:
+    results = run_k2_note_parsers(doc, two_files_flag, previous_doc)
+    results['koncern']   # same dict as parse_koncern_k2_from_sie_text(...)
+    run_k2_note_parser('koncern', doc, two_files_flag, previous_doc)
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from importlib import import_module
+from typing import Dict, List, Optional, Tuple, Union
+
+from .sie_document import SieDocument
+
+# Max worker processes for the note stage (1 = always sequential)
+K2_NOTE_WORKERS = int(os.getenv("K2_NOTE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Below this many vouchers the parsers run in-process
+K2_NOTE_PARALLEL_MIN_VOUCHERS = int(os.getenv("K2_NOTE_PARALLEL_MIN_VOUCHERS", "5000"))
+
+# (result key, module, function, takes previous-year arguments)
+K2_NOTE_PARSERS: Tuple[Tuple[str, str, str, bool], ...] = (
+    ('koncern', 'koncern_k2_parser', 'parse_koncern_k2_from_sie_text', True),
+    ('intresseftg', 'intresseftg_k2_parser', 'parse_intresseftg_k2_from_sie_text', True),
+    ('bygg', 'bygg_k2_parser', 'parse_bygg_k2_from_sie_text', True),
+    ('maskiner', 'maskiner_k2_parser', 'parse_maskiner_k2_from_sie_text', True),
+    ('inventarier', 'inventarier_k2_parser', 'parse_inventarier_k2_from_sie_text', True),
+    ('ovriga', 'ovriga_k2_parser', 'parse_ovriga_k2_from_sie_text', True),
+    ('lvp', 'lvp_k2_parser', 'parse_lvp_k2_from_sie_text', True),
+    ('fordrkonc', 'fordringar_koncern_k2_parser', 'parse_fordringar_koncern_k2_from_sie_text', False),
+    ('fordrintre', 'fordringar_intresseftg_k2_parser', 'parse_fordringar_intresseftg_k2_from_sie_text', False),
+    ('fordrovrftg', 'fordringar_ovrftg_k2_parser', 'parse_fordringar_ovrftg_k2_from_sie_text', False),
+)
+_PARSERS_BY_KEY = {entry[0]: entry for entry in K2_NOTE_PARSERS}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_parser(module_name: str, func_name: str):
+    return getattr(import_module(f"{__package__}.{module_name}"), func_name)
+
+
+def _call_parser(module_name: str, func_name: str, takes_prev: bool,
+                 doc: SieDocument, two_files_flag: bool, previous_doc: Optional[SieDocument]) -> dict:
+    func = _get_parser(module_name, func_name)
+    if takes_prev:
+        return func(doc, debug=False, two_files_flag=two_files_flag, previous_year_sie_text=previous_doc)
+    return func(doc, debug=False)
+
+
+def _run_group_in_worker(payload_path: str, entries, two_files_flag: bool) -> Dict[str, dict]:
+    # Runs in a worker process: one unpickle for the whole group of parsers
+    with open(payload_path, 'rb') as f:
+        doc, previous_doc = pickle.load(f)
+    return _run_sequential(entries, doc, two_files_flag, previous_doc)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=K2_NOTE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _reset_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def _prepare(doc: Optional[SieDocument]) -> None:
+    """Build the lazy indexes before the document is shared with the parsers."""
+    if doc is None:
+        return
+    doc.trans_by_ver()
+    doc.trans_by_ver(include_btrans=True)
+
+
+def _memo_key(key: str, doc: SieDocument, two_files_flag: bool, previous_doc: Optional[SieDocument]) -> tuple:
+    takes_prev = _PARSERS_BY_KEY[key][3]
+    if not takes_prev:
+        return ('k2', key, doc.content_hash)
+    prev_hash = previous_doc.content_hash if (two_files_flag and previous_doc is not None) else None
+    return ('k2', key, doc.content_hash, bool(two_files_flag), prev_hash)
+
+
+def _run_sequential(entries, doc: SieDocument, two_files_flag: bool,
+                    previous_doc: Optional[SieDocument]) -> Dict[str, dict]:
+    _prepare(doc)
+    _prepare(previous_doc)
+    return {
+        key: _call_parser(module_name, func_name, takes_prev, doc, two_files_flag, previous_doc)
+        for key, module_name, func_name, takes_prev in entries
+    }
+
+
+def _run_parallel(entries, doc: SieDocument, two_files_flag: bool,
+                  previous_doc: Optional[SieDocument]) -> Dict[str, dict]:
+    fd, payload_path = tempfile.mkstemp(prefix='k2-notes-', suffix='.pickle')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump((doc, previous_doc), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # One task per worker, parsers dealt round-robin in K2_NOTE_PARSERS order
+        groups: List[list] = [list(entries[i::K2_NOTE_WORKERS]) for i in range(min(K2_NOTE_WORKERS, len(entries)))]
+        pool = _get_pool()
+        futures = [pool.submit(_run_group_in_worker, payload_path, group, two_files_flag) for group in groups]
+        results: Dict[str, dict] = {}
+        for future in futures:
+            results.update(future.result())
+        return results
+    finally:
+        os.unlink(payload_path)
+
+
+def run_k2_note_parser(key: str, sie_content: Union[str, SieDocument], two_files_flag: bool = False,
+                       previous_year_sie_content: Union[str, SieDocument] = None) -> dict:
+    """Run a single K2 note parser (e.g. 'koncern'), reusing a memoized result for the same upload."""
+    doc = SieDocument.coerce(sie_content)
+    previous_doc = SieDocument.coerce(previous_year_sie_content or None)
+    memo_key = _memo_key(key, doc, two_files_flag, previous_doc)
+    result = doc.derived.get(memo_key)
+    if result is None:
+        _, module_name, func_name, takes_prev = _PARSERS_BY_KEY[key]
+        result = _call_parser(module_name, func_name, takes_prev, doc, two_files_flag, previous_doc)
+        doc.derived[memo_key] = result
+    return dict(result)
+
+
+def run_k2_note_parsers(sie_content: Union[str, SieDocument], two_files_flag: bool = False,
+                        previous_year_sie_content: Union[str, SieDocument] = None) -> Dict[str, dict]:
+    """
+    Run all K2 note parsers on the same document and return their results keyed
+    by note ('koncern', 'intresseftg', ..., 'fordrovrftg').
+    """
+    doc = SieDocument.coerce(sie_content)
+    previous_doc = SieDocument.coerce(previous_year_sie_content or None)
+
+    memo_keys = {key: _memo_key(key, doc, two_files_flag, previous_doc) for key in _PARSERS_BY_KEY}
+    pending = [entry for entry in K2_NOTE_PARSERS if memo_keys[entry[0]] not in doc.derived]
+
+    if pending:
+        if K2_NOTE_WORKERS <= 1 or len(pending) == 1 or len(doc.vouchers) < K2_NOTE_PARALLEL_MIN_VOUCHERS:
+            computed = _run_sequential(pending, doc, two_files_flag, previous_doc)
+        else:
+            try:
+                computed = _run_parallel(pending, doc, two_files_flag, previous_doc)
+            except (BrokenProcessPool, OSError, pickle.PicklingError) as e:
+                print(f"K2 note pool unavailable ({e}), running parsers sequentially")
+                _reset_pool()
+                computed = _run_sequential(pending, doc, two_files_flag, previous_doc)
+        for key, result in computed.items():
+            doc.derived[memo_keys[key]] = result
+
+    # Hand out copies so callers can't alter the memoized results
+    return {key: dict(doc.derived[memo_keys[key]]) for key in _PARSERS_BY_KEY}
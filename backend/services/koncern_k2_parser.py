@@ -1,6 +1,8 @@
 import re
 import unicodedata
-from collections import defaultdict
+from typing import Union
+
+from .sie_document import SieDocument
 
 # ---- Regex patterns for precise matching ----
 ACK_IMP_PAT = re.compile(r'\b(?:ack(?:[.\s]*nedskr\w*)|ackum\w*|nedskriv\w*)\b', re.IGNORECASE)
@@ -9,7 +11,7 @@ FORDR_PAT   = re.compile(r'\b(fordran|fordringar|lan|lån|ranta|ränta|amort|avb
 # ---- Sale P&L accounts for distinguishing real sales from cash settlements ----
 SALE_PNL = tuple(range(8220, 8230))  # resultat vid försäljning av andelar (BAS 822x)
 
-def parse_koncern_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: str = None) -> dict:
+def parse_koncern_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: Union[str, SieDocument] = None) -> dict:
     """
     KONCERN-note (K2) parser — enhanced with dynamic account classification and HB/KB flow handling.
 
@@ -67,37 +69,14 @@ def parse_koncern_k2_from_sie_text(sie_text: str, debug: bool = False, two_files
         s = re.sub(r"\s+", " ", s).strip()
         return s
 
-    def _to_float(s: str) -> float:
-        # tolerant for "123 456,78" and "123,456.78"
-        return float(s.strip().replace(" ", "").replace(",", "."))
-
     def _has(text: str, *subs) -> bool:
         return any(sub in text for sub in subs)
 
-    # ---------- Pre-normalize SIE text ----------
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
-
-    # ---------- Read #KONTO (account names) & #SRU ----------
-    konto_name = {}   # acct -> normalized name
-    sru_codes = {}    # acct -> sru
-
-    konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"\s*$')
-    sru_re   = re.compile(r'^#SRU\s+(\d+)\s+(\d+)\s*$')
+    # ---------- Tokenized SIE document ----------
+    doc = SieDocument.coerce(sie_text)
 
-    for raw in lines:
-        s = raw.strip()
-        mk = konto_re.match(s)
-        if mk:
-            acct = int(mk.group(1))
-            name = _normalize(mk.group(2))
-            konto_name[acct] = name
-            continue
-        ms = sru_re.match(s)
-        if ms:
-            account = int(ms.group(1))
-            sru = int(ms.group(2))
-            sru_codes[account] = sru
+    # ---------- #KONTO (account names) ----------
+    konto_name = {acct: _normalize(name) for acct, name in doc.account_names.items()}   # acct -> normalized name
 
     # ---------- Classify accounts (dynamic sets) ----------
     # Scope: 1310–1318 primarily; 1320–1329 only if text says Shares/AAT and not receivables
@@ -197,82 +176,16 @@ def parse_koncern_k2_from_sie_text(sie_text: str, debug: bool = False, two_files
         """Sum #IB or #UB for the given account set/ranges (current year '0' rows)."""
         if not accounts:
             return 0.0
-        acct_set = set(accounts)
-        total = 0.0
-        bal_re = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-        for raw in lines:
-            s = raw.strip()
-            m = bal_re.match(s)
-            if not m:
-                continue
-            acct = int(m.group(1))
-            if acct in acct_set:
-                amount = _to_float(m.group(2))
-                total += amount
-        return total
-
-    # --- Parse vouchers with text extraction (original) ---
-    ver_header_re = re.compile(
-        r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"([^"]*)"|(.+)))?\s*$'
-    )
-    # Accept only normal + supplementary transactions; ignore removed items
-    trans_re = re.compile(
-        r'^#(?:TRANS|RTRANS)\s+'          # <-- no BTRANS here
-        r'(\d{3,4})'
-        r'(?:\s+\{.*?\})?'
-        r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'
-        r'(?:\s+\d{8})?'
-        r'(?:\s+".*?")?'
-        r'\s*$'
-    )
+        return doc.balance_sum(kind_flag, 0, set(accounts))
 
-    trans_by_ver = defaultdict(list)
-    text_by_ver = {}
-    current_ver = None
-    in_block = False
-
-    for raw in lines:
-        t = raw.strip()
-        mh = ver_header_re.match(t)
-        if mh:
-            current_ver = (mh.group(1), int(mh.group(2)))
-            voucher_text = mh.group(4) or mh.group(5) or ""
-            text_by_ver[current_ver] = _normalize(voucher_text)
-            continue
-        if t == "{":
-            in_block = True
-            continue
-        if t == "}":
-            in_block = False
-            current_ver = None
-            continue
-        # Ignore removed items explicitly (defensive)
-        if t.startswith('#BTRANS'):
-            continue
-            
-        if in_block and current_ver:
-            mt = trans_re.match(t)
-            if mt:
-                acct = int(mt.group(1))
-                amt = _to_float(mt.group(2))
-                trans_by_ver[current_ver].append((acct, amt))
+    # --- Vouchers with text extraction (#TRANS/#RTRANS only; removed #BTRANS rows are skipped) ---
+    trans_by_ver = doc.trans_by_ver()
+    text_by_ver = {key: _normalize(text) for key, text in doc.voucher_texts().items()}
 
     # ---------- IB balances (dynamic sets) ----------
     koncern_ib = get_balance('IB', asset_all_set)
     ack_nedskr_koncern_ib = get_balance('IB', imp_set)
 
-    # Debug output for impairment account classification
-    if debug:
-        debug_imp_ib = {}
-        for raw in lines:
-            m = re.match(r'^#IB\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)', raw.strip())
-            if m:
-                acct = int(m.group(1))
-                if acct in imp_set:
-                    val = float(m.group(2).replace(" ", "").replace(",", "."))
-                    debug_imp_ib[acct] = val
-
-
     # ---------- Accumulators ----------
     resultatandel_koncern = 0.0
     inkop_koncern = 0.0
@@ -483,33 +396,20 @@ def parse_koncern_k2_from_sie_text(sie_text: str, debug: bool = False, two_files
         #   - asset_all_set : the accounts contributing to acquisition value
         #   - imp_set       : the accounts contributing to accumulated impairments
         
-        def get_balance_prev(kind_flag: str, accounts, lines_data, to_float_func) -> float:
+        def get_balance_prev(kind_flag: str, accounts) -> float:
             """
             Sum #IB -1 or #UB -1 for the given account set.
             kind_flag ∈ {"IB", "UB"}.
             """
             if not accounts:
                 return 0.0
-            acct_set = set(accounts)
-            total = 0.0
-            # Example line: "#IB -1 1310 44050000.00" or "#UB -1 1310 44050000.00"
-            bal_re_prev = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-            for raw in lines_data:
-                s = raw.strip()
-                m = bal_re_prev.match(s)
-                if not m:
-                    continue
-                acct = int(m.group(1))
-                if acct in acct_set:
-                    amount = to_float_func(m.group(2))
-                    total += amount
-            return total
+            return doc.balance_sum(kind_flag, -1, set(accounts))
 
         # --- Compute previous-year balances using the SAME account sets as for current year ---
-        koncern_ib_prev = get_balance_prev('IB', asset_all_set, lines, _to_float)
-        koncern_ub_prev = get_balance_prev('UB', asset_all_set, lines, _to_float)
-        ack_nedskr_koncern_ib_prev = get_balance_prev('IB', imp_set, lines, _to_float)
-        ack_nedskr_koncern_ub_prev = get_balance_prev('UB', imp_set, lines, _to_float)
+        koncern_ib_prev = get_balance_prev('IB', asset_all_set)
+        koncern_ub_prev = get_balance_prev('UB', asset_all_set)
+        ack_nedskr_koncern_ib_prev = get_balance_prev('IB', imp_set)
+        ack_nedskr_koncern_ub_prev = get_balance_prev('UB', imp_set)
 
         # Redovisat värde (prev): UB assets + UB accumulated impairments (impairments are negative)
         red_varde_koncern_prev = (koncern_ub_prev or 0.0) + (ack_nedskr_koncern_ub_prev or 0.0)
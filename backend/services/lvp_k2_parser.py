@@ -1,7 +1,8 @@
-import re
-from collections import defaultdict
+from typing import Union
 
-def parse_lvp_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: str = None) -> dict:
+from .sie_document import SieDocument
+
+def parse_lvp_k2_from_sie_text(sie_text: Union[str, SieDocument], debug: bool = False, two_files_flag: bool = False, previous_year_sie_text: Union[str, SieDocument] = None) -> dict:
     """
     LVP-note (K2) parser for Långfristiga värdepapper.
 
@@ -23,32 +24,12 @@ def parse_lvp_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fla
       ack_nedskr_lang_vardepapper_ib, arets_nedskr_lang_vardepapper, ack_nedskr_lang_vardepapper_ub,
       red_varde_lang_vardepapper
     """
-    # Normalize whitespace and NBSP so numbers like "58 216 440,00" parse
-    sie_text = sie_text.replace("\u00A0", " ").replace("\t", " ")
-    lines = sie_text.splitlines()
+    # Tokenized SIE document (NBSP/thousand spaces in amounts handled by the tokenizer)
+    doc = SieDocument.coerce(sie_text)
 
-    # --- Parse SRU codes and account descriptions ---
-    sru_codes = {}
-    account_descriptions = {}
-    
-    sru_re = re.compile(r'^#SRU\s+(\d+)\s+(\d+)\s*$')
-    konto_re = re.compile(r'^#KONTO\s+(\d+)\s+"([^"]*)"')
-    
-    for raw in lines:
-        s = raw.strip()
-        # Parse SRU codes
-        m = sru_re.match(s)
-        if m:
-            account = int(m.group(1))
-            sru = int(m.group(2))
-            sru_codes[account] = sru
-        
-        # Parse account descriptions
-        m = konto_re.match(s)
-        if m:
-            account = int(m.group(1))
-            description = m.group(2)
-            account_descriptions[account] = description
+    # --- SRU codes and account descriptions ---
+    sru_codes = doc.sru_codes
+    account_descriptions = doc.account_names
 
     # --- CONFIG (K2 – långfristiga värdepapper) ---
     # Use original base logic - no SRU integration here for LVP
@@ -63,71 +44,12 @@ def parse_lvp_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fla
     def in_lvp_assets(acct: int) -> bool:
         return any(lo <= acct <= hi for lo, hi in ASSET_RANGES)
 
-    def _to_float(s: str) -> float:
-        # tolerant for "123 456,78" and "123,456.78"
-        return float(s.strip().replace(" ", "").replace(",", "."))
-
     def get_balance(kind_flag: str, accounts):
         """Sum #IB or #UB for the given account set/ranges (current year '0' rows)."""
-        total = 0.0
-        # allow thousand spaces; allow optional trailing text after number
-        bal_re = re.compile(rf'^#(?:{kind_flag})\s+0\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-        for raw in lines:
-            s = raw.strip()
-            m = bal_re.match(s)
-            if not m:
-                continue
-            acct = int(m.group(1))
-            amount = _to_float(m.group(2))
-            if isinstance(accounts, (set, frozenset)):
-                ok = acct in accounts
-            else:
-                ok = any(lo <= acct <= hi for lo, hi in accounts)
-            if ok:
-                total += amount
-        return total
-
-    # --- Parse vouchers ---
-    ver_header_re = re.compile(
-        r'^#VER\s+(\S+)\s+(\d+)\s+(\d{8})(?:\s+(?:"[^"]*"|.+))?\s*$'
-    )
-    # Accept only normal + supplementary transactions; ignore removed items
-    trans_re = re.compile(
-        r'^#(?:TRANS|RTRANS)\s+'          # <-- no BTRANS here
-        r'(\d{3,4})'                            
-        r'(?:\s+\{.*?\})?'                      
-        r'\s+(-?(?:\d{1,3}(?:[ \u00A0]?\d{3})*|\d+)(?:[.,]\d+)?)'  # amount only
-        r'(?:\s+\d{8})?'                        
-        r'(?:\s+".*?")?'                        
-        r'\s*$'
-    )
+        return doc.balance_sum(kind_flag, 0, accounts)
 
-    trans_by_ver = defaultdict(list)
-    current_ver = None
-    in_block = False
-
-    for raw in lines:
-        t = raw.strip()
-        mh = ver_header_re.match(t)
-        if mh:
-            current_ver = (mh.group(1), int(mh.group(2)))
-            continue
-        if t == "{":
-            in_block = True
-            continue
-        if t == "}":
-            in_block = False
-            current_ver = None
-            continue
-        # Ignore removed items explicitly (defensive)
-        if t.startswith('#BTRANS'):
-            continue
-        if in_block and current_ver:
-            mt = trans_re.match(t)
-            if mt:
-                acct = int(mt.group(1))
-                amt = _to_float(mt.group(2))
-                trans_by_ver[current_ver].append((acct, amt))
+    # --- Vouchers (#TRANS/#RTRANS only; removed #BTRANS rows are skipped) ---
+    trans_by_ver = doc.trans_by_ver()
 
     # --- IB balances ---
     lang_vardepapper_ib = get_balance('IB', ASSET_RANGES)
@@ -264,34 +186,18 @@ def parse_lvp_k2_from_sie_text(sie_text: str, debug: bool = False, two_files_fla
         #   - ACC_IMP_SET: accumulated impairment accounts (e.g., 1358, 1368, ...)
         # These are already built by your current-year logic.
 
-        def _get_balance_prev(lines, kind_flag: str, accounts) -> float:
+        def _get_balance_prev(kind_flag: str, accounts) -> float:
             """
             Sum #IB -1 or #UB -1 for the given accounts (set or ranges).
             kind_flag ∈ {"IB", "UB"}.
             """
-            if not accounts:
-                return 0.0
-            total = 0.0
-            bal_re_prev = re.compile(rf'^#(?:{kind_flag})\s+-1\s+(\d+)\s+(-?[0-9][0-9\s.,]*)(?:\s+.*)?$')
-            for raw in lines:
-                m = bal_re_prev.match(raw.strip())
-                if not m:
-                    continue
-                acct = int(m.group(1))
-                # Handle both sets and ranges like the original get_balance function
-                if isinstance(accounts, (set, frozenset)):
-                    ok = acct in accounts
-                else:
-                    ok = any(lo <= acct <= hi for lo, hi in accounts)
-                if ok:
-                    total += _to_float(m.group(2))
-            return total
+            return doc.balance_sum(kind_flag, -1, accounts)
 
         # --- Previous-year balances using SAME sets as current year ---
-        lang_vardepapper_ib_prev            = _get_balance_prev(lines, 'IB', ASSET_RANGES)
-        lang_vardepapper_ub_prev            = _get_balance_prev(lines, 'UB', ASSET_RANGES)
-        ack_nedskr_lang_vardepapper_ib_prev = _get_balance_prev(lines, 'IB', ACC_IMP_LVP)
-        ack_nedskr_lang_vardepapper_ub_prev = _get_balance_prev(lines, 'UB', ACC_IMP_LVP)
+        lang_vardepapper_ib_prev            = _get_balance_prev('IB', ASSET_RANGES)
+        lang_vardepapper_ub_prev            = _get_balance_prev('UB', ASSET_RANGES)
+        ack_nedskr_lang_vardepapper_ib_prev = _get_balance_prev('IB', ACC_IMP_LVP)
+        ack_nedskr_lang_vardepapper_ub_prev = _get_balance_prev('UB', ACC_IMP_LVP)
 
         # Prev-year redovisat värde = UB cost + UB accumulated impairments (impairments are negative)
         red_varde_lang_vardepapper_prev = (lang_vardepapper_ub_prev or 0.0) + (ack_nedskr_lang_vardepapper_ub_prev or 0.0)
@@ -692,10 +692,25 @@ def _merge_br_data(se_br: list, overlay: list) -> list:
             base[k] = dict(r)
     return list(base.values())
 
-def _add_footer(canvas_obj, doc, company_name: str, page_num: int, total_pages: int):
+def _page_number_form(page_num: int) -> str:
+    return f"footerPageNumber{page_num}"
+
+def _draw_page_number(canvas_obj, page_num: int, total_pages: int):
+    """Page number on the right (format: "X (Y)"), right-aligned at the margin"""
+    page_width, page_height = A4
+    footer_y = 68 - 20
+    canvas_obj.setFont('Roboto', 10)
+    canvas_obj.setFillColor(colors.black)
+    page_text = f"{page_num} ({total_pages})"
+    text_width = canvas_obj.stringWidth(page_text, 'Roboto', 10)
+    canvas_obj.drawString(page_width - 68 - text_width, footer_y, page_text)
+
+def _add_footer(canvas_obj, doc, company_name: str, page_num: int, total_pages: int = None):
     """
     Add footer to page with thin line, company name (left), and page number (right).
     Skip footer on page 1 (cover page).
+    Without total_pages the page number is drawn as the form _page_number_form(page_num),
+    which must be defined (by FooterCanvas.save) once the total is known.
     """
     # Skip footer on cover page (page 1)
     if page_num == 1:
@@ -724,9 +739,10 @@ def _add_footer(canvas_obj, doc, company_name: str, page_num: int, total_pages:
     canvas_obj.drawString(68, footer_y, company_name)
     
     # Page number on the right (format: "X (Y)")
-    page_text = f"{page_num} ({total_pages})"
-    text_width = canvas_obj.stringWidth(page_text, 'Roboto', 10)
-    canvas_obj.drawString(page_width - 68 - text_width, footer_y, page_text)
+    if total_pages is None:
+        canvas_obj.doForm(_page_number_form(page_num))
+    else:
+        _draw_page_number(canvas_obj, page_num, total_pages)
     
     canvas_obj.restoreState()
 
@@ -1448,28 +1464,31 @@ def generate_full_annual_report_pdf(company_data: Dict[str, Any]) -> bytes:
         _render_note_block(elems, block_name, block_title, note_number, visible_items, company_data, H1, P)
     
     # Build PDF with footer using canvasmaker approach
-    # Store total pages count
-    total_pages = [0]
-    
     class FooterCanvas(canvas.Canvas):
-        """Custom canvas that adds footer to each page"""
+        """
+        Custom canvas that adds the footer to each page as it is finished.
+        The "X (Y)" page numbers are forward-referenced forms, filled in at save()
+        when the total is known, so no page state is kept until then.
+        """
         def __init__(self, *args, **kwargs):
             canvas.Canvas.__init__(self, *args, **kwargs)
-            self._saved_page_states = []
+            self._page_count = 0
             
         def showPage(self):
-            self._saved_page_states.append(dict(self.__dict__))
-            self._startPage()
+            self._page_count += 1
+            _add_footer(self, doc, name, self._page_count)
+            canvas.Canvas.showPage(self)
             
         def save(self):
-            """Add footers to all pages and save"""
-            num_pages = len(self._saved_page_states)
-            total_pages[0] = num_pages
+            """Define the page number forms and save"""
+            if len(self._code):
+                self.showPage()
+            num_pages = self._page_count
             
-            for page_num, state in enumerate(self._saved_page_states, start=1):
-                self.__dict__.update(state)
-                _add_footer(self, doc, name, page_num, num_pages)
-                canvas.Canvas.showPage(self)
+            for page_num in range(2, num_pages + 1):  # no footer on the cover page
+                self.beginForm(_page_number_form(page_num))
+                _draw_page_number(self, page_num, num_pages)
+                self.endForm()
                 
             canvas.Canvas.save(self)
     
@@ -11,6 +11,7 @@ from reportlab.lib.enums import TA_LEFT, TA_CENTER
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 import os
+from .financial_statement import StatementRows
 
 # Register Roboto fonts
 FONT_DIR = os.path.join(os.path.dirname(__file__), '..', 'fonts')
@@ -39,13 +40,11 @@ def _rr_pick_num(item):
     return None
 
 def _rr_find(rr_items, var_name):
-    """Find value in RR items by variable name"""
+    """Find value in RR items (list or StatementRows) by variable name"""
     if not rr_items:
         return None
-    for it in rr_items:
-        if (it.get('variable_name') or '') == var_name:
-            return _rr_pick_num(it)
-    return None
+    it = StatementRows.coerce(rr_items).find(var_name)
+    return _rr_pick_num(it) if it is not None else None
 
 def _normalize_delta(x):
     """Normalize delta: treat < 1 SEK as 0, round to integer"""
@@ -120,7 +119,7 @@ def _styles():
 
 def _pick_originals_from_snapshot(company_data):
     """Extract originals from the immutable __original_rr_snapshot__"""
-    snap = (company_data or {}).get('__original_rr_snapshot__') or []
+    snap = StatementRows.coerce((company_data or {}).get('__original_rr_snapshot__') or [])
     orig_res = _rr_find(snap, 'SumAretsResultat')
     orig_tax = _rr_find(snap, 'SkattAretsResultat')
     return orig_res, orig_tax
@@ -151,8 +150,8 @@ def pick_originals(company_data: Dict[str, Any]) -> Tuple[Optional[float], Optio
     
     # 3) LAST resort (discouraged): current RR (may already be mutated)
     if orig_res is None or orig_tax is None:
-        rr = ((company_data.get('seFileData') or {}).get('rr_data')
-              or company_data.get('rrData') or [])
+        rr = StatementRows.coerce((company_data.get('seFileData') or {}).get('rr_data')
+                                  or company_data.get('rrData') or [])
         if orig_res is None:
             orig_res = _rr_find(rr, 'SumAretsResultat')
         if orig_tax is None:
@@ -7,6 +7,7 @@ import asyncio
 
 # Import the new database-driven parser
 from services.database_parser import DatabaseParser
+from services.sie_document import SieDocument
 
 # Note: Legacy imports from merged_rr_br_not removed since this module is not available
 # and ReportGenerator is currently disabled in favor of DatabaseParser
@@ -72,18 +73,19 @@ class ReportGenerator:
             # Read SE file content for the new parser
             with open(temp_se_path, 'r', encoding='utf-8') as f:
                 se_content = f.read()
+            sie_doc = SieDocument.parse(se_content)
             
             # Use the new database-driven parser
             print("🔄 Using new database-driven parser...")
             
             # Parse account balances using new parser
-            current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = self.database_parser.parse_account_balances(se_content)
+            current_accounts, previous_accounts, current_ib_accounts, previous_ib_accounts = self.database_parser.parse_account_balances(sie_doc)
             print(f"📊 Parsed {len(current_accounts)} current year accounts, {len(previous_accounts)} previous year accounts")
             
             # Parse RR and BR data using new parser
-            rr_data = self.database_parser.parse_rr_data(current_accounts, previous_accounts, sie_text=se_content)
+            rr_data = self.database_parser.parse_rr_data(current_accounts, previous_accounts, sie_text=sie_doc)
             # Use koncern-aware BR parsing for automatic reconciliation with K2 notes
-            br_data = self.database_parser.parse_br_data_with_koncern(se_content, current_accounts, previous_accounts, rr_data)
+            br_data = self.database_parser.parse_br_data_with_koncern(sie_doc, current_accounts, previous_accounts, rr_data)
             
             # Parse INK2 data (tax calculations)
             ink2_data = self.database_parser.parse_ink2_data(
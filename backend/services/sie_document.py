@@ -0,0 +1,337 @@
+"""
+SIE Document Module
+Single-pass tokenizer for SIE 4 files producing a shared, indexed document model.
+
+All SIE consumers (DatabaseParser, FB module, K2 note parsers and the BR
+reclassification steps) read from the same SieDocument instead of re-splitting
+and re-scanning the raw text with their own regexes.
+
+Usage:
+    doc = SieDocument.parse(sie_text)
+    doc.balances('UB', 0)                     # {'1930': 12500.0, ...}
+    doc.balance_sum('IB', 0, {1110, 1119})    # summed IB for current year
+    doc.trans_by_ver()                        # {(series, number): [(acct, amt), ...]}
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# One SIE field: quoted string (with \" escapes), object list {...} or bare token
+_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|(\{[^}]*\})|(\S+)')
+_LEAD_GROUP_RE = re.compile(r'^-?\d{1,3}$')
+_THOUSAND_GROUP_RE = re.compile(r'^\d{3}(?:[.,]\d+)?$')
+_DATE_RE = re.compile(r'^\d{8}$')
+
+BALANCE_KINDS = ('IB', 'UB', 'RES')
+TRANS_KINDS = ('TRANS', 'RTRANS', 'BTRANS')
+
+
+@dataclass(slots=True)
+class SieTransaction:
+    kind: str          # 'TRANS', 'RTRANS' or 'BTRANS'
+    account: int
+    amount: float
+    text: str = ""
+
+
+@dataclass(slots=True)
+class SieVoucher:
+    series: str
+    number: Union[int, str]
+    date: str
+    text: str = ""
+    transactions: List[SieTransaction] = field(default_factory=list)
+
+    @property
+    def key(self) -> Tuple[str, Union[int, str]]:
+        return (self.series, self.number)
+
+
+def _tokenize(line: str) -> List[str]:
+    """Split a SIE line into fields, unquoting strings and keeping {...} intact."""
+    tokens = []
+    for quoted, obj, bare in _TOKEN_RE.findall(line):
+        if bare:
+            tokens.append(bare)
+        elif obj:
+            tokens.append(obj)
+        else:
+            tokens.append(quoted.replace('\\"', '"'))
+    return tokens
+
+
+def _parse_amount(tokens: List[str], start: int) -> Tuple[Optional[float], int]:
+    """
+    Parse an amount starting at tokens[start], the way the K2 note parsers match it.
+    Tolerates thousand separators ("-58 216 440,00") and decimal comma; a following
+    3-digit field (e.g. a quantity) is merged too, so fixed fields use _field_amount.
+    Returns (amount, index of next unconsumed token); amount is None if unparsable.
+    """
+    if start >= len(tokens):
+        return None, start
+    raw = tokens[start]
+    i = start + 1
+    if _LEAD_GROUP_RE.match(raw):
+        while i < len(tokens) and _THOUSAND_GROUP_RE.match(tokens[i]):
+            raw += tokens[i]
+            i += 1
+    try:
+        return float(raw.replace(',', '.')), i
+    except ValueError:
+        return None, i
+
+
+def _field_amount(token: str) -> Optional[float]:
+    """Amount in its own SIE field (decimal comma tolerated); None if unparsable."""
+    try:
+        return float(token.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _as_int(value: str) -> Union[int, str]:
+    return int(value) if value.isdigit() else value
+
+
+class SieDocument:
+    """Parsed SIE file: header fields, balances, account names, SRU codes and vouchers."""
+
+    def __init__(self):
+        # Header fields (last occurrence wins, like the old line scanners)
+        self.format: Optional[str] = None
+        self.program: Optional[str] = None           # raw text after #PROGRAM
+        self.company_name: Optional[str] = None
+        self.organization_number: Optional[str] = None
+        self.fiscal_years: Dict[int, Tuple[str, str]] = {}   # {0: ('20240101', '20241231'), -1: (...)}
+
+        # Balances: {kind: {year_index: {account_str: amount}}}, read by field position
+        # (later lines for the same account win)
+        self.balances_by_kind: Dict[str, Dict[int, Dict[str, float]]] = {k: {} for k in BALANCE_KINDS}
+        # Legacy "#VER <konto> <belopp>" balance lines (pre-SIE4 exports)
+        self.legacy_balances: Dict[str, float] = {}
+
+        self.account_names: Dict[int, str] = {}
+        self.sru_codes: Dict[int, int] = {}
+
+        self.vouchers: List[SieVoucher] = []
+        self.vouchers_by_account: Dict[int, List[int]] = {}
+
+        # sha1 of the raw lines; identifies the file content across document instances
+        self.content_hash: Optional[str] = None
+        # Per-document memo for derived results (e.g. K2 note parsers). Keys include the
+        # content hash, so the memo stays valid when a cached document is reused.
+        self.derived: Dict[Tuple[Any, ...], Any] = {}
+
+        # Balances as the K2 note parsers read them: {(kind, year_index): {account: amount}},
+        # amounts with thousand groups merged ("-58 216 440,00") and repeated lines summed
+        self._int_balances: Dict[Tuple[str, int], Dict[int, float]] = {}
+        self._trans_by_ver_cache: Dict[Tuple[str, ...], Dict[Tuple[str, Any], List[Tuple[int, float]]]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Pickled for the K2 note workers: the voucher index cache is rebuilt on demand
+        # (cheaper than unpickling it) and the derived memo stays with this instance
+        state = self.__dict__.copy()
+        state['derived'] = {}
+        state['_trans_by_ver_cache'] = {}
+        return state
+
+    # ------------------------------------------------------------------ #
+    # Construction
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def parse(cls, sie_text: str) -> "SieDocument":
+        return cls.from_lines(sie_text.splitlines())
+
+    @classmethod
+    def from_lines(cls, lines: Iterable[str]) -> "SieDocument":
+        """Build the document in a single pass over the SIE lines."""
+        doc = cls()
+        current: Optional[SieVoucher] = None
+        in_block = False
+        digest = hashlib.sha1()
+
+        for raw in lines:
+            digest.update(raw.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\n')
+            line = raw.replace("\u00A0", " ").replace("\t", " ").strip()
+            if not line:
+                continue
+            if line == "{":
+                in_block = True
+                if current is not None:
+                    doc.vouchers.append(current)
+                continue
+            if line == "}":
+                in_block = False
+                current = None
+                continue
+            if line[0] != '#':
+                continue
+
+            label, _, rest = line.partition(' ')
+            label = label.upper()
+
+            if label[1:] in TRANS_KINDS:
+                if in_block and current is not None:
+                    doc._add_transaction(current, label[1:], _tokenize(rest))
+                continue
+
+            if label in ('#UB', '#IB', '#RES'):
+                tokens = _tokenize(rest)
+                if len(tokens) >= 3:
+                    try:
+                        year = int(tokens[0])
+                    except ValueError:
+                        continue
+                    # #UB <årsnr> <konto> <saldo> [kvantitet]
+                    amount = _field_amount(tokens[2])
+                    if amount is not None:
+                        doc.balances_by_kind[label[1:]].setdefault(year, {})[tokens[1]] = amount
+                    if tokens[1].isdigit():
+                        total, _ = _parse_amount(tokens, 2)
+                        if total is not None:
+                            by_acct = doc._int_balances.setdefault((label[1:], year), {})
+                            acct = int(tokens[1])
+                            by_acct[acct] = by_acct.get(acct, 0.0) + total
+                continue
+
+            if label == '#VER':
+                tokens = _tokenize(rest)
+                if len(tokens) >= 3:
+                    current = SieVoucher(
+                        series=tokens[0],
+                        number=_as_int(tokens[1]),
+                        date=tokens[2],
+                        text=tokens[3] if len(tokens) > 3 else "",
+                    )
+                elif len(tokens) == 2:
+                    # Legacy balance format: #VER <konto> <belopp>
+                    amount = _field_amount(tokens[1])
+                    if amount is not None:
+                        doc.legacy_balances[tokens[0]] = amount
+                continue
+
+            if label == '#KONTO':
+                tokens = _tokenize(rest)
+                if len(tokens) >= 2 and tokens[0].isdigit():
+                    doc.account_names[int(tokens[0])] = tokens[1]
+            elif label == '#SRU':
+                tokens = _tokenize(rest)
+                if len(tokens) >= 2 and tokens[0].isdigit() and tokens[1].isdigit():
+                    doc.sru_codes[int(tokens[0])] = int(tokens[1])
+            elif label == '#FNAMN':
+                tokens = _tokenize(rest)
+                if tokens:
+                    doc.company_name = tokens[0]
+            elif label == '#ORGNR':
+                tokens = _tokenize(rest)
+                if tokens:
+                    doc.organization_number = tokens[0]
+            elif label == '#RAR':
+                tokens = _tokenize(rest)
+                if len(tokens) >= 3:
+                    try:
+                        doc.fiscal_years[int(tokens[0])] = (tokens[1], tokens[2])
+                    except ValueError:
+                        pass
+            elif label == '#PROGRAM':
+                if rest.strip():
+                    doc.program = rest.strip()
+            elif label == '#FORMAT':
+                tokens = _tokenize(rest)
+                if tokens:
+                    doc.format = tokens[0]
+
+        doc.content_hash = digest.hexdigest()
+        return doc
+
+    def _add_transaction(self, voucher: SieVoucher, kind: str, tokens: List[str]) -> None:
+        # #TRANS <konto> [{objekt}] <belopp> [transdat] [transtext] [kvantitet] [sign]
+        if not tokens or not tokens[0].isdigit():
+            return
+        account = int(tokens[0])
+        i = 1
+        if i < len(tokens) and tokens[i].startswith('{'):
+            i += 1
+        amount, i = _parse_amount(tokens, i)
+        if amount is None:
+            return
+        if i < len(tokens) and (tokens[i] == "" or _DATE_RE.match(tokens[i])):
+            i += 1
+        text = tokens[i] if i < len(tokens) else ""
+
+        voucher.transactions.append(SieTransaction(kind, account, amount, text))
+        idx = len(self.vouchers) - 1
+        refs = self.vouchers_by_account.setdefault(account, [])
+        if not refs or refs[-1] != idx:
+            refs.append(idx)
+
+    @staticmethod
+    def coerce(source: Union[str, "SieDocument", None]) -> Optional["SieDocument"]:
+        """Accept either raw SIE text or an already parsed document."""
+        if source is None or isinstance(source, SieDocument):
+            return source
+        return SieDocument.parse(source)
+
+    # ------------------------------------------------------------------ #
+    # Balances
+    # ------------------------------------------------------------------ #
+    def balances(self, kind: str, year: int) -> Dict[str, float]:
+        """Account balances for #IB/#UB/#RES and year index (0 = current, -1 = previous)."""
+        return self.balances_by_kind[kind].get(year, {})
+
+    def _balances_by_int(self, kind: str, year: int) -> Dict[int, float]:
+        return self._int_balances.get((kind, year), {})
+
+    def balance_sum(self, kind: str, year: int, accounts) -> float:
+        """
+        Sum balances for accounts given as a set, a single int or (lo, hi) ranges,
+        the way the K2 note parsers read them (thousand groups merged, repeated
+        lines summed). Returns 0.0 for empty/None account specs.
+        """
+        by_acct = self._balances_by_int(kind, year)
+        if isinstance(accounts, int):
+            return by_acct.get(accounts, 0.0)
+        if not accounts:
+            return 0.0
+        if isinstance(accounts, (set, frozenset)):
+            return sum(amt for acct, amt in by_acct.items() if acct in accounts)
+        ranges = list(accounts)
+        return sum(amt for acct, amt in by_acct.items() if any(lo <= acct <= hi for lo, hi in ranges))
+
+    def has_balance(self, kind: str, year: int, account: int) -> bool:
+        return account in self._balances_by_int(kind, year)
+
+    # ------------------------------------------------------------------ #
+    # Vouchers
+    # ------------------------------------------------------------------ #
+    def trans_by_ver(self, include_btrans: bool = False) -> Dict[Tuple[str, Any], List[Tuple[int, float]]]:
+        """
+        Transactions grouped per voucher key as (account, amount) tuples.
+        Removed rows (#BTRANS) are skipped unless include_btrans is set.
+        Vouchers without matching transactions are left out. The result is
+        cached on the document and shared between parsers - treat it as read-only.
+        """
+        kinds = TRANS_KINDS if include_btrans else ('TRANS', 'RTRANS')
+        cached = self._trans_by_ver_cache.get(kinds)
+        if cached is None:
+            cached = {}
+            for ver in self.vouchers:
+                txs = [(t.account, t.amount) for t in ver.transactions if t.kind in kinds]
+                if txs:
+                    cached.setdefault(ver.key, []).extend(txs)
+            self._trans_by_ver_cache[kinds] = cached
+        return cached
+
+    def voucher_texts(self) -> Dict[Tuple[str, Any], str]:
+        """Raw voucher titles per voucher key."""
+        return {ver.key: ver.text for ver in self.vouchers}
+
+    def vouchers_for_accounts(self, accounts) -> List[SieVoucher]:
+        """Vouchers touching any of the given accounts, in file order."""
+        indices = set()
+        for acct in accounts:
+            indices.update(self.vouchers_by_account.get(acct, ()))
+        return [self.vouchers[i] for i in sorted(indices)]
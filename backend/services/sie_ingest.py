@@ -0,0 +1,180 @@
+"""
+SIE Ingest Module
+Decodes an uploaded SIE file straight from the upload stream into a SieDocument.
+
+The encoding is taken from the #FORMAT header (PC8 -> cp437, UTF8 -> utf-8,
+otherwise iso-8859-1). The file is then decoded, NFKC-normalized and
+tokenized line by line in one pass, so there is no temp-file copy and no
+full-file string goes through read/normalize/replace. If the detected
+encoding hits a decode error, the stream is rewound and the next fallback
+encoding is tried, the same order the upload endpoints used before.
+
+The normalized text is still assembled once, because it is returned to the
+client (sie_content_current) and stored with the annual report.
+
+Both upload endpoints go through read_sie_uploads: the files of a two-file
+upload are decoded concurrently, and parsed files are kept in a small LRU
+keyed by the sha1 of the raw bytes, so re-uploading a file (typically last
+year's file as the previous year of a two-file upload) skips the parse.
+Cached documents are shared between requests and must be treated as read-only.
+
+Usage:
+    doc, sie_text = read_sie_upload(upload_file.file)
+    (current_doc, current_text), (previous_doc, previous_text) = read_sie_uploads(f1.file, f2.file)
+"""
+
+import codecs
+import hashlib
+import io
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from .sie_document import SieDocument
+
+SIE_DECODE_WORKERS = max(1, int(os.getenv("SIE_DECODE_WORKERS", "2")))
+SIE_PARSE_CACHE_ENTRIES = max(0, int(os.getenv("SIE_PARSE_CACHE_ENTRIES", "8")))
+# Limit on the raw size of cached files; the parsed document takes several times that
+SIE_PARSE_CACHE_MAX_BYTES = int(os.getenv("SIE_PARSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+FALLBACK_ENCODINGS = ('cp437', 'iso-8859-1', 'windows-1252', 'utf-8', 'cp1252')
+
+# Bytes read to find the #FORMAT header
+_HEAD_BYTES = 200
+
+
+class SieDecodeError(ValueError):
+    """Raised when the upload can't be decoded with any of the tried encodings."""
+
+    def __init__(self, message: str, index: int = 0):
+        super().__init__(message)
+        self.index = index  # position of the failing stream in read_sie_uploads
+
+
+def detect_sie_encoding(head: bytes) -> str:
+    """Detect SIE file encoding based on the FORMAT header in the first bytes"""
+    text = head.decode('latin-1', errors='ignore')
+    if "#FORMAT PC8" in text:
+        return "cp437"  # IBM CP437 for PC8
+    if "#FORMAT UTF8" in text:
+        return "utf-8"
+    return "iso-8859-1"  # Default for older SIE files
+
+
+def normalize_sie_line(line: str) -> str:
+    """Same normalization the upload endpoints applied to the whole file, per line"""
+    return unicodedata.normalize("NFKC", line).replace("\u00A0", " ").replace("\u200B", "")
+
+
+def _decoded_lines(stream: BinaryIO, encoding: str, out: io.StringIO) -> Iterator[str]:
+    """
+    Yield SIE lines (as str.splitlines would split the normalized text) and
+    append the normalized text with universal newlines to out.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending_cr = False
+    for raw in stream:
+        text = decoder.decode(raw)
+        if not text:
+            continue
+        # Universal newlines, like reading in text mode: \r\n and \r become \n
+        if pending_cr and text.startswith("\n"):
+            text = text[1:]
+        pending_cr = text.endswith("\r")
+        text = normalize_sie_line(text.replace("\r\n", "\n").replace("\r", "\n"))
+        out.write(text)
+        yield from text.splitlines()
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        if pending_cr and tail.startswith("\n"):
+            tail = tail[1:]
+        tail = normalize_sie_line(tail.replace("\r\n", "\n").replace("\r", "\n"))
+        out.write(tail)
+        yield from tail.splitlines()
+
+
+def read_sie_upload(stream: BinaryIO, encodings: Optional[List[str]] = None) -> Tuple[SieDocument, str]:
+    """
+    Decode a binary SIE stream (e.g. UploadFile.file) into a SieDocument and
+    the normalized SIE text. The stream must be seekable.
+    """
+    stream.seek(0)
+    detected = detect_sie_encoding(stream.read(_HEAD_BYTES))
+    tried = []
+    for encoding in encodings or (detected,) + FALLBACK_ENCODINGS:
+        if encoding in tried:
+            continue
+        tried.append(encoding)
+        stream.seek(0)
+        out = io.StringIO()
+        try:
+            doc = SieDocument.from_lines(_decoded_lines(stream, encoding, out))
+        except UnicodeDecodeError:
+            continue
+        text = out.getvalue()
+        out.close()
+        return doc, text
+    raise SieDecodeError("Kunde inte läsa SE-filen med någon av de försökta kodningarna")
+
+
+# Parsed uploads by sha1 of the raw bytes: {digest: (doc, text, size)}
+_parse_cache: "OrderedDict[str, Tuple[SieDocument, str, int]]" = OrderedDict()
+_parse_cache_bytes = 0
+_parse_cache_lock = threading.Lock()
+_decode_executor = ThreadPoolExecutor(max_workers=SIE_DECODE_WORKERS, thread_name_prefix="sie-decode")
+
+
+def _stream_digest(stream: BinaryIO, chunk_size: int = 1 << 20) -> Tuple[str, int]:
+    digest = hashlib.sha1()
+    size = 0
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(chunk_size), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def read_sie_upload_cached(stream: BinaryIO) -> Tuple[SieDocument, str]:
+    """read_sie_upload with the parse LRU (keyed by the raw bytes)."""
+    global _parse_cache_bytes
+    key, size = _stream_digest(stream)
+    with _parse_cache_lock:
+        hit = _parse_cache.get(key)
+        if hit is not None:
+            _parse_cache.move_to_end(key)
+            return hit[0], hit[1]
+
+    doc, text = read_sie_upload(stream)
+
+    if SIE_PARSE_CACHE_ENTRIES and size <= SIE_PARSE_CACHE_MAX_BYTES:
+        with _parse_cache_lock:
+            if key not in _parse_cache:
+                _parse_cache[key] = (doc, text, size)
+                _parse_cache_bytes += size
+            while (len(_parse_cache) > SIE_PARSE_CACHE_ENTRIES
+                   or _parse_cache_bytes > SIE_PARSE_CACHE_MAX_BYTES):
+                _, (_, _, evicted_size) = _parse_cache.popitem(last=False)
+                _parse_cache_bytes -= evicted_size
+    return doc, text
+
+
+def read_sie_uploads(*streams: BinaryIO) -> List[Tuple[SieDocument, str]]:
+    """
+    Decode several SIE uploads concurrently (first one on the calling thread).
+    Raises SieDecodeError with .index set to the stream that couldn't be decoded.
+    """
+    futures = [_decode_executor.submit(read_sie_upload_cached, stream) for stream in streams[1:]]
+    results: List[Optional[Tuple[SieDocument, str]]] = []
+    errors: List[SieDecodeError] = []
+    for index, stream in enumerate(streams):
+        try:
+            results.append(read_sie_upload_cached(stream) if index == 0 else futures[index - 1].result())
+        except SieDecodeError as e:
+            errors.append(SieDecodeError(str(e), index))
+            results.append(None)
+    if errors:
+        raise errors[0]
+    return results
@@ -15,7 +15,8 @@ Required data in company_data (same as your PDF filler uses):
 - company_data.ink2Data (list of row dicts)       # live INK2 rows
 - company_data.seFileData.ink2_data / rr_data / br_data (fallbacks)
 
-Mapping source (SRU and variable_map per row):
+Mapping source (SRU and variable_map per row), compiled by ink2_form_plan:
+- the mapping snapshot (ink2_form, cached per mapping version), OR
 - Supabase table `ink2_form`, OR
 - Local CSV fallback: "ink2_form_rows (1).csv" (in backend/services/ or frontend/public/)
 """
@@ -27,6 +28,8 @@ from dataclasses import dataclass
 import io
 import zipfile
 
+from .ink2_form_plan import Ink2FormPlan, compile_sru_terms, get_ink2_form_plan, normalize_key
+
 # ---------- Optional: Supabase client (only if env is configured) ----------
 def get_supabase_client():
     """Get Supabase client if environment variables are set"""
@@ -90,9 +93,6 @@ def parse_number(x: Any) -> Optional[float]:
     except Exception:
         return None
 
-def normalize_key(x: str) -> str:
-    return re.sub(r"[^a-z0-9]+", "", (x or "").lower())
-
 def build_index_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
     idx: Dict[str, Dict[str, Any]] = {}
     for row in rows or []:
@@ -101,8 +101,8 @@ def build_index_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any
                 idx[normalize_key(str(row[key]))] = row
     return idx
 
-def lookup_amount(idx: Dict[str, Dict[str, Any]], name: str) -> Optional[float]:
-    row = idx.get(normalize_key(name))
+def lookup_amount(idx: Dict[str, Dict[str, Any]], name: str, key: Optional[str] = None) -> Optional[float]:
+    row = idx.get(normalize_key(name) if key is None else key)
     if not row:
         return None
     # common numeric fields used across your data
@@ -164,6 +164,16 @@ def fetch_ink2_form_mappings() -> List[Dict[str, Any]]:
     except Exception:
         return read_local_mapping_csv()
 
+def load_ink2_form_plan() -> Ink2FormPlan:
+    """Compiled ink2_form plan of the mapping snapshot; Supabase/CSV fetch if the snapshot has none."""
+    try:
+        plan = get_ink2_form_plan()
+        if plan.fields:
+            return plan
+    except Exception:
+        pass
+    return Ink2FormPlan(fetch_ink2_form_mappings())
+
 # ---------- Variable resolver (aligned with your PDF logic) ----------------
 @dataclass
 class ResolverContext:
@@ -175,29 +185,33 @@ class ResolverContext:
 class VarResolver:
     def __init__(self, ctx: ResolverContext):
         self.accepted = ctx.accepted or {}
+        # normalized key -> first parseable accepted manual value
+        self.accepted_idx: Dict[str, float] = {}
+        for kk, vv in self.accepted.items():
+            val = parse_number(vv)
+            if val is not None:
+                self.accepted_idx.setdefault(normalize_key(kk), val)
         self.ink2_idx = build_index_from_rows(ctx.ink2_rows or [])
         self.rr_idx   = build_index_from_rows(ctx.rr_rows or [])
         self.br_idx   = build_index_from_rows(ctx.br_rows or [])
 
     def _resolve_token(self, tok: str) -> Optional[float]:
         t = re.sub(r"\s*\(IF[<>]=?0\)$", "", tok.strip(), flags=re.I)
-        k = normalize_key(t)
+        return self._resolve_key(t, normalize_key(t))
 
+    def _resolve_key(self, t: str, k: str) -> Optional[float]:
         # 1) accepted manuals (by variable_name)
-        for kk, vv in self.accepted.items():
-            if normalize_key(kk) == k:
-                val = parse_number(vv)
-                if val is not None:
-                    return val
+        if k in self.accepted_idx:
+            return self.accepted_idx[k]
 
         # 2) INK2 rows (live first)
-        v = lookup_amount(self.ink2_idx, t)
+        v = lookup_amount(self.ink2_idx, t, k)
         if v is not None: return v
 
         # 3) RR, BR fallbacks
-        v = lookup_amount(self.rr_idx, t)
+        v = lookup_amount(self.rr_idx, t, k)
         if v is not None: return v
-        v = lookup_amount(self.br_idx, t)
+        v = lookup_amount(self.br_idx, t, k)
         if v is not None: return v
 
         # 4) literal numbers allowed in expressions
@@ -206,20 +220,18 @@ class VarResolver:
 
     def get(self, expr: str) -> Optional[float]:
         """Support 'A + B + C' and trailing guards '(IF>0)' / '(IF<0)'."""
-        if not expr or str(expr).lower() == "nan":
-            return None
+        terms, cond = compile_sru_terms(expr)
+        return self.evaluate(terms, cond)
 
-        s = str(expr).strip()
-        cond: Optional[str] = None
-        m = re.search(r"\(IF([<>]=?0|[<>]0)\)$", s, re.I)
-        if m:
-            cond = m.group(1).replace("=", "")
-            s = re.sub(r"\s*\(IF[<>]=?0\)$|\s*\(IF[<>]0\)$", "", s).strip()
+    def evaluate(self, terms, cond: Optional[str] = None) -> Optional[float]:
+        """Value of pre-parsed (token, key) terms, see ink2_form_plan.compile_sru_terms."""
+        if terms is None:
+            return None
 
         total = 0.0
         found = False
-        for part in [p.strip() for p in s.split("+")]:
-            val = self._resolve_token(part)
+        for t, k in terms:
+            val = self._resolve_key(t, k)
             if val is None:
                 continue
             total += float(val)
@@ -288,13 +300,6 @@ def _choose_rows(company_data: Dict[str, Any]) -> ResolverContext:
     br_rows = company_data.get("brData") or company_data.get("br_data") or (company_data.get("seFileData") or {}).get("br_data") or []
     return ResolverContext(accepted, ink2_rows, rr_rows, br_rows)
 
-def _is_numeric_sru(x: Any) -> bool:
-    try:
-        int(x)
-        return True
-    except Exception:
-        return False
-
 def build_sru_text(company_data: Dict[str, Any], mappings: Optional[List[Dict[str, Any]]] = None) -> str:
     """Return full SRU content as a string."""
     # identity/system
@@ -310,14 +315,9 @@ def build_sru_text(company_data: Dict[str, Any], mappings: Optional[List[Dict[st
     
     resolver = VarResolver(ctx)
 
-    # mapping rows (SRU + variable_map + form_field)
-    rows = mappings if mappings is not None else fetch_ink2_form_mappings()
-    # keep numeric SRU only
-    rows = [r for r in rows if _is_numeric_sru(r.get("sru"))]
-    
-    # Sort by Id column (form order) instead of SRU number
-    # This maintains the order as they appear in the INK2 form top-to-bottom
-    rows.sort(key=lambda r: int(r.get('Id') or r.get('id') or 0))
+    # compiled mapping rows (SRU + variable_map + form_field), numeric SRU only,
+    # sorted by Id column (form order as they appear top-to-bottom) instead of SRU number
+    plan = Ink2FormPlan(mappings) if mappings is not None else load_ink2_form_plan()
 
     lines_r: List[str] = []
     lines_s: List[str] = []
@@ -341,20 +341,13 @@ def build_sru_text(company_data: Dict[str, Any], mappings: Optional[List[Dict[st
             # Regular numeric fields - use absolute value (no negatives in SRU)
             dst.append(f"#UPPGIFT {int(sru_code)} {int(round(abs(v)))}")
 
-    for r in rows:
-        sru = int(r["sru"])
-        # 7011/7012 handled explicitly below on both forms
-        if sru in (7011, 7012):
-            continue
-
-        form_field = str(r.get("form_field") or "")
-        vmap = r.get("variable_map")
-        value = resolver.get(str(vmap)) if vmap is not None else None
+    # 7011/7012 (handled explicitly below on both forms) are not in plan.sru_fields
+    for field in plan.sru_fields:
+        value = resolver.evaluate(field.sru_terms, field.sru_cond)
 
         # Simple partition rule: everything under section "4." → INK2S
-        target = "S" if form_field.strip().startswith("4.") else "R"
         if value is not None:
-            add_upgift(lines_s if target == "S" else lines_r, sru, value)
+            add_upgift(lines_s if field.sru_form == "S" else lines_r, field.sru, value)
 
     # Lines are already in form order (sorted by Id column), no need to re-sort
 
@@ -413,14 +406,20 @@ def write_sru(company_data: Dict[str, Any], out_path: str = "BLANKETTER.SRU",
         f.write(text)
     return out_path
 
+def build_sru_files(company_data: Dict[str, Any], sru_filename: str = "BLANKETTER.SRU") -> Dict[str, bytes]:
+    """Main SRU file and the INFO.SRU referring to it, as {filename: bytes} (ZIP entry order)."""
+    sru_text = build_sru_text(company_data)
+    info_text = build_info_sru_text(company_data, sru_filename)
+    return {
+        sru_filename: sru_text.encode('utf-8'),
+        'INFO.SRU': info_text.encode('utf-8'),
+    }
+
 def generate_sru_file(company_data: Dict[str, Any]) -> bytes:
     """
     Generate SRU files (main SRU + INFO.SRU) and return as ZIP archive bytes.
     Returns a ZIP file containing both BLANKETTER.SRU and INFO.SRU.
     """
-    # Generate main SRU file content
-    sru_text = build_sru_text(company_data)
-    
     # Extract name for filename
     name = (company_data.get('company_name') 
             or company_data.get('companyName')
@@ -437,16 +436,14 @@ def generate_sru_file(company_data: Dict[str, Any]) -> bytes:
     name_clean = re.sub(r'[^\w\s-]', '', name).strip().replace(' ', '_')
     sru_filename = f'INK2_{name_clean}_{fiscal_year}.sru'
     
-    # Generate INFO.SRU content
-    info_text = build_info_sru_text(company_data, sru_filename)
+    # Generate main SRU + INFO.SRU content
+    files = build_sru_files(company_data, sru_filename)
     
     # Create ZIP file in memory
     zip_buffer = io.BytesIO()
     with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        # Add main SRU file
-        zip_file.writestr(sru_filename, sru_text.encode('utf-8'))
-        # Add INFO.SRU file
-        zip_file.writestr('INFO.SRU', info_text.encode('utf-8'))
+        for filename, data in files.items():
+            zip_file.writestr(filename, data)
     
     zip_buffer.seek(0)
     return zip_buffer.getvalue()
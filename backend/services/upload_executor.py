@@ -0,0 +1,68 @@
+"""
+Upload Executor
+Runs the heavy upload stages (SIE decoding, DatabaseParser, synchronous
+supabase-py calls and blocking scrapes) on a bounded thread pool so the
+event loop keeps serving other requests while an upload is processed.
+
+Concurrency is limited by UPLOAD_WORKERS. Up to UPLOAD_MAX_QUEUE further
+uploads wait for a free worker; beyond that new uploads are rejected with
+UploadQueueFull so a burst can't pile up unbounded work.
+
+Usage:
+    result = await run_upload_stage(process_upload, file)
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+UPLOAD_WORKERS = max(1, int(os.getenv("UPLOAD_WORKERS", "2")))
+UPLOAD_MAX_QUEUE = max(0, int(os.getenv("UPLOAD_MAX_QUEUE", "20")))
+
+_executor = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix="upload")
+_lock = threading.Lock()
+_admitted = 0   # running + queued
+_running = 0
+
+
+class UploadQueueFull(Exception):
+    """Raised when all upload workers are busy and the wait queue is full."""
+
+
+def _run_tracked(func: Callable[..., Any]) -> Any:
+    global _running
+    with _lock:
+        _running += 1
+    try:
+        return func()
+    finally:
+        with _lock:
+            _running -= 1
+
+
+async def run_upload_stage(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking upload stage on the upload pool and await its result."""
+    global _admitted
+    with _lock:
+        if _admitted >= UPLOAD_WORKERS + UPLOAD_MAX_QUEUE:
+            raise UploadQueueFull(f"{_running} uploads running, {_admitted - _running} queued")
+        _admitted += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, _run_tracked, partial(func, *args, **kwargs))
+    finally:
+        with _lock:
+            _admitted -= 1
+
+
+def upload_queue_status() -> Dict[str, int]:
+    with _lock:
+        return {
+            "running": _running,
+            "queued": max(0, _admitted - _running),
+            "workers": UPLOAD_WORKERS,
+            "max_queue": UPLOAD_MAX_QUEUE,
+        }
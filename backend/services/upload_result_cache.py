@@ -0,0 +1,68 @@
+"""
+Upload Result Cache
+Bounded LRU of finished upload results (rr_data, br_data, ink2_data, noter_data,
+fb_table, ...) keyed by the normalized SIE content and the mapping version.
+
+Users often re-upload the same file after going back in the wizard; with the
+same SIE content (SieDocument.content_hash) and unchanged mapping tables the
+pipeline would produce the same result, so it is served from here instead.
+A mapping change gives a new mapping_version() and therefore a cache miss.
+
+Results are deep-copied on the way in and out, so callers can mutate what
+they get back.
+
+Usage:
+    key = upload_result_key('single', sie_doc.content_hash)
+    result = get_upload_result(key)
+    if result is None:
+        result = run_pipeline(...)
+        store_upload_result(key, result)
+"""
+
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .database_parser import mapping_version
+
+UPLOAD_RESULT_CACHE_ENTRIES = max(0, int(os.getenv("UPLOAD_RESULT_CACHE_ENTRIES", "16")))
+
+_cache: "OrderedDict[Tuple[Any, ...], Dict[str, Any]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def upload_result_key(kind: str, *content_hashes: Optional[str]) -> Optional[Tuple[Any, ...]]:
+    """Cache key for an upload of kind ('single'/'two') with these SIE content hashes, or None if uncacheable."""
+    version = mapping_version()
+    if not UPLOAD_RESULT_CACHE_ENTRIES or version == 'unavailable' or not all(content_hashes):
+        return None
+    return (kind, version) + content_hashes
+
+
+def get_upload_result(key: Optional[Tuple[Any, ...]]) -> Optional[Dict[str, Any]]:
+    if key is None:
+        return None
+    with _lock:
+        result = _cache.get(key)
+        if result is None:
+            return None
+        _cache.move_to_end(key)
+    return copy.deepcopy(result)
+
+
+def store_upload_result(key: Optional[Tuple[Any, ...]], result: Dict[str, Any]) -> None:
+    if key is None:
+        return
+    snapshot = copy.deepcopy(result)
+    with _lock:
+        _cache[key] = snapshot
+        _cache.move_to_end(key)
+        while len(_cache) > UPLOAD_RESULT_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+
+
+def clear_upload_results() -> None:
+    with _lock:
+        _cache.clear()
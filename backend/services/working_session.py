@@ -0,0 +1,134 @@
+"""
+Working Session Store
+Server-side copy of a client's companyData, keyed by a session id.
+
+The frontend used to post the whole companyData (seFileData with the raw SIE
+text, account maps, every RR/BR/noter row) to each generator endpoint. With a
+working session the model is uploaded once (or created by the upload
+endpoints) and later requests send {"sessionId": ...} plus, optionally, a
+partial companyData; edits are sent as JSON merge patches (RFC 7386):
+objects are merged key by key, null removes a key and any other value
+(lists included) replaces it.
+
+Patches are applied copy-on-write, so a company_data dict handed out by the
+store is never modified afterwards; callers must treat it as read-only and
+copy what they want to mutate.
+
+Sessions expire after WORKING_SESSION_TTL_SECONDS without use and the least
+recently used are dropped beyond WORKING_SESSION_ENTRIES (single worker,
+in-process only; clients re-create a session on 404).
+
+Usage:
+    session = create_working_session(company_data)
+    patch_working_session(session.session_id, {"noterData": [...]}, expected_version=session.version)
+    company_data = resolve_company_data({"sessionId": session.session_id, "companyData": {"fiscalYear": 2024}})
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+WORKING_SESSION_ENTRIES = max(1, int(os.getenv("WORKING_SESSION_ENTRIES", "32")))
+WORKING_SESSION_TTL_SECONDS = int(os.getenv("WORKING_SESSION_TTL_SECONDS", str(6 * 3600)))
+
+
+class WorkingSessionNotFound(KeyError):
+    """Unknown or expired session id."""
+
+
+class WorkingSessionConflict(ValueError):
+    """Patch based on an older version than the stored one."""
+
+
+class WorkingSession:
+    __slots__ = ('session_id', 'company_data', 'version', 'touched')
+
+    def __init__(self, session_id: str, company_data: Dict[str, Any]):
+        self.session_id = session_id
+        self.company_data = company_data
+        self.version = 1
+        self.touched = time.monotonic()
+
+
+_sessions: "OrderedDict[str, WorkingSession]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def merge_patch(target: Any, patch: Any) -> Any:
+    """JSON merge patch (RFC 7386) returning a new object; target is not modified."""
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def _prune(now: float) -> None:
+    # Oldest first, so stop at the first session still within the TTL
+    while _sessions:
+        session = next(iter(_sessions.values()))
+        if now - session.touched <= WORKING_SESSION_TTL_SECONDS and len(_sessions) <= WORKING_SESSION_ENTRIES:
+            break
+        _sessions.popitem(last=False)
+
+
+def _get(session_id: Optional[str]) -> WorkingSession:
+    now = time.monotonic()
+    _prune(now)
+    session = _sessions.get(session_id or '')
+    if session is None:
+        raise WorkingSessionNotFound(session_id)
+    session.touched = now
+    _sessions.move_to_end(session.session_id)
+    return session
+
+
+def create_working_session(company_data: Optional[Dict[str, Any]] = None) -> WorkingSession:
+    session = WorkingSession(uuid.uuid4().hex, dict(company_data or {}))
+    with _lock:
+        _sessions[session.session_id] = session
+        _prune(session.touched)
+    return session
+
+
+def get_working_session(session_id: Optional[str]) -> WorkingSession:
+    with _lock:
+        return _get(session_id)
+
+
+def patch_working_session(session_id: Optional[str], patch: Dict[str, Any],
+                          expected_version: Optional[int] = None) -> WorkingSession:
+    """Apply a merge patch to the session's companyData; expected_version guards against lost updates."""
+    with _lock:
+        session = _get(session_id)
+        if expected_version is not None and int(expected_version) != session.version:
+            raise WorkingSessionConflict(f"Session version is {session.version}, patch was based on {expected_version}")
+        session.company_data = merge_patch(session.company_data, patch or {})
+        session.version += 1
+        return session
+
+
+def delete_working_session(session_id: Optional[str]) -> bool:
+    with _lock:
+        return _sessions.pop(session_id or '', None) is not None
+
+
+def resolve_company_data(payload: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    companyData for a request payload: the working session's data (sessionId /
+    session_id) with the payload's companyData merged on top, or just the
+    payload's companyData when no session id is sent.
+    """
+    payload = payload or {}
+    company_data = payload.get('companyData') or {}
+    session_id = payload.get('sessionId') or payload.get('session_id')
+    if not session_id:
+        return company_data
+    return merge_patch(get_working_session(session_id).company_data, company_data)
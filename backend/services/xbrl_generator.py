@@ -4,12 +4,155 @@ Generates XBRL instance documents for Swedish financial reporting
 """
 
 import xml.etree.ElementTree as ET
-from xml.dom import minidom
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, TextIO
 from datetime import datetime
 import uuid
 import base64
+import io
 import os
+from functools import lru_cache
+
+from .xbrl_metadata import get_xbrl_metadata
+
+# Optional: fontTools for the font-subsetted output mode
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+    HAS_FONTTOOLS = True
+except ImportError:
+    HAS_FONTTOOLS = False
+
+XBRL_SUBSET_FONTS = os.getenv("XBRL_SUBSET_FONTS", "0") == "1"  # default OFF - embed the full Roboto fonts
+# 'ttf' (same format as the full fonts) or 'woff2' (smaller, needs brotli)
+XBRL_SUBSET_FONT_FORMAT = os.getenv("XBRL_SUBSET_FONT_FORMAT", "ttf").lower()
+
+# Map of font files to CSS font-weight
+ROBOTO_FONTS = [
+    ('Roboto-Regular.ttf', '400', 'normal'),
+    ('Roboto-Medium.ttf', '500', 'normal'),
+    ('Roboto-Bold.ttf', '700', 'normal'),
+]
+FONT_DIR = os.path.join(os.path.dirname(__file__), '..', 'fonts')
+
+
+def _font_face_css(font_base64: str, weight: str, style: str, mime: str = 'font/truetype', fmt: str = 'truetype') -> str:
+    return f"""
+@font-face {{
+  font-family: 'Roboto';
+  font-style: {style};
+  font-weight: {weight};
+  src: url(data:{mime};charset=utf-8;base64,{font_base64}) format('{fmt}');
+}}"""
+
+
+@lru_cache(maxsize=32)
+def _subset_font_base64(font_file: str, text: str, flavor: Optional[str]) -> str:
+    """Base64 of font_file reduced to the glyphs for text (cached: the same report is exported repeatedly)"""
+    options = font_subset.Options()
+    options.flavor = flavor
+    options.notdef_outline = True
+    font = TTFont(os.path.join(FONT_DIR, font_file))
+    subsetter = font_subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font.flavor = flavor
+    font.save(buffer)
+    return base64.b64encode(buffer.getvalue()).decode('ascii')
+
+# Opening <html> tag with one namespace declaration per line
+XHTML_ROOT_START_TAG = '''<html xmlns="http://www.w3.org/1999/xhtml" 
+\txmlns:iso4217="http://www.xbrl.org/2003/iso4217" 
+\txmlns:ixt="http://www.xbrl.org/inlineXBRL/transformation/2010-04-20" 
+\txmlns:xlink="http://www.w3.org/1999/xlink" 
+\txmlns:link="http://www.xbrl.org/2003/linkbase" 
+\txmlns:xbrli="http://www.xbrl.org/2003/instance" 
+\txmlns:ix="http://www.xbrl.org/2013/inlineXBRL" 
+\txmlns:se-gen-base="http://www.taxonomier.se/se/fr/gen-base/2021-10-31"
+\txmlns:se-cd-base="http://www.taxonomier.se/se/fr/cd-base/2021-10-31"
+\txmlns:se-bol-base="http://www.bolagsverket.se/se/fr/comp-base/2020-12-01"
+\txmlns:se-misc-base="http://www.taxonomier.se/se/fr/misc-base/2017-09-30"
+\t  xmlns:se-gaap-ext="http://www.taxonomier.se/se/fr/gaap/gaap-ext/2021-10-31"
+\t  xmlns:se-mem-base="http://www.taxonomier.se/se/fr/mem-base/2021-10-31"
+\txmlns:se-k2-type="http://www.taxonomier.se/se/fr/k2/datatype">'''
+
+# Chunks are joined and written in batches of about this many characters
+_XML_WRITE_BATCH = 1 << 16
+
+
+def _escape_xml(data: str) -> str:
+    # Same escaping as minidom's writer (quotes escaped in text too)
+    if "&" in data:
+        data = data.replace("&", "&amp;")
+    if "<" in data:
+        data = data.replace("<", "&lt;")
+    if "\"" in data:
+        data = data.replace("\"", "&quot;")
+    if ">" in data:
+        data = data.replace(">", "&gt;")
+    return data
+
+
+def _escape_xml_text(data: str) -> str:
+    # Line endings in character data are normalized to \n, as an XML parser would
+    if "\r" in data:
+        data = data.replace("\r\n", "\n").replace("\r", "\n")
+    return _escape_xml(data)
+
+
+def _indented_xml_chunks(elem: ET.Element, indent: str, addindent: str, start_tag: Optional[str] = None):
+    """Yield elem serialized like minidom's toprettyxml (text-only elements inline, one node per line otherwise)"""
+    if elem.tag is ET.Comment:
+        yield f"{indent}<!--{elem.text or ''}-->\n"
+        return
+    
+    nodes = []
+    if elem.text:
+        nodes.append(elem.text)
+    for child in elem:
+        nodes.append(child)
+        if child.tail:
+            nodes.append(child.tail)
+    
+    if start_tag is None:
+        attrs = ''.join(f' {name}="{_escape_xml(value)}"' for name, value in elem.attrib.items())
+        start_tag = f"{indent}<{elem.tag}{attrs}"
+        if not nodes:
+            yield start_tag + "/>\n"
+            return
+        start_tag += ">"
+    yield start_tag
+    
+    if len(nodes) == 1 and isinstance(nodes[0], str):
+        yield _escape_xml_text(nodes[0])
+    else:
+        yield "\n"
+        child_indent = indent + addindent
+        for node in nodes:
+            if isinstance(node, str):
+                yield f"{child_indent}{_escape_xml_text(node)}\n"
+            else:
+                yield from _indented_xml_chunks(node, child_indent, addindent)
+        yield indent
+    yield f"</{elem.tag}>\n"
+
+
+def write_indented_xml(root: ET.Element, stream: TextIO, indent: str = "  ", root_start_tag: Optional[str] = None) -> None:
+    """
+    Write root to stream indented, in one pass over the tree. Gives the same text as
+    ET.tostring -> minidom.parseString -> toprettyxml, without the string and DOM copies.
+    root_start_tag replaces the opening tag of root (root must then have content).
+    """
+    batch = []
+    size = 0
+    for chunk in _indented_xml_chunks(root, "", indent, root_start_tag):
+        batch.append(chunk)
+        size += len(chunk)
+        if size >= _XML_WRITE_BATCH:
+            stream.write(''.join(batch))
+            batch = []
+            size = 0
+    stream.write(''.join(batch))
 
 
 class XBRLGenerator:
@@ -32,41 +175,65 @@ class XBRLGenerator:
         'se-k2-type': 'http://www.taxonomier.se/se/fr/k2/datatype',
     }
     
-    @staticmethod
-    def _get_inline_fonts_css() -> str:
+    # Static stylesheet assets, built on first use and shared by all generations
+    _inline_fonts_css: Optional[str] = None
+    _css_styles: Optional[str] = None
+    
+    @classmethod
+    def _get_inline_fonts_css(cls) -> str:
         """
         Generate inline @font-face CSS with base64-encoded fonts
         This avoids external stylesheet references which Bolagsverket validation rejects
         """
-        font_dir = os.path.join(os.path.dirname(__file__), '..', 'fonts')
-        fonts_css = []
+        if cls._inline_fonts_css is not None:
+            return cls._inline_fonts_css
         
-        # Map of font files to CSS font-weight
-        font_mappings = [
-            ('Roboto-Regular.ttf', '400', 'normal'),
-            ('Roboto-Medium.ttf', '500', 'normal'),
-            ('Roboto-Bold.ttf', '700', 'normal'),
-        ]
+        fonts_css = []
+        all_fonts_loaded = True
         
-        for font_file, weight, style in font_mappings:
-            font_path = os.path.join(font_dir, font_file)
+        for font_file, weight, style in ROBOTO_FONTS:
+            font_path = os.path.join(FONT_DIR, font_file)
             try:
                 with open(font_path, 'rb') as f:
                     font_data = f.read()
                     font_base64 = base64.b64encode(font_data).decode('ascii')
                     
-                    fonts_css.append(f"""
-@font-face {{
-  font-family: 'Roboto';
-  font-style: {style};
-  font-weight: {weight};
-  src: url(data:font/truetype;charset=utf-8;base64,{font_base64}) format('truetype');
-}}""")
+                    fonts_css.append(_font_face_css(font_base64, weight, style))
             except Exception as e:
                 # If font file not found, continue without it
                 print(f"Warning: Could not load font {font_file}: {e}")
+                all_fonts_loaded = False
                 continue
         
+        inline_fonts_css = '\n'.join(fonts_css)
+        # Only cache a complete set, so a missing font file is retried on the next generation
+        if all_fonts_loaded:
+            XBRLGenerator._inline_fonts_css = inline_fonts_css
+        return inline_fonts_css
+    
+    @classmethod
+    def _get_subset_fonts_css(cls, text: str) -> str:
+        """
+        @font-face CSS with the fonts subset to the characters in text.
+        Falls back to the full fonts if fontTools is missing or subsetting fails.
+        """
+        if not HAS_FONTTOOLS:
+            print("Warning: fontTools not installed - embedding full fonts")
+            return cls._get_inline_fonts_css()
+        
+        if XBRL_SUBSET_FONT_FORMAT == 'woff2':
+            flavor, mime, fmt = 'woff2', 'font/woff2', 'woff2'
+        else:
+            flavor, mime, fmt = None, 'font/truetype', 'truetype'
+        
+        fonts_css = []
+        for font_file, weight, style in ROBOTO_FONTS:
+            try:
+                font_base64 = _subset_font_base64(font_file, text, flavor)
+            except Exception as e:
+                print(f"Warning: Could not subset font {font_file}: {e} - embedding full fonts")
+                return cls._get_inline_fonts_css()
+            fonts_css.append(_font_face_css(font_base64, weight, style, mime, fmt))
         return '\n'.join(fonts_css)
     
     # Note number to note ID pattern mapping for note references
@@ -101,6 +268,8 @@ class XBRLGenerator:
         self.context_counter = 0
         self.unit_counter = 0
         self.note_references = []  # Track note references for tuple generation
+        self.xbrl_metadata = get_xbrl_metadata()  # Element names per variable (no queries while rendering)
+        self._style_element = None  # <style> of the document being built
     
     def _get_namespace_prefix(self, namespace: str) -> str:
         """Get namespace prefix from full namespace URL"""
@@ -345,8 +514,35 @@ class XBRLGenerator:
         }
         self.facts.append(fact)
     
-    def generate_xbrl_document(self, company_data: Dict[str, Any]) -> str:
+    def generate_xbrl_document(self, company_data: Dict[str, Any], subset_fonts: bool = False) -> str:
         """Generate complete Inline XBRL (iXBRL) document as XHTML"""
+        out = io.StringIO()
+        self.write_xbrl_document(company_data, out, subset_fonts)
+        return out.getvalue()
+    
+    def _document_text(self, root: ET.Element) -> str:
+        """Sorted distinct characters of all text in the document (the stylesheet excluded)"""
+        chars = set()
+        for elem in root.iter():
+            if elem.text and elem is not self._style_element:
+                chars.update(elem.text)
+            if elem.tail:
+                chars.update(elem.tail)
+        return ''.join(sorted(chars))
+    
+    def write_xbrl_document(self, company_data: Dict[str, Any], stream: TextIO, subset_fonts: bool = False) -> None:
+        """
+        Write the indented iXBRL document (with XML declaration) to a text stream.
+        subset_fonts embeds only the glyphs of the characters in the report.
+        """
+        root = self._build_document_tree(company_data)
+        if subset_fonts:
+            self._style_element.text = self._get_css_styles(self._get_subset_fonts_css(self._document_text(root)))
+        stream.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        write_indented_xml(root, stream, root_start_tag=XHTML_ROOT_START_TAG)
+    
+    def _build_document_tree(self, company_data: Dict[str, Any]) -> ET.Element:
+        """Build the iXBRL document as an ElementTree (root <html> element)"""
         # Extract company info
         company_info = company_data.get('seFileData', {}).get('company_info', {})
         fiscal_year = company_data.get('fiscal_year') or company_info.get('fiscal_year')
@@ -432,6 +628,7 @@ class XBRLGenerator:
         style = ET.SubElement(head, 'style')
         style.set('type', 'text/css')
         style.text = self._get_css_styles()
+        self._style_element = style
         
         # Create body element
         body = ET.SubElement(root, 'body')
@@ -606,42 +803,16 @@ class XBRLGenerator:
         # ------------------------------------------------------------------
         self._generate_depreciation_tuples(ix_hidden, company_data)
         
-        # Convert to pretty XML string with UTF-8 encoding
-        rough_string = ET.tostring(root, encoding='unicode')
-        reparsed = minidom.parseString(rough_string)
-        # Generate XML with proper UTF-8 declaration
-        xml_bytes = reparsed.toprettyxml(indent="  ", encoding='UTF-8')
-        xml_string = xml_bytes.decode('UTF-8')
-        
-        # Format the opening <html> tag with proper line breaks and tabs
-        # Replace the compact html opening tag with formatted version
-        html_open_start = xml_string.find('<html')
-        html_open_end = xml_string.find('>', html_open_start)
-        
-        if html_open_start != -1 and html_open_end != -1:
-            # Build the properly formatted opening tag
-            formatted_html_open = '''<html xmlns="http://www.w3.org/1999/xhtml" 
-\txmlns:iso4217="http://www.xbrl.org/2003/iso4217" 
-\txmlns:ixt="http://www.xbrl.org/inlineXBRL/transformation/2010-04-20" 
-\txmlns:xlink="http://www.w3.org/1999/xlink" 
-\txmlns:link="http://www.xbrl.org/2003/linkbase" 
-\txmlns:xbrli="http://www.xbrl.org/2003/instance" 
-\txmlns:ix="http://www.xbrl.org/2013/inlineXBRL" 
-\txmlns:se-gen-base="http://www.taxonomier.se/se/fr/gen-base/2021-10-31"
-\txmlns:se-cd-base="http://www.taxonomier.se/se/fr/cd-base/2021-10-31"
-\txmlns:se-bol-base="http://www.bolagsverket.se/se/fr/comp-base/2020-12-01"
-\txmlns:se-misc-base="http://www.taxonomier.se/se/fr/misc-base/2017-09-30"
-\t  xmlns:se-gaap-ext="http://www.taxonomier.se/se/fr/gaap/gaap-ext/2021-10-31"
-\t  xmlns:se-mem-base="http://www.taxonomier.se/se/fr/mem-base/2021-10-31"
-\txmlns:se-k2-type="http://www.taxonomier.se/se/fr/k2/datatype">'''
-            
-            xml_string = xml_string[:html_open_start] + formatted_html_open + xml_string[html_open_end+1:]
-        
-        return xml_string
+        return root
     
-    def _get_css_styles(self) -> str:
-        """Return CSS styles matching PDF generator with inline fonts"""
-        inline_fonts = self._get_inline_fonts_css()
+    def _get_css_styles(self, inline_fonts: Optional[str] = None) -> str:
+        """Return CSS styles matching PDF generator with inline fonts (the full fonts unless inline_fonts is given)"""
+        full_fonts = inline_fonts is None
+        if full_fonts and XBRLGenerator._css_styles is not None:
+            return XBRLGenerator._css_styles
+        
+        if full_fonts:
+            inline_fonts = self._get_inline_fonts_css()
         css_base = """
 /* Base reset */
 * {
@@ -1451,7 +1622,10 @@ body {
         }
         """
         # Prepend inline fonts to CSS
-        return "/* Embedded Roboto fonts (inline to avoid external references) */\n" + inline_fonts + "\n\n" + css_base
+        css_styles = "/* Embedded Roboto fonts (inline to avoid external references) */\n" + inline_fonts + "\n\n" + css_base
+        if full_fonts and XBRLGenerator._inline_fonts_css is not None:
+            XBRLGenerator._css_styles = css_styles
+        return css_styles
     
     def _normalize_role(self, role: str) -> str:
         """Normalize role to valid XBRL Foretradarroll value.
@@ -2088,23 +2262,6 @@ body {
         fb_variables = company_data.get('fbVariables', {})
         fb_table = company_data.get('fbTable', [])
         
-        # Load FB mappings from Supabase
-        try:
-            from supabase import create_client
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            supabase_url = os.getenv("SUPABASE_URL")
-            supabase_key = os.getenv("SUPABASE_ANON_KEY")
-            if supabase_url and supabase_key:
-                supabase = create_client(supabase_url, supabase_key)
-                fb_mappings_response = supabase.table('variable_mapping_fb').select('*').execute()
-                fb_mappings = fb_mappings_response.data
-            else:
-                fb_mappings = []
-        except:
-            fb_mappings = []
-        
         # Section: Verksamheten
         verksamhet_text = company_data.get('verksamhetContent')
         if not verksamhet_text:
@@ -2165,16 +2322,16 @@ body {
         ix_vasentliga.text = vasentliga_text
         
         # Flerårsöversikt - render with proper logic
-        self._render_flerarsoversikt_xbrl(page1, company_data, fiscal_year, prev_year, fb_variables, fb_mappings, unit_ref)
+        self._render_flerarsoversikt_xbrl(page1, company_data, fiscal_year, prev_year, fb_variables, unit_ref)
         
         # Förändringar i eget kapital - render with show/hide logic
-        self._render_forandringar_eget_kapital_xbrl(page1, fb_table, fiscal_year, prev_year, fb_variables, fb_mappings, 'balans0', 'balans1', 'period0', unit_ref)
+        self._render_forandringar_eget_kapital_xbrl(page1, fb_table, fiscal_year, prev_year, fb_variables, 'balans0', 'balans1', 'period0', unit_ref)
         
         # Resultatdisposition - render with proper formatting
-        self._render_resultatdisposition_xbrl(page1, fb_table, company_data, fb_mappings, 'balans0', unit_ref)
+        self._render_resultatdisposition_xbrl(page1, fb_table, company_data, 'balans0', unit_ref)
     
     def _render_flerarsoversikt_xbrl(self, page: ET.Element, company_data: dict, fiscal_year: int, prev_year: int,
-                                     fb_variables: dict, fb_mappings: list, unit_ref: str) -> None:
+                                     fb_variables: dict, unit_ref: str) -> None:
         """Render Flerårsöversikt table with 3 years"""
         p_heading = ET.SubElement(page, 'p')
         p_heading.set('class', 'H1-no-margin-top')
@@ -2184,20 +2341,8 @@ body {
         p_tkr.set('class', 'SMALL')
         p_tkr.text = 'Belopp i tkr'
         
-        # Build FB mappings dict by variable name
-        fb_mappings_dict = {}
-        for mapping in fb_mappings:
-            var_str = mapping.get('variable', '')
-            if var_str:
-                # Split multiple variables (oms1;oms2;oms3;oms4)
-                vars_list = [v.strip() for v in var_str.split(';') if v.strip()]
-                for var_name in vars_list:
-                    fb_mappings_dict[var_name] = {
-                        'element_name': mapping.get('elementname', ''),
-                        'data_type': mapping.get('datatyp', ''),
-                        'period_type': mapping.get('periodtyp', ''),
-                        'namespace': 'se-gen-base'  # Hardcoded from tillhor column
-                    }
+        # FB mappings by variable name (oms1;oms2;oms3;oms4 split into separate keys)
+        fb_mappings_dict = self.xbrl_metadata.fb_by_variable
         
         # Get flerårsöversikt data
         flerars = company_data.get('flerarsoversikt', {})
@@ -2413,7 +2558,7 @@ body {
                         p_val.text = self._format_monetary_value(val, for_display=True)
     
     def _render_forandringar_eget_kapital_xbrl(self, page: ET.Element, fb_table: list, fiscal_year: int, 
-                                               prev_year: int, fb_variables: dict, fb_mappings: list,
+                                               prev_year: int, fb_variables: dict,
                                                balans0_ref: str, balans1_ref: str, period0_ref: str, unit_ref: str) -> None:
         """Render Förändringar i eget kapital table with column/row filtering"""
         if not fb_table or len(fb_table) == 0:
@@ -2423,25 +2568,9 @@ body {
         p_heading.set('class', 'H1-no-margin-top')
         p_heading.text = 'Förändringar i eget kapital'
         
-        # Build FB mappings dict by (radrubrik, block) for Förändringar i eget kapital
+        # FB mappings by (radrubrik, block) for Förändringar i eget kapital
         # Map: block (column) → {radrubrik (row label) → mapping data}
-        fb_mappings_by_block = {}
-        for mapping in fb_mappings:
-            radrubrik = mapping.get('radrubrik', '')
-            block = mapping.get('block', '')
-            
-            # Only process mappings for equity changes blocks
-            if block in ['AKTIEKAPITAL', 'RESERVFOND', 'UPPSKRIVNINGSFOND', 
-                        'BALANSERATRESULTAT', 'ARETSRESULTAT', 'TOTALTEGETKAPITAL']:
-                if block not in fb_mappings_by_block:
-                    fb_mappings_by_block[block] = {}
-                
-                fb_mappings_by_block[block][radrubrik] = {
-                    'element_name': mapping.get('elementname', ''),
-                    'data_type': mapping.get('datatyp', ''),
-                    'period_type': mapping.get('periodtyp', ''),
-                    'namespace': 'se-gen-base'
-                }
+        fb_mappings_by_block = self.xbrl_metadata.fb_equity_by_block
         
         # Map column names to block names for lookup
         col_to_block = {
@@ -2597,25 +2726,15 @@ body {
                     p_val.text = self._format_monetary_value(val, for_display=True)
     
     def _render_resultatdisposition_xbrl(self, page: ET.Element, fb_table: list, company_data: dict,
-                                        fb_mappings: list, balans0_ref: str, unit_ref: str) -> None:
+                                        balans0_ref: str, unit_ref: str) -> None:
         """Render Resultatdisposition section"""
         arets_utdelning = self._num(company_data.get('arets_utdelning', 0))
         
         if not fb_table:
             return
         
-        # Build FB mappings dict by radrubrik (row label) for Resultatdisposition section
-        fb_mappings_dict = {}
-        for mapping in fb_mappings:
-            radrubrik = mapping.get('radrubrik', '')
-            block = mapping.get('block', '')
-            if block == 'RESULTATDISPOSITION' and radrubrik:
-                fb_mappings_dict[radrubrik] = {
-                    'element_name': mapping.get('elementname', ''),
-                    'data_type': mapping.get('datatyp', ''),
-                    'period_type': mapping.get('periodtyp', ''),
-                    'namespace': 'se-gen-base'
-                }
+        # FB mappings by radrubrik (row label) for Resultatdisposition section
+        fb_mappings_dict = self.xbrl_metadata.fb_resultatdisposition
         
         # Find UB row (Redovisat värde or Utgående or last row)
         ub_row = None
@@ -2967,22 +3086,8 @@ body {
             ET.SubElement(colgroup, 'col', style='width: 0.5cm')   # Spacing
             ET.SubElement(colgroup, 'col', style='width: 2.5cm')   # Previous year
             
-            # Load RR mappings for element names
-            try:
-                from supabase import create_client
-                import os
-                from dotenv import load_dotenv
-                load_dotenv()
-                supabase_url = os.getenv("SUPABASE_URL")
-                supabase_key = os.getenv("SUPABASE_ANON_KEY")
-                if supabase_url and supabase_key:
-                    supabase = create_client(supabase_url, supabase_key)
-                    rr_mappings_response = supabase.table('variable_mapping_rr').select('variable_name,element_name').execute()
-                    rr_mappings_dict = {m['variable_name']: m for m in rr_mappings_response.data if m.get('variable_name')}
-                else:
-                    rr_mappings_dict = {}
-            except:
-                rr_mappings_dict = {}
+            # RR mappings for element names
+            rr_mappings_dict = self.xbrl_metadata.rr
             
             # Filter and render RR rows (mirroring PDF generator logic)
             seen_rorelseresultat = False
@@ -3234,33 +3339,8 @@ body {
                       company_data.get('brRows') or 
                       company_data.get('seFileData', {}).get('br_data', []))
         
-        # Load BR mappings
-        try:
-            from supabase import create_client
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            supabase_url = os.getenv("SUPABASE_URL")
-            supabase_key = os.getenv("SUPABASE_ANON_KEY")
-            if supabase_url and supabase_key:
-                supabase = create_client(supabase_url, supabase_key)
-                br_mappings_response = supabase.table('variable_mapping_br').select('row_title,variable_name,element_name,data_type,period_type').execute()
-                # Create dual-key mapping: by variable_name AND by row_title
-                br_mappings_dict = {}
-                for m in br_mappings_response.data:
-                    if m.get('variable_name'):
-                        br_mappings_dict[m['variable_name']] = m
-                    if m.get('row_title'):
-                        br_mappings_dict[m['row_title']] = m
-                print(f"✓ Loaded {len(br_mappings_response.data)} BR mappings from database")
-            else:
-                print("⚠ Warning: No Supabase credentials - BR XBRL tags will be skipped")
-                br_mappings_dict = {}
-        except Exception as e:
-            print(f"⚠ Warning: Failed to load BR mappings - {str(e)}")
-            import traceback
-            traceback.print_exc()
-            br_mappings_dict = {}
+        # BR mappings, dual-key: by variable_name AND by row_title
+        br_mappings_dict = self.xbrl_metadata.br
         
         if br_data_raw:
             br_table = ET.SubElement(page3, 'table')
@@ -3524,33 +3604,8 @@ body {
                       company_data.get('brRows') or 
                       company_data.get('seFileData', {}).get('br_data', []))
         
-        # Load BR mappings
-        try:
-            from supabase import create_client
-            import os
-            from dotenv import load_dotenv
-            load_dotenv()
-            supabase_url = os.getenv("SUPABASE_URL")
-            supabase_key = os.getenv("SUPABASE_ANON_KEY")
-            if supabase_url and supabase_key:
-                supabase = create_client(supabase_url, supabase_key)
-                br_mappings_response = supabase.table('variable_mapping_br').select('row_title,variable_name,element_name,data_type,period_type').execute()
-                # Create dual-key mapping: by variable_name AND by row_title
-                br_mappings_dict = {}
-                for m in br_mappings_response.data:
-                    if m.get('variable_name'):
-                        br_mappings_dict[m['variable_name']] = m
-                    if m.get('row_title'):
-                        br_mappings_dict[m['row_title']] = m
-                print(f"✓ Loaded {len(br_mappings_response.data)} BR mappings from database")
-            else:
-                print("⚠ Warning: No Supabase credentials - BR XBRL tags will be skipped")
-                br_mappings_dict = {}
-        except Exception as e:
-            print(f"⚠ Warning: Failed to load BR mappings - {str(e)}")
-            import traceback
-            traceback.print_exc()
-            br_mappings_dict = {}
+        # BR mappings, dual-key: by variable_name AND by row_title
+        br_mappings_dict = self.xbrl_metadata.br
         
         if br_data_raw:
             br_table = ET.SubElement(page4, 'table')
@@ -4111,27 +4166,8 @@ body {
         noter_toggle_on = company_data.get('noterToggleOn', False)
         noter_block_toggles = company_data.get('noterBlockToggles', {})
         
-        # Load noter mappings from variable_mapping_noter
-        try:
-            from supabase import create_client
-            import os
-            from dotenv import load_dotenv
-            import traceback
-            load_dotenv()
-            supabase_url = os.getenv("SUPABASE_URL")
-            supabase_key = os.getenv("SUPABASE_ANON_KEY")
-            if supabase_url and supabase_key:
-                supabase = create_client(supabase_url, supabase_key)
-                # Select item_name, Datatyp, period_type from variable_mapping_noter
-                noter_mappings_response = supabase.table('variable_mapping_noter').select('variable_name,item_name,Datatyp,period_type').execute()
-                noter_mappings_dict = {m['variable_name']: m for m in noter_mappings_response.data if m.get('variable_name')}
-                print(f"✓ Loaded {len(noter_mappings_dict)} Noter mappings")
-            else:
-                noter_mappings_dict = {}
-        except Exception as e:
-            print(f"⚠ Warning: Failed to load Noter mappings - {e}")
-            traceback.print_exc()
-            noter_mappings_dict = {}
+        # Noter mappings from variable_mapping_noter (item_name, Datatyp, period_type)
+        noter_mappings_dict = self.xbrl_metadata.noter
         
         # Group notes by block
         blocks = {}
@@ -4871,17 +4907,22 @@ body {
                     )
 
 
-def generate_xbrl_instance_document(company_data: Dict[str, Any]) -> bytes:
+def generate_xbrl_instance_document(company_data: Dict[str, Any], subset_fonts: Optional[bool] = None) -> bytes:
     """
     Generate XBRL instance document from company data
     
     Args:
         company_data: Dictionary containing parsed financial data (RR, BR, company info)
+        subset_fonts: Embed fonts subset to the report's characters (default: XBRL_SUBSET_FONTS)
     
     Returns:
         XBRL XML document as bytes
     """
     generator = XBRLGenerator()
-    xbrl_xml = generator.generate_xbrl_document(company_data)
-    return xbrl_xml.encode('utf-8')
+    buffer = io.BytesIO()
+    stream = io.TextIOWrapper(buffer, encoding='utf-8', newline='')
+    generator.write_xbrl_document(company_data, stream, XBRL_SUBSET_FONTS if subset_fonts is None else subset_fonts)
+    stream.flush()
+    stream.detach()  # keep the buffer open
+    return buffer.getvalue()
 
@@ -0,0 +1,102 @@
+"""
+XBRL Metadata Registry
+Element name, data type and period type per variable for the XBRL generator,
+built once per mapping version from the shared mapping snapshot.
+
+The render methods of XBRLGenerator used to open a Supabase client and query
+variable_mapping_fb/rr/br/noter each (five clients and five sequential
+queries per document). They now read these lookups instead, so generating a
+document needs no network I/O once the mapping snapshot is loaded.
+
+The lookup dicts are built with the same precedence as the old per-render
+dict building (later rows overwrite earlier ones) and are shared between
+requests: treat them as read-only.
+
+Usage:
+    metadata = get_xbrl_metadata()
+    metadata.rr.get('SumRorelseintakter', {}).get('element_name')
+    metadata.fb_by_variable.get('oms1')
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+from .database_parser import get_mapping_snapshot
+
+# Blocks of variable_mapping_fb used by Förändringar i eget kapital
+FB_EQUITY_BLOCKS = ('AKTIEKAPITAL', 'RESERVFOND', 'UPPSKRIVNINGSFOND',
+                    'BALANSERATRESULTAT', 'ARETSRESULTAT', 'TOTALTEGETKAPITAL')
+
+Mapping = Dict[str, Any]
+
+
+def _fb_element(mapping: Mapping) -> Dict[str, str]:
+    return {
+        'element_name': mapping.get('elementname', ''),
+        'data_type': mapping.get('datatyp', ''),
+        'period_type': mapping.get('periodtyp', ''),
+        'namespace': 'se-gen-base'  # Hardcoded from tillhor column
+    }
+
+
+class XbrlMetadata:
+    """XBRL lookups of one mapping version"""
+
+    def __init__(self, snapshot: Optional[Dict[str, Any]] = None):
+        snapshot = snapshot or {}
+        self.version: Optional[str] = snapshot.get('version')
+
+        # RR / Noter: by variable_name
+        self.rr: Dict[str, Mapping] = {m['variable_name']: m for m in snapshot.get('rr_mappings', ())
+                                       if m.get('variable_name')}
+        self.noter: Dict[str, Mapping] = {m['variable_name']: m for m in snapshot.get('noter_mappings', ())
+                                          if m.get('variable_name')}
+
+        # BR: dual-key mapping, by variable_name AND by row_title
+        self.br: Dict[str, Mapping] = {}
+        for m in snapshot.get('br_mappings', ()):
+            if m.get('variable_name'):
+                self.br[m['variable_name']] = m
+            if m.get('row_title'):
+                self.br[m['row_title']] = m
+
+        # FB: Flerårsöversikt by variable (oms1;oms2;... split), eget kapital by (block, radrubrik),
+        # Resultatdisposition by radrubrik
+        self.fb_by_variable: Dict[str, Dict[str, str]] = {}
+        self.fb_equity_by_block: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self.fb_resultatdisposition: Dict[str, Dict[str, str]] = {}
+        for m in snapshot.get('fb_mappings', ()):
+            for var_name in (v.strip() for v in (m.get('variable', '') or '').split(';')):
+                if var_name:
+                    self.fb_by_variable[var_name] = _fb_element(m)
+            radrubrik = m.get('radrubrik', '')
+            block = m.get('block', '')
+            if block in FB_EQUITY_BLOCKS:
+                self.fb_equity_by_block.setdefault(block, {})[radrubrik] = _fb_element(m)
+            if block == 'RESULTATDISPOSITION' and radrubrik:
+                self.fb_resultatdisposition[radrubrik] = _fb_element(m)
+
+
+_registry: Dict[str, Any] = {"metadata": None}
+_registry_lock = threading.Lock()
+
+
+def get_xbrl_metadata() -> XbrlMetadata:
+    """Registry for the current mapping version (empty lookups if the mappings can't be loaded)"""
+    try:
+        snapshot = get_mapping_snapshot()
+    except Exception as e:
+        print(f"⚠ Warning: Failed to load XBRL mappings - {e}")
+        return XbrlMetadata()
+
+    metadata = _registry["metadata"]
+    if metadata is not None and metadata.version == snapshot['version']:
+        return metadata
+    with _registry_lock:
+        metadata = _registry["metadata"]
+        if metadata is None or metadata.version != snapshot['version']:
+            metadata = XbrlMetadata(snapshot)
+            _registry["metadata"] = metadata
+            print(f"✓ Built XBRL metadata for mapping version {metadata.version}: "
+                  f"{len(metadata.rr)} RR, {len(metadata.br)} BR, {len(metadata.noter)} Noter mappings")
+        return metadata
@@ -0,0 +1,155 @@
+"""
+Test för rating_bolag_scraper mot sparade HTML-sidor (inga nätverksanrop).
+
+Sidorna i test_fixtures/rating_bolag är nedkortade till den markup som
+scrapern läser (rating.se, ratsit.se och allabolag.se) för ett påhittat
+bolag, 556123-4567, med två dotterbolag. Varje hämtning besvaras från en
+fixture; okända URL:er svarar 404.
+
+Kör:
+    python test_rating_bolag_scraper.py
+"""
+import os
+import sys
+import tempfile
+
+import requests
+
+import rating_bolag_scraper as scraper
+
+FIXTURE_DIR = os.path.join(os.path.dirname(__file__), "test_fixtures", "rating_bolag")
+
+# URL -> fixture
+FIXTURES = {
+    "https://www.rating.se/info1/detail/numbers/5561234567": "rating_numbers_5561234567.html",
+    "https://www.rating.se/info1/detail/people/5561234567": "rating_people_5561234567.html",
+    "https://www.rating.se/info1/detail/overview/5561234567": "rating_overview_5561234567.html",
+    "https://www.rating.se/info1/detail/biz/5561234567": "rating_biz_5561234567.html",
+    "https://www.rating.se/info1/detail/overview/5569876543": "rating_overview_5569876543.html",
+    "https://www.ratsit.se/5561234567": "ratsit_5561234567.html",
+    "https://www.ratsit.se/5565550001": "ratsit_5565550001.html",
+    "https://www.allabolag.se/what/Exempelbolaget%20AB": "allabolag_search_exempelbolaget.html",
+}
+
+
+class _FixtureResponse:
+    def __init__(self, url: str, status_code: int, text: str):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} för {self.url}")
+
+
+def _fixture_get(requested: list):
+    def _get(url: str, timeout: int = 20):
+        requested.append(url)
+        name = FIXTURES.get(url)
+        if name is None:
+            return _FixtureResponse(url, 404, "")
+        with open(os.path.join(FIXTURE_DIR, name), encoding="utf-8") as f:
+            return _FixtureResponse(url, 200, f.read())
+    return _get
+
+
+EXPECTED_NYCKELTAL = {
+    "years": [2024, 2023, 2022],
+    "Omsättning": [12345, 11020, 9870],
+    "Resultat efter finansnetto": [1234, -210, 845],
+    "Antal anställda": [12, 11, 9],
+    "Balansomslutning": [8765, 7980, 7100],
+    "Soliditet": [45.3, 41.8, 39.0],
+}
+
+EXPECTED_COMPANY_INFO = {
+    "orgnr": "556123-4567",
+    "company_name": "Exempelbolaget AB",
+    "säte": "Stockholm",
+    "nyckeltal": EXPECTED_NYCKELTAL,
+    "styrelse": ["Karin Exempel (Ordförande)", "Per Exempel (Ledamot)", "Lisa Exempel (Suppleant)"],
+    "vd": "Anna Exempel (VD)",
+    "moderbolag": "Exempelkoncernen Holding AB",
+    "moderbolag_orgnr": "556000-1111",
+    "antal_dotterbolag": 2,
+    "verksamhetsbeskrivning": "Bolaget ska bedriva konsultverksamhet inom redovisning och ekonomi samt därmed förenlig verksamhet.",
+    "dotterbolag": [
+        # Namn och säte från rating.se-översikten
+        {"name": "Exempel Dotter AB", "org_number": "556987-6543", "säte": "Malmö"},
+        # Översikten saknas (404), säte från Ratsit
+        {"name": "Exempel Fastigheter AB", "org_number": "556555-0001", "säte": "Göteborg"},
+        {"name": "1 okända dotterbolag", "org_number": None, "säte": None},
+    ],
+}
+
+
+def _check(label: str, actual, expected) -> bool:
+    if actual == expected:
+        print(f"   ✅ {label}")
+        return True
+    print(f"   ❌ {label}\n      fick:     {actual!r}\n      förväntat: {expected!r}")
+    return False
+
+
+def run_scraper_tests() -> bool:
+    print("=" * 80)
+    print("Testar rating_bolag_scraper mot sparade HTML-sidor")
+    print("=" * 80)
+
+    requested: list = []
+    original_get = scraper._http_get
+    original_cache_path = scraper.SCRAPE_CACHE_PATH
+    scraper._http_get = _fixture_get(requested)
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        scraper.SCRAPE_CACHE_PATH = os.path.join(tmp, "scrape_cache.sqlite3")
+        try:
+            print("\nEnskilda sidor:")
+            ok &= _check("nyckeltal (rating.se numbers)", scraper.scrape_numbers("556123-4567"), EXPECTED_NYCKELTAL)
+            ok &= _check("styrelse och VD (rating.se people)", scraper.scrape_people("556123-4567"), {
+                "styrelse": EXPECTED_COMPANY_INFO["styrelse"],
+                "vd": EXPECTED_COMPANY_INFO["vd"],
+            })
+            ok &= _check("översikt (rating.se overview)", scraper.scrape_overview("556123-4567"), {
+                "company_name": "Exempelbolaget AB",
+                "moderbolag": "Exempelkoncernen Holding AB",
+                "moderbolag_orgnr": "556000-1111",
+                "antal_dotterbolag": 2,
+                "säte": "Stockholm",
+            })
+            ok &= _check("verksamhetsbeskrivning (rating.se biz)", scraper.scrape_biz("556123-4567"), {
+                "verksamhetsbeskrivning": EXPECTED_COMPANY_INFO["verksamhetsbeskrivning"],
+            })
+            ok &= _check("dotterbolag (ratsit.se)",
+                         scraper.parse_subsidiaries_from_ratsit(scraper.fetch_ratsit_page("556123-4567")), [
+                             {"name": "Exempel Dotter AB", "org_number": "556987-6543", "säte": None},
+                             {"name": "Exempel Fastigheter AB", "org_number": "556555-0001", "säte": None},
+                             {"name": "1 okända dotterbolag", "org_number": None, "säte": None},
+                         ])
+            ok &= _check("säte (ratsit.se)", scraper.get_sate_from_ratsit("556555-0001"), "Göteborg")
+            ok &= _check("säte saknas (ratsit.se 404)", scraper.get_sate_from_ratsit("556000-0000"), None)
+            ok &= _check("orgnr via sökning (allabolag.se)",
+                         scraper.search_organization_number("Exempelbolaget AB"), "556123-4567")
+
+            print("\nHela bolaget:")
+            requested.clear()
+            ok &= _check("get_company_info", scraper.get_company_info("556123-4567"), EXPECTED_COMPANY_INFO)
+            fetched = len(requested)
+
+            requested.clear()
+            ok &= _check("get_company_info från cachen", scraper.get_company_info("556123-4567"), EXPECTED_COMPANY_INFO)
+            ok &= _check(f"inga hämtningar när cachen träffar ({fetched} utan cache)", requested, [])
+
+            ok &= _check("get_company_info_with_search", scraper.get_company_info_with_search(company_name="Exempelbolaget AB"),
+                         EXPECTED_COMPANY_INFO)
+        finally:
+            scraper._http_get = original_get
+            scraper.SCRAPE_CACHE_PATH = original_cache_path
+
+    print("\n✅ Alla fält tolkades som förväntat" if ok else "\n❌ Scrapern tolkade sidorna fel")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if run_scraper_tests() else 1)
@@ -0,0 +1,93 @@
+"""
+Lasttest för SE-uppladdning: /health ska svara snabbt medan 10 uppladdningar pågår.
+
+Kör mot en lokal server:
+    uvicorn main:app --port 8080
+    python test_upload_load.py path/till/fil.se [--url http://localhost:8080] [--uploads 10]
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+
+import requests
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _measure_health(base_url: str, stop: threading.Event, samples: list, interval: float = 0.1):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        try:
+            requests.get(f"{base_url}/health", timeout=30)
+            samples.append((time.perf_counter() - t0) * 1000)
+        except requests.RequestException:
+            samples.append(float("inf"))
+        time.sleep(interval)
+
+
+def _upload(base_url: str, se_path: str, results: list):
+    t0 = time.perf_counter()
+    try:
+        with open(se_path, "rb") as f:
+            resp = requests.post(f"{base_url}/upload-se-file", files={"file": ("load.se", f)}, timeout=600)
+        results.append((resp.status_code, time.perf_counter() - t0))
+    except requests.RequestException as e:
+        results.append((str(e), time.perf_counter() - t0))
+
+
+def run_load_test(base_url: str, se_path: str, uploads: int = 10, max_p95_factor: float = 5.0) -> bool:
+    print("=" * 80)
+    print(f"Lasttest: {uploads} samtidiga uppladdningar mot {base_url}")
+    print("=" * 80)
+
+    # Baslinje: /health utan last
+    baseline = []
+    stop = threading.Event()
+    t = threading.Thread(target=_measure_health, args=(base_url, stop, baseline))
+    t.start()
+    time.sleep(2)
+    stop.set()
+    t.join()
+
+    # /health medan uppladdningarna pågår
+    under_load = []
+    upload_results = []
+    stop = threading.Event()
+    health_thread = threading.Thread(target=_measure_health, args=(base_url, stop, under_load))
+    health_thread.start()
+    workers = [threading.Thread(target=_upload, args=(base_url, se_path, upload_results)) for _ in range(uploads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    stop.set()
+    health_thread.join()
+
+    base_p95 = _percentile(baseline, 95)
+    load_p95 = _percentile(under_load, 95)
+    print(f"\n/health utan last:  median {statistics.median(baseline):.1f} ms, p95 {base_p95:.1f} ms ({len(baseline)} anrop)")
+    print(f"/health under last: median {statistics.median(under_load):.1f} ms, p95 {load_p95:.1f} ms ({len(under_load)} anrop)")
+    for status, secs in upload_results:
+        print(f"   upload -> {status} på {secs:.1f} s")
+
+    # Tillåt lite brus men inte att /health väntar in uppladdningarna
+    ok = load_p95 <= max(base_p95 * max_p95_factor, 250.0)
+    print("\n✅ /health håller sig stabil under last" if ok else "\n❌ /health blockeras av uppladdningarna")
+    return ok
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("se_file")
+    ap.add_argument("--url", default="http://localhost:8080")
+    ap.add_argument("--uploads", type=int, default=10)
+    args = ap.parse_args()
+    sys.exit(0 if run_load_test(args.url.rstrip("/"), args.se_file, args.uploads) else 1)
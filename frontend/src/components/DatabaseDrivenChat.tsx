@@ -1,6 +1,7 @@
 // Force deployment trigger - v4
 import React, { useState, useEffect, useRef } from 'react';
 import { apiService } from '@/services/api';
+import { workingSession } from '@/services/workingSession';
 import { ChatMessage } from './ChatMessage';
 import { OptionButton } from './OptionButton';
 import { FileUpload } from './FileUpload';
@@ -2128,6 +2129,32 @@ const selectiveMergeInk2 = (
     }
   };
 
+  // Latest companyData for callbacks that outlive the render they were created in (scrape polling)
+  const companyDataRef = useRef<any>(companyData);
+  companyDataRef.current = companyData;
+
+  // Poll the background rating.se scrape started by the upload
+  const pollScrapedCompanyData = async (orgNumber: string, attempt: number = 0) => {
+    try {
+      const job = await apiService.getCompanyScrape(orgNumber);
+      if (job.status !== 'pending') {
+        const scraped = job.scraped_company_data || {};
+        // Stored reports read seFileData.scraped_company_data (NOT2 employee count), keep both in sync
+        const seFileData = companyDataRef.current?.seFileData;
+        onDataUpdate({
+          scraped_company_data: scraped,
+          ...(seFileData ? { seFileData: { ...seFileData, scraped_company_data: scraped } } : {}),
+        });
+        return;
+      }
+    } catch (error) {
+      console.error('❌ Error polling scraped company data:', error);
+    }
+    if (attempt < 60) {
+      setTimeout(() => pollScrapedCompanyData(orgNumber, attempt + 1), 2000);
+    }
+  };
+
   // Handle file upload
   const handleFileProcessed = async (fileData: any) => {
     // Extract data from the uploaded file (same logic as old system)
@@ -2284,6 +2311,9 @@ const selectiveMergeInk2 = (
       setLocalOrgNumber(orgNumber);
     }
     
+    // The upload already stored seFileData in a server-side working session; later requests only send edits
+    workingSession.adopt(fileData.session_id, fileData.data);
+    
     onDataUpdate({ 
       seFileData: fileData.data,
       scraped_company_data: fileData.data?.scraped_company_data,
@@ -2306,6 +2336,11 @@ const selectiveMergeInk2 = (
       showRRBR: true // Show RR and BR data in preview
     });
     
+    // Scraped company data (rating.se) arrives after the upload - poll until the background job is done
+    if (orgNumber && fileData.data?.scraped_company_status === 'pending') {
+      pollScrapedCompanyData(orgNumber);
+    }
+    
     // Update global state so subsequent steps have access to calculated values
     setGlobalInk2Data(fileData.data?.ink2_data || []);
     setGlobalInkBeraknadSkatt(inkBeraknadSkatt);
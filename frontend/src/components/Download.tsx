@@ -3,6 +3,7 @@ import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
 import { Button } from '@/components/ui/button';
 import { Download as DownloadIcon, FileText, Check } from 'lucide-react';
 import { useToast } from '@/hooks/use-toast';
+import { workingSession } from '@/services/workingSession';
 
 interface DownloadFile {
   id: string;
@@ -90,15 +91,10 @@ export function Download({ companyData }: DownloadProps) {
         // Debug NOT2 specifically
         const not2Items = (companyData.noterData || []).filter((item: any) => item.block === 'NOT2');
         
-        const response = await fetch(`${API_BASE}/api/pdf/annual-report`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ 
-            companyData,
-            renderVersion: Date.now() // cache buster
-          }),
-          cache: 'no-store', // prevent browser caching
-        });
+        // companyData goes through the working session (only the edits since the last request are sent)
+        const response = await workingSession.postJson(`${API_BASE}/api/pdf/annual-report`, companyData, {
+          renderVersion: Date.now() // cache buster
+        }, { cache: 'no-store' });
         
         if (!response.ok) {
           const errorText = await response.text();
@@ -125,15 +121,10 @@ export function Download({ companyData }: DownloadProps) {
         
         const API_BASE = import.meta.env.VITE_API_URL || 'https://api.summare.se';
         
-        const response = await fetch(`${API_BASE}/api/pdf/ink2-form`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ 
-            companyData,
-            renderVersion: Date.now() // cache buster
-          }),
-          cache: 'no-store', // prevent browser caching
-        });
+        // companyData goes through the working session (only the edits since the last request are sent)
+        const response = await workingSession.postJson(`${API_BASE}/api/pdf/ink2-form`, companyData, {
+          renderVersion: Date.now() // cache buster
+        }, { cache: 'no-store' });
         
         if (!response.ok) {
           const errorText = await response.text();
@@ -160,14 +151,8 @@ export function Download({ companyData }: DownloadProps) {
         
         const API_BASE = import.meta.env.VITE_API_URL || 'https://api.summare.se';
         
-        const response = await fetch(`${API_BASE}/api/sru/generate`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ 
-            companyData
-          }),
-          cache: 'no-store',
-        });
+        // companyData goes through the working session (only the edits since the last request are sent)
+        const response = await workingSession.postJson(`${API_BASE}/api/sru/generate`, companyData, {}, { cache: 'no-store' });
         
         if (!response.ok) {
           const errorText = await response.text();
@@ -194,15 +179,10 @@ export function Download({ companyData }: DownloadProps) {
         
         const API_BASE = import.meta.env.VITE_API_URL || 'https://api.summare.se';
         
-        const response = await fetch(`${API_BASE}/api/pdf/bokforing-instruktion`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ 
-            companyData,
-            renderVersion: Date.now() // cache buster
-          }),
-          cache: 'no-store',
-        });
+        // companyData goes through the working session (only the edits since the last request are sent)
+        const response = await workingSession.postJson(`${API_BASE}/api/pdf/bokforing-instruktion`, companyData, {
+          renderVersion: Date.now() // cache buster
+        }, { cache: 'no-store' });
         
         if (!response.ok) {
           const errorText = await response.text();
@@ -241,14 +221,8 @@ export function Download({ companyData }: DownloadProps) {
         
         const API_BASE = import.meta.env.VITE_API_URL || 'https://api.summare.se';
         
-        const response = await fetch(`${API_BASE}/api/xbrl/generate`, {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ 
-            companyData
-          }),
-          cache: 'no-store',
-        });
+        // companyData goes through the working session (only the edits since the last request are sent)
+        const response = await workingSession.postJson(`${API_BASE}/api/xbrl/generate`, companyData, {}, { cache: 'no-store' });
         
         if (!response.ok) {
           const errorText = await response.text();
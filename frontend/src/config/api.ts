@@ -9,6 +9,8 @@ export const API_ENDPOINTS = {
   testParser: `${API_BASE_URL}/test-parser`,
   health: `${API_BASE_URL}/health`,
   companyInfo: `${API_BASE_URL}/company-info`,
+  companyScrape: `${API_BASE_URL}/api/company-scrape`,
+  workingSession: `${API_BASE_URL}/api/session`,
   userReports: `${API_BASE_URL}/user-reports`,
   downloadReport: `${API_BASE_URL}/download-report`,
   recalculateInk2: `${API_BASE_URL}/api/recalculate-ink2`,
@@ -1,4 +1,5 @@
 import { API_ENDPOINTS } from '@/config/api';
+import { workingSession } from '@/services/workingSession';
 
 export interface UploadResponse {
   success: boolean;
@@ -123,6 +124,11 @@ class ApiService {
     return this.makeRequest(`${API_ENDPOINTS.companyInfo}/${orgNumber}`);
   }
 
+  // Background rating.se scrape started by the SE upload
+  async getCompanyScrape(orgNumber: string): Promise<{ status: 'pending' | 'done' | 'error'; orgnr: string; scraped_company_data: any }> {
+    return this.makeRequest(`${API_ENDPOINTS.companyScrape}/${encodeURIComponent(orgNumber)}`);
+  }
+
   async getChatFlowStep(stepNumber: number) {
     try {
       const response = await this.makeRequest(`${API_ENDPOINTS.chatFlow}/${stepNumber}`);
@@ -246,15 +252,19 @@ class ApiService {
   }
 
   // Annual Report Data Storage for Mina Sidor
-  // Pass the full companyData object - backend extracts what it needs (like XBRL export)
+  // Pass the full companyData object - backend extracts what it needs (like XBRL export).
+  // It is sent through the working session, so only the edits since the last request go over the wire.
   async saveAnnualReportData(data: {
     companyData: any;
     status?: string;
   }): Promise<{ success: boolean; message: string; action?: string }> {
-    return this.makeRequest(`${API_ENDPOINTS.base}/api/annual-report-data/save`, {
-      method: 'POST',
-      body: JSON.stringify(data),
-    });
+    const { companyData, ...rest } = data;
+    const response = await workingSession.postJson(`${API_ENDPOINTS.base}/api/annual-report-data/save`, companyData, rest);
+    if (!response.ok) {
+      console.error('API request failed:', response.status);
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return await response.json();
   }
 
   async getAnnualReportData(
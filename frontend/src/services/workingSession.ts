@@ -0,0 +1,154 @@
+import { API_ENDPOINTS } from '@/config/api';
+
+// Server-side working session for companyData (backend services/working_session.py).
+//
+// The SE upload creates a session holding { seFileData }. Before a generator or
+// save request, the edits made since the last sync are sent as a JSON merge patch
+// (RFC 7386), and the request itself only carries { sessionId }. companyData is
+// React state that is never mutated in place, so unchanged branches keep their
+// identity and the diff only walks the branches that were replaced.
+//
+// Falls back to posting the full companyData when no session can be used
+// (session expired on the server, backend without sessions, network errors).
+
+type Json = any;
+
+const isPlainObject = (value: Json): boolean =>
+  value !== null &&
+  typeof value === 'object' &&
+  (Object.getPrototypeOf(value) === Object.prototype || Object.getPrototypeOf(value) === null);
+
+// Merge patch turning `prev` into `next`; undefined when nothing changed.
+// Objects are diffed key by key, removed keys become null, anything else is replaced whole.
+export const diffMergePatch = (prev: Json, next: Json): Json | undefined => {
+  if (prev === next) return undefined;
+  if (isPlainObject(prev) && isPlainObject(next)) {
+    const patch: Record<string, Json> = {};
+    let changed = false;
+    for (const key of Object.keys(next)) {
+      if (next[key] === undefined) continue;
+      const sub = diffMergePatch(prev[key], next[key]);
+      if (sub !== undefined) {
+        patch[key] = sub;
+        changed = true;
+      }
+    }
+    for (const key of Object.keys(prev)) {
+      if (next[key] === undefined && prev[key] !== undefined && prev[key] !== null) {
+        patch[key] = null;
+        changed = true;
+      }
+    }
+    return changed ? patch : undefined;
+  }
+  return next === undefined ? null : next;
+};
+
+class WorkingSessionSync {
+  private sessionId: string | null = null;
+  private version: number | null = null;
+  private synced: Json = null; // companyData as the server holds it
+  private queue: Promise<unknown> = Promise.resolve();
+  private inFlight = new Set<Promise<Response>>();
+
+  // Session created by /upload-se-file or /upload-two-se-files: the server holds { seFileData }
+  adopt(sessionId: string | null | undefined, seFileData: Json) {
+    if (!sessionId) {
+      this.reset();
+      return;
+    }
+    this.sessionId = sessionId;
+    this.version = 1;
+    this.synced = { seFileData };
+  }
+
+  reset() {
+    this.sessionId = null;
+    this.version = null;
+    this.synced = null;
+  }
+
+  private async create(companyData: Json): Promise<string | null> {
+    const response = await fetch(API_ENDPOINTS.workingSession, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ companyData }),
+    });
+    if (!response.ok) {
+      this.reset();
+      return null;
+    }
+    const result = await response.json();
+    this.sessionId = result.session_id;
+    this.version = result.version;
+    this.synced = companyData;
+    return this.sessionId;
+  }
+
+  private async sync(companyData: Json): Promise<string | null> {
+    if (!this.sessionId) return this.create(companyData);
+    const patch = diffMergePatch(this.synced, companyData);
+    if (patch === undefined) return this.sessionId;
+
+    // Requests already sent must still see the data they were sent with
+    await Promise.allSettled(Array.from(this.inFlight));
+    const response = await fetch(`${API_ENDPOINTS.workingSession}/${encodeURIComponent(this.sessionId)}`, {
+      method: 'PATCH',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ patch, version: this.version }),
+    });
+    if (response.status === 404 || response.status === 409) {
+      // Expired on the server, or changed elsewhere - start over with the full data
+      this.reset();
+      return this.create(companyData);
+    }
+    if (!response.ok) return null;
+    const result = await response.json();
+    this.version = result.version;
+    this.synced = companyData;
+    return this.sessionId;
+  }
+
+  // Request fields for companyData: { sessionId, companyData: {} } once synced, else the full companyData
+  private async payload(companyData: Json): Promise<{ sessionId?: string; companyData: Json }> {
+    try {
+      const sessionId = await this.sync(companyData);
+      if (sessionId) return { sessionId, companyData: {} };
+    } catch (error) {
+      console.error('Working session sync failed, sending full companyData:', error);
+      this.reset();
+    }
+    return { companyData };
+  }
+
+  // POST { companyData, ...extra } through the session; retried with the full companyData if the session is gone
+  async postJson(url: string, companyData: Json, extra: Record<string, Json> = {}, init: RequestInit = {}): Promise<Response> {
+    const post = (body: Json) => fetch(url, {
+      ...init,
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json', ...init.headers },
+      body: JSON.stringify({ ...body, ...extra }),
+    });
+    // Syncs run one at a time, and each request is sent before the next sync starts
+    const run = this.queue.then(async () => {
+      const body = await this.payload(companyData);
+      const request = post(body);
+      if (body.sessionId) {
+        this.inFlight.add(request);
+        request.catch(() => undefined).finally(() => this.inFlight.delete(request));
+      }
+      return { body, request };
+    });
+    this.queue = run.catch(() => undefined);
+
+    const { body, request } = await run;
+    const response = await request;
+    if (response.status === 404 && body.sessionId) {
+      this.reset();
+      return post({ companyData });
+    }
+    return response;
+  }
+}
+
+export const workingSession = new WorkingSessionSync();